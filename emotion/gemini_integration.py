@@ -1,12 +1,11 @@
-import google.generativeai as genai
 import os
 import streamlit as st # Import streamlit to access st.secrets
 
-# It's recommended to load the API key from environment variables for security
-# For example: GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-# genai.configure(api_key=GOOGLE_API_KEY)
-# For this example, I'll assume the key is configured elsewhere or you'll add it here.
-# Ensure you have run: pip install google-generativeai
+from src.features.gemini_client import GeminiError
+from src.features.gemini_models import get_shared_client
+
+# The API key is read from Streamlit secrets (GOOGLE_API_KEY) or the environment.
+# The client is shared process-wide; the system prompt is sent with each call.
 
 # 🧠  Companion — MASTER SYSTEM PROMPT
 SYSTEM_PROMPT = """
@@ -50,31 +49,23 @@ CONVERSATION GOAL
 Your goal is to help the user feel understood, provide emotional support, and guide them toward the wellness activities available in the application.
 """
 
-def ask_gemini_wellness_ai(user_input, emotion="neutral", confidence=0.0):
-    """
-    Sends a prompt to the Gemini API using the specified master system prompt
-    and returns the AI's response.
-    """
+def _get_api_key():
     try:
-        # Configure Gemini API key from Streamlit secrets
         if "GOOGLE_API_KEY" in st.secrets:
-            genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
-        else:
-            return "Gemini API Key not found in Streamlit secrets. Please set it to enable the chatbot."
-
-        # Check if the model is available
-        try:
-            genai.get_model('gemini-1.5-flash')
-        except Exception:
-            return "Gemini model 'gemini-1.5-flash' is not available. Check API key and model access."
-
-        model = genai.GenerativeModel(
-            model_name='gemini-1.5-flash',
-            system_instruction=SYSTEM_PROMPT
-        )
-        
-        # Construct the prompt as per the user's template
-        prompt = f"""
+            return st.secrets["GOOGLE_API_KEY"]
+    except Exception:
+        pass
+    return os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+
+
+def _get_client():
+    """The process-wide Gemini client (shared with the wellness chatbot)."""
+    return get_shared_client(_get_api_key())
+
+
+def _build_prompt(user_input, emotion, confidence):
+    # Construct the prompt as per the user's template
+    return f"""
 Detected Emotion: {emotion}
 Confidence: {confidence:.2f}
 
@@ -83,12 +74,36 @@ User Message:
 
 Respond as AI MoodMate Companion.
 """
-        
-        response = model.generate_content(prompt)
-        
-        return response.text
-
-    except Exception as e:
-        error_message = f"An error occurred with the AI assistant: {e}"
-        print(error_message) # Log the actual error for debugging
+
+
+def ask_gemini_wellness_ai(user_input, emotion="neutral", confidence=0.0):
+    """
+    Sends a prompt to the Gemini API using the specified master system prompt
+    and returns the AI's response.
+    """
+    client = _get_client()
+    if client is None:
+        return "Gemini API Key not found in Streamlit secrets. Please set it to enable the chatbot."
+
+    try:
+        return client.generate(_build_prompt(user_input, emotion, confidence), SYSTEM_PROMPT)
+    except GeminiError as e:
+        print(f"An error occurred with the AI assistant: {e}") # Log the actual error for debugging
         return "I'm sorry, I'm having a little trouble connecting right now. Please try again in a moment."
+
+
+def stream_gemini_wellness_ai(user_input, emotion="neutral", confidence=0.0):
+    """
+    Same as ask_gemini_wellness_ai, but yields the response in chunks as
+    they arrive (suitable for st.write_stream).
+    """
+    client = _get_client()
+    if client is None:
+        yield "Gemini API Key not found in Streamlit secrets. Please set it to enable the chatbot."
+        return
+
+    try:
+        yield from client.stream(_build_prompt(user_input, emotion, confidence), SYSTEM_PROMPT)
+    except GeminiError as e:
+        print(f"An error occurred with the AI assistant: {e}") # Log the actual error for debugging
+        yield "I'm sorry, I'm having a little trouble connecting right now. Please try again in a moment."
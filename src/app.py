@@ -16,7 +16,6 @@ import sys
 from pathlib import Path
 
 import streamlit as st
-import pandas as pd
 
 # ===============================
 # Path Configuration
@@ -115,11 +114,24 @@ def main():
     # --- Emotion History ---
     if st.session_state.emotion_history:
         with st.expander("📈 Your Emotional Journey History"):
-            hist_df = pd.DataFrame(st.session_state.emotion_history)
-            hist_df["timestamp"] = pd.to_datetime(
-                hist_df["timestamp"]
-            ).dt.strftime("%Y-%m-%d %H:%M:%S")
-            st.dataframe(hist_df, use_container_width=True)
+            history = st.session_state.emotion_history
+            st.dataframe(
+                history.to_frame(),
+                use_container_width=True,
+                column_config={
+                    "timestamp": st.column_config.DatetimeColumn(
+                        "timestamp", format="YYYY-MM-DD HH:mm:ss"
+                    ),
+                    "confidence": st.column_config.NumberColumn(
+                        "confidence", format="%.1f"
+                    ),
+                },
+            )
+            if history.spilled_rows:
+                st.caption(
+                    f"Showing the latest {len(history) - history.spilled_rows} of "
+                    f"{len(history)} detections; older entries are archived on disk."
+                )
 
     # --- Footer ---
     create_resources_section()
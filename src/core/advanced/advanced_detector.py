@@ -15,7 +15,7 @@ import torchvision.transforms.functional as TF
 from pathlib import Path
 
 from src.core.advanced.face_detector import detect_faces
-from src.core.advanced.face_align import align_face, crop_face_with_padding
+from src.core.advanced.face_align import align_detection
 from src.core.advanced.face_preprocess import preprocess_face
 from src.core.advanced.efficientnet_emotion import EfficientNetEmotionModel, EMOTION_CLASSES
 from src.core.advanced.temporal_smoother import TemporalEmotionSmoother, CONFIDENCE_THRESHOLD
@@ -91,16 +91,10 @@ class AdvancedEmotionDetector:
 
         for det in face_detections:
             bbox = det["bbox"]
-            landmarks = det["landmarks"]
             face_conf = det["confidence"]
 
-            # 2. Face alignment (380×380 for EfficientNet-B4)
-            try:
-                aligned = align_face(image, landmarks, output_size=380)
-            except Exception:
-                # Fallback: simple crop + resize
-                crop = crop_face_with_padding(image, bbox)
-                aligned = cv2.resize(crop, (380, 380))
+            # 2. Face alignment (380×380 for EfficientNet-B4; crop + resize fallback)
+            aligned = align_detection(image, det, output_size=380)
 
             # 3. Preprocess
             tensor = preprocess_face(aligned)
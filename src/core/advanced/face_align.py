@@ -89,3 +89,23 @@ def crop_face_with_padding(image, bbox, padding_pct=0.25):
     if crop.size == 0:
         return image  # safety fallback
     return crop
+
+
+def align_detection(image, detection, output_size=380):
+    """
+    Aligned face for one detect_faces() result; falls back to a padded
+    bbox crop resized to output_size when alignment fails.
+
+    Args:
+        image: RGB numpy array
+        detection: dict with 'bbox' and 'landmarks' (face_detector.detect_faces)
+        output_size: square output dimension
+
+    Returns:
+        Face as numpy array (output_size, output_size, 3)
+    """
+    try:
+        return align_face(image, detection["landmarks"], output_size=output_size)
+    except Exception:
+        crop = crop_face_with_padding(image, detection["bbox"])
+        return cv2.resize(crop, (output_size, output_size))
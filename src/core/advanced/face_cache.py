@@ -0,0 +1,347 @@
+"""
+Aligned-Face Cache
+
+Runs the advanced inference face pipeline once over a dataset and stores
+the result as memory-mapped uint8 arrays, so EfficientNet training and
+evaluation see the same faces as live inference without paying for
+detection / alignment / CLAHE every epoch:
+
+    face_detector.detect_faces → face_align.align_detection
+        → face_preprocess.enhance_face (CLAHE + bilateral + resize)
+
+Usage:
+    python src/core/advanced/face_cache.py [--data-dir fer2013] [--size 380] [--workers 8]
+    python src/core/advanced/train_efficientnet.py --face-cache ...
+    python src/core/evaluate.py --classifiers efficientnet --face-cache
+
+Layout of the cache directory (default data/face_cache/<dataset>_<size>/):
+    <split>_images.npy     uint8   (N, size, size, 3) RGB, enhanced
+    <split>_labels.npy     int64   (N,) index into EMOTION_CLASSES
+    <split>_detected.npy   bool    (N,) False where no face was found and
+                                   the whole image was used
+    manifest.json          source hash, pipeline settings, per-split counts
+
+Features:
+    - Any <split>/<emotion>/ image tree (FER2013, RAF-DB); folder names
+      mapped to the 8 classes with EmotionDataset.LABEL_MAP
+    - Process pool over chunks of images; workers write straight into the
+      shared memmap, only detection flags travel back
+    - Small images are upscaled to --detect-size before detection (FER2013
+      faces are 48px, below the detectors' minimum face size)
+    - --no-detect skips detection for datasets that are already face crops
+    - ensure_face_cache() rebuilds only when the source files or pipeline
+      settings change
+    - FaceCacheDataset: memmap-backed Dataset returning uint8 (3, size, size)
+      tensors for the batched BatchAugment transforms
+
+At 380px a cached face takes 433 KB; FER2013 (~35,900 images) needs ~15.5 GB.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.advanced.efficientnet_emotion import EMOTION_CLASSES
+
+DEFAULT_DATA_DIR = PROJECT_ROOT / "fer2013"
+DEFAULT_CACHE_ROOT = PROJECT_ROOT / "data" / "face_cache"
+DEFAULT_SIZE = 380
+DEFAULT_DETECT_SIZE = 192
+
+SPLITS = ("train", "test")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def default_cache_dir(data_dir=DEFAULT_DATA_DIR, size=DEFAULT_SIZE):
+    return DEFAULT_CACHE_ROOT / f"{Path(data_dir).resolve().name}_{size}"
+
+
+# =====================================================================
+# Source scanning
+# =====================================================================
+
+def list_split(data_dir, split):
+    """Sorted (path, EMOTION_CLASSES index) pairs for one split."""
+    from src.core.advanced.train_efficientnet import EmotionDataset  # imports this module
+
+    split_dir = Path(data_dir) / split
+    if not split_dir.exists():
+        raise FileNotFoundError(f"Dataset split not found: {split_dir}")
+    emo_to_idx = {e: i for i, e in enumerate(EMOTION_CLASSES)}
+    items = []
+    for emotion_dir in sorted(split_dir.iterdir()):
+        if not emotion_dir.is_dir():
+            continue
+        canonical = EmotionDataset.LABEL_MAP.get(emotion_dir.name.lower())
+        if canonical is None:
+            print(f"  [skip] Unknown emotion folder: {emotion_dir.name}")
+            continue
+        for path in sorted(emotion_dir.iterdir()):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                items.append((path, emo_to_idx[canonical]))
+    return items
+
+
+def source_hash(data_dir):
+    """Hash of every source file's relative path, size and mtime."""
+    h = hashlib.sha256()
+    for split in SPLITS:
+        for path, label in list_split(data_dir, split):
+            st = path.stat()
+            h.update(f"{split}/{path.parent.name}/{path.name}:{st.st_size}:{int(st.st_mtime)}\n".encode())
+    return h.hexdigest()
+
+
+def pipeline_settings(size, detect, detect_size):
+    """Everything besides the source files that changes the cached pixels."""
+    settings = {"size": size, "detect": detect, "detect_size": detect_size if detect else None}
+    if detect:
+        from src.core.advanced import face_detector
+        settings["detector"] = "retinaface" if face_detector._RETINAFACE_AVAILABLE else "haar"
+    return settings
+
+
+# =====================================================================
+# Face pipeline (runs in worker processes)
+# =====================================================================
+
+def read_rgb(path):
+    image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("unreadable image")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def process_image(image, size=DEFAULT_SIZE, detect=True, detect_size=DEFAULT_DETECT_SIZE):
+    """RGB image -> (enhanced uint8 face (size, size, 3), face detected?).
+
+    The most confident detection is used; without one (or with
+    detect=False) the whole image is treated as the face crop.
+    """
+    from src.core.advanced.face_align import align_detection
+    from src.core.advanced.face_preprocess import enhance_face
+
+    detected = False
+    face = image
+    if detect:
+        from src.core.advanced.face_detector import detect_faces
+
+        short = min(image.shape[:2])
+        if short < detect_size:
+            scale = detect_size / short
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            face = image
+        detections = detect_faces(image)
+        if detections:
+            best = max(detections, key=lambda d: (d["confidence"],
+                                                  (d["bbox"][2] - d["bbox"][0]) * (d["bbox"][3] - d["bbox"][1])))
+            face = align_detection(image, best, output_size=size)
+            detected = True
+    return enhance_face(face, size), detected
+
+
+def _process_chunk(images_path, paths, start, size, detect, detect_size):
+    """Fill rows [start, start + len(paths)) of the cache memmap; returns detection flags."""
+    images = np.load(images_path, mmap_mode="r+")
+    detected = np.zeros(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            images[start + i], detected[i] = process_image(read_rgb(path), size, detect, detect_size)
+        except Exception as e:
+            print(f"  [skip] Could not process {path}: {e}")
+            images[start + i] = 0
+    images.flush()
+    return start, detected
+
+
+def _worker_init():
+    # One OpenCV thread per worker; the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+# =====================================================================
+# Building
+# =====================================================================
+
+def build_split(data_dir, cache_dir, split, size, detect, detect_size, workers, chunk_size=256):
+    """Run the face pipeline over one split into <split>_*.npy."""
+    items = list_split(data_dir, split)
+    cache_dir = Path(cache_dir)
+    images_path = cache_dir / f"{split}_images.npy"
+
+    # Allocate the memmap here; workers open it r+ and fill their rows
+    images = np.lib.format.open_memmap(images_path, mode="w+", dtype=np.uint8,
+                                       shape=(len(items), size, size, 3))
+    del images
+
+    paths = [str(p) for p, _ in items]
+    detected = np.zeros(len(items), dtype=bool)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_worker_init) as pool:
+        futures = [pool.submit(_process_chunk, str(images_path), paths[i:i + chunk_size], i,
+                               size, detect, detect_size)
+                   for i in range(0, len(paths), chunk_size)]
+        for done, future in enumerate(futures, 1):
+            start, flags = future.result()
+            detected[start:start + len(flags)] = flags
+            if done % 20 == 0 or done == len(futures):
+                print(f"[FaceCache] {split}: {min(done * chunk_size, len(paths))}/{len(paths)}")
+
+    labels = np.array([label for _, label in items], dtype=np.int64)
+    np.save(cache_dir / f"{split}_labels.npy", labels)
+    np.save(cache_dir / f"{split}_detected.npy", detected)
+    return {
+        "count": len(items),
+        "detected": int(detected.sum()),
+        "class_counts": np.bincount(labels, minlength=len(EMOTION_CLASSES)).tolist(),
+    }
+
+
+def build(data_dir=DEFAULT_DATA_DIR, cache_dir=None, size=DEFAULT_SIZE, detect=True,
+          detect_size=DEFAULT_DETECT_SIZE, workers=None):
+    """Build every split and write the manifest. Returns the manifest."""
+    cache_dir = Path(cache_dir or default_cache_dir(data_dir, size))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "classes": list(EMOTION_CLASSES),
+        "source_hash": source_hash(data_dir),
+        "pipeline": pipeline_settings(size, detect, detect_size),
+        "splits": {},
+    }
+    (cache_dir / MANIFEST_NAME).unlink(missing_ok=True)
+    for split in SPLITS:
+        stats = build_split(data_dir, cache_dir, split, size, detect, detect_size, workers)
+        manifest["splits"][split] = stats
+        print(f"[FaceCache] {split}: {stats['count']} faces ({stats['detected']} detected)")
+
+    # Manifest last: its presence marks a complete cache
+    tmp = cache_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, cache_dir / MANIFEST_NAME)
+    print(f"[FaceCache] Built {cache_dir} in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+def load_manifest(cache_dir):
+    try:
+        return json.loads((Path(cache_dir) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_face_cache(data_dir=DEFAULT_DATA_DIR, cache_dir=None, size=DEFAULT_SIZE, detect=True,
+                      detect_size=DEFAULT_DETECT_SIZE, workers=None):
+    """Cache directory for `data_dir`, (re)building only if missing or stale."""
+    cache_dir = Path(cache_dir or default_cache_dir(data_dir, size))
+    manifest = load_manifest(cache_dir)
+    if (manifest is not None
+            and manifest.get("version") == MANIFEST_VERSION
+            and manifest.get("pipeline") == pipeline_settings(size, detect, detect_size)
+            and manifest.get("source_hash") == source_hash(data_dir)):
+        return cache_dir
+    print(f"[FaceCache] Building aligned-face cache for {data_dir} (one-time)...")
+    build(data_dir, cache_dir, size, detect, detect_size, workers)
+    return cache_dir
+
+
+# =====================================================================
+# Dataset
+# =====================================================================
+
+class FaceCacheDataset(Dataset):
+    """
+    Split of an aligned-face cache read from the memmap; no decode, no
+    face pipeline at training time.
+
+    Samples are uint8 tensors of shape (3, size, size) with labels indexing
+    EMOTION_CLASSES, for batched tensor transforms (BatchAugment).
+    """
+
+    def __init__(self, cache_dir, split="train", transform=None, detected_only=False):
+        """
+        Args:
+            cache_dir: Directory written by build() / ensure_face_cache()
+            split: 'train' or 'test'
+            transform: Optional tensor transform applied per sample
+            detected_only: Drop images where no face was detected
+        """
+        self.cache_dir = Path(cache_dir)
+        self.split = split
+        self.transform = transform
+        self._images_path = self.cache_dir / f"{split}_images.npy"
+        self._images = None  # opened lazily, once per DataLoader worker
+
+        labels = np.load(self.cache_dir / f"{split}_labels.npy")
+        self.indices = np.arange(len(labels))
+        if detected_only:
+            self.indices = np.flatnonzero(np.load(self.cache_dir / f"{split}_detected.npy"))
+            labels = labels[self.indices]
+        self.labels = labels.tolist()
+
+        print(f"Loaded {len(self.labels)} cached faces from {split} set")
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(self._images_path, mmap_mode="r")
+        return self._images
+
+    def __getstate__(self):
+        # Workers re-open the memmap instead of pickling it
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        image = torch.from_numpy(np.array(self.images[self.indices[idx]])).permute(2, 0, 1)
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute aligned, enhanced faces as a uint8 memmap")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    parser.add_argument("--out-dir", default=None, help="default data/face_cache/<dataset>_<size>")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--detect-size", type=int, default=DEFAULT_DETECT_SIZE,
+                        help="upscale images whose shorter side is below this before detection")
+    parser.add_argument("--no-detect", action="store_true",
+                        help="skip face detection (dataset images are already face crops)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    args = parser.parse_args()
+
+    if args.force:
+        build(args.data_dir, args.out_dir, args.size, not args.no_detect, args.detect_size, args.workers)
+    else:
+        ensure_face_cache(args.data_dir, args.out_dir, args.size, not args.no_detect,
+                          args.detect_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
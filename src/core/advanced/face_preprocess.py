@@ -6,6 +6,9 @@ Standardizes face images before emotion model inference:
   2. Bilateral noise reduction
   3. Resize to 224×224
   4. ImageNet normalization → tensor
+
+Steps 1-3 (enhance_face) return uint8 and are also what face_cache.py
+stores, so cached training faces match inference-time preprocessing.
 """
 
 import cv2
@@ -24,16 +27,16 @@ _to_tensor_and_normalize = T.Compose([
 ])
 
 
-def preprocess_face(face_image, output_size=380):
+def enhance_face(face_image, output_size=380):
     """
-    Full preprocessing pipeline: enhance → denoise → resize → normalize.
+    Enhance → denoise → resize, without normalization.
 
     Args:
         face_image: RGB numpy array of a cropped/aligned face
         output_size: target spatial size (default 380 for EfficientNet-B4)
 
     Returns:
-        torch.Tensor of shape (3, output_size, output_size), normalized
+        uint8 RGB numpy array of shape (output_size, output_size, 3)
     """
     img = face_image.copy()
 
@@ -48,12 +51,24 @@ def preprocess_face(face_image, output_size=380):
     img = cv2.bilateralFilter(img, d=5, sigmaColor=50, sigmaSpace=50)
 
     # --- 3. Resize to target size ---
-    img = cv2.resize(img, (output_size, output_size), interpolation=cv2.INTER_LINEAR)
+    return cv2.resize(img, (output_size, output_size), interpolation=cv2.INTER_LINEAR)
 
-    # --- 4. Convert to tensor + ImageNet normalize ---
-    tensor = _to_tensor_and_normalize(img)
 
-    return tensor
+def preprocess_face(face_image, output_size=380):
+    """
+    Full preprocessing pipeline: enhance → denoise → resize → normalize.
+
+    Args:
+        face_image: RGB numpy array of a cropped/aligned face
+        output_size: target spatial size (default 380 for EfficientNet-B4)
+
+    Returns:
+        torch.Tensor of shape (3, output_size, output_size), normalized
+    """
+    img = enhance_face(face_image, output_size)
+
+    # --- 4. Convert to tensor + ImageNet normalize ---
+    return _to_tensor_and_normalize(img)
 
 
 def preprocess_batch(face_images, output_size=380):
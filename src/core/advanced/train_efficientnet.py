@@ -2,24 +2,30 @@
 Training Script: EfficientNet-B4 + CBAM on FER2013 (+ optional RAF-DB)
 
 Usage:
-    python src/core/advanced/train_efficientnet.py
+    python src/core/advanced/train_efficientnet.py [--bf16 --channels-last --compile
+        --batch-size 16 --effective-batch-size 64]   (see train_perf.py)
+    torchrun --standalone --nproc_per_node 8 src/core/advanced/train_efficientnet.py ...
+        (multi-process data parallel, see train_dist.py)
 
 Features:
     - Transfer learning from ImageNet-pretrained EfficientNet-B4
     - CBAM attention module
-    - Heavy data augmentation (flip, rotate, jitter, blur)
+    - Heavy data augmentation (flip, rotate, jitter, blur), batched on the device
+    - --face-cache: train on faces run through the inference pipeline
+      (detect → align → CLAHE/bilateral, precomputed by face_cache.py)
     - Weighted CrossEntropyLoss for class imbalance
     - ReduceLROnPlateau scheduler
     - Saves best model to models/weights/efficientnet_emotion.pth
+    - Multi-process CPU data parallel (gloo) under torchrun
 """
 
 import os
 import sys
+import argparse
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
-from torchvision import transforms
 from PIL import Image
 import numpy as np
 from pathlib import Path
@@ -30,6 +36,20 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.core.advanced.efficientnet_emotion import EfficientNetEmotionModel, EMOTION_CLASSES
+from src.core.advanced.face_cache import FaceCacheDataset, ensure_face_cache
+from src.core.batch_augment import BatchAugment
+from src.core.class_metrics import confusion_matrix, print_per_class, summarize
+from src.core.fer2013_pack import CLASSES as FER2013_CLASSES, PackedFER2013Dataset, ensure_packed
+from src.core.train_dist import (
+    all_reduce_sum, cleanup_distributed, distributed_eval_sampler, distributed_sampler,
+    main_process_first, save_on_main, setup_distributed, sync_gradients,
+)
+from src.core.train_perf import (
+    Throughput, accumulation_steps, add_perf_args, autocast, configure_threads, describe,
+    loader_kwargs, prepare_batch, prepare_model,
+)
+
+DATA_DIR = PROJECT_ROOT / "fer2013"
 
 
 # =====================================================================
@@ -96,29 +116,31 @@ class EmotionDataset(Dataset):
         return img, self.labels[idx]
 
 
+def packed_label_map():
+    """{FER2013 folder name: index in EMOTION_CLASSES} for PackedFER2013Dataset."""
+    emo_to_idx = {e: i for i, e in enumerate(EMOTION_CLASSES)}
+    return {name: emo_to_idx[EmotionDataset.LABEL_MAP[name]] for name in FER2013_CLASSES}
+
+
 # =====================================================================
 # Transforms
 # =====================================================================
 
+# Applied batch-wise on the device to uint8 (3, 48, 48) batches from
+# PackedFER2013Dataset. The crop scale reproduces Resize(400) + RandomCrop(380);
+# the upsample to 380 happens inside the same batched grid_sample / interpolate.
+
 def get_train_transforms():
-    return transforms.Compose([
-        transforms.Resize((400, 400)),
-        transforms.RandomCrop(380),
-        transforms.RandomHorizontalFlip(p=0.5),
-        transforms.RandomRotation(15),
-        transforms.ColorJitter(brightness=0.3, contrast=0.3, saturation=0.2),
-        transforms.RandomApply([transforms.GaussianBlur(3)], p=0.3),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-    ])
+    return BatchAugment(
+        out_size=380, mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225],
+        flip_p=0.5, rotation=15, crop_scale=380 / 400,
+        brightness=0.3, contrast=0.3, saturation=0.2,
+        blur_p=0.3, blur_kernel=3,
+    )
 
 
 def get_val_transforms():
-    return transforms.Compose([
-        transforms.Resize((380, 380)),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-    ])
+    return BatchAugment(out_size=380, mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
 
 
 # =====================================================================
@@ -137,19 +159,31 @@ def compute_class_weights(dataset):
     return torch.FloatTensor(weights)
 
 
-def train_one_epoch(model, loader, criterion, optimizer, device):
+def train_one_epoch(model, loader, criterion, optimizer, device, augment, args):
+    """One epoch; returns (loss, accuracy, samples/sec)."""
     model.train()
     running_loss = 0.0
     correct = 0
     total = 0
+    accum = accumulation_steps(args)
+    throughput = Throughput()
 
+    optimizer.zero_grad(set_to_none=True)
     for batch_idx, (images, labels) in enumerate(loader):
-        images, labels = images.to(device), labels.to(device)
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
+        images = prepare_batch(augment(images.to(device)), args)
+        labels = labels.to(device)
+        # Step once per effective batch (and on the last, possibly partial, one);
+        # under DDP only that micro-batch all-reduces gradients
+        step = (batch_idx + 1) % accum == 0 or batch_idx + 1 == len(loader)
+        with sync_gradients(model, step):
+            with autocast(args, device):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
+            (loss / accum).backward()
+
+        if step:
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
 
         running_loss += loss.item()
         _, preds = outputs.max(1)
@@ -159,67 +193,107 @@ def train_one_epoch(model, loader, criterion, optimizer, device):
         if (batch_idx + 1) % 20 == 0:
             print(f"    batch {batch_idx+1}/{len(loader)}  loss={loss.item():.4f}")
 
-    return running_loss / len(loader), 100.0 * correct / total
+    # Totals over all ranks (identity when not distributed)
+    seconds = throughput.seconds
+    running_loss, batches, correct, total = all_reduce_sum(running_loss, len(loader), correct, total)
+    return running_loss / batches, 100.0 * correct / total, total / seconds
 
 
 @torch.no_grad()
-def evaluate(model, loader, criterion, device):
+def evaluate(model, loader, criterion, device, augment, args):
     model.eval()
     running_loss = 0.0
     correct = 0
     total = 0
 
     for images, labels in loader:
-        images, labels = images.to(device), labels.to(device)
-        outputs = model(images)
-        loss = criterion(outputs, labels)
+        images = prepare_batch(augment(images.to(device)), args)
+        labels = labels.to(device)
+        with autocast(args, device):
+            outputs = model(images)
+            loss = criterion(outputs, labels)
         running_loss += loss.item()
         _, preds = outputs.max(1)
         total += labels.size(0)
         correct += preds.eq(labels).sum().item()
 
-    return running_loss / len(loader), 100.0 * correct / total
+    running_loss, batches, correct, total = all_reduce_sum(running_loss, len(loader), correct, total)
+    return running_loss / batches, 100.0 * correct / total
 
 
 # =====================================================================
 # Main
 # =====================================================================
 
-def main():
-    print("=" * 60)
-    print("EfficientNet-B4 + CBAM  —  Emotion Recognition Training")
-    print("=" * 60)
-
-    # ---- Config ----
-    DATA_DIR = PROJECT_ROOT / "fer2013"
-    SAVE_PATH = PROJECT_ROOT / "models" / "weights" / "efficientnet_emotion.pth"
-    SAVE_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    BATCH_SIZE = 4
-    NUM_EPOCHS = 30
-    LR = 1e-4
-    WEIGHT_DECAY = 1e-4
-
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train EfficientNet-B4 + CBAM on FER2013")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--lr-factor", type=float, default=0.5, help="ReduceLROnPlateau factor")
+    parser.add_argument("--lr-patience", type=int, default=3, help="ReduceLROnPlateau patience (epochs)")
+    parser.add_argument("--face-cache", action="store_true",
+                        help="train on the aligned-face cache (face_cache.py) instead of raw images")
+    parser.add_argument("--no-detect", action="store_true",
+                        help="face cache without face detection (images are already face crops)")
+    parser.add_argument("--detected-only", action="store_true",
+                        help="face cache: skip images where no face was detected")
+    add_perf_args(parser, batch_size=4, num_workers=2)
+    return parser.parse_args(argv)
+
+
+def prepare_data(args):
+    """Dataset directory for `args`: the aligned-face cache or the packed FER2013 arrays."""
+    if args.face_cache:
+        return ensure_face_cache(DATA_DIR, detect=not args.no_detect)
+    # Decoded once into memmap arrays
+    return ensure_packed(DATA_DIR)
+
+
+def train(args, data_dir, save_path=None, on_epoch=None, pretrained=True):
+    """Train EfficientNet-B4 + CBAM on prepare_data(args) with the hyperparameters in `args`.
+
+    `save_path` receives the best weights (None: nothing is written, e.g.
+    sweep trials). `on_epoch(epoch, metrics)` runs after each validation;
+    returning True stops training early. Returns a dict with best_acc,
+    best_epoch, epochs_run, stopped_early, final accuracy / macro-F1 of the
+    best model and the per-epoch history.
+    """
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"\nDevice: {device}")
+    print(f"Performance: {describe(args, device)}")
 
     # ---- Datasets ----
     print("\nLoading datasets...")
-    train_ds = EmotionDataset(DATA_DIR, "train", get_train_transforms())
-    val_ds = EmotionDataset(DATA_DIR, "test", get_val_transforms())
-
-    train_loader = DataLoader(train_ds, batch_size=BATCH_SIZE, shuffle=True,
-                              num_workers=2, pin_memory=(device.type == "cuda"))
-    val_loader = DataLoader(val_ds, batch_size=BATCH_SIZE, shuffle=False,
-                            num_workers=2, pin_memory=(device.type == "cuda"))
+    if args.face_cache:
+        # Faces already aligned + enhanced at 380px, as at inference time
+        train_ds = FaceCacheDataset(data_dir, "train", detected_only=args.detected_only)
+        val_ds = FaceCacheDataset(data_dir, "test", detected_only=args.detected_only)
+    else:
+        # FER2013 folder names mapped to the 8 classes
+        label_map = packed_label_map()
+        train_ds = PackedFER2013Dataset(data_dir, "train", channels=3, label_map=label_map)
+        val_ds = PackedFER2013Dataset(data_dir, "test", channels=3, label_map=label_map)
+    train_augment = get_train_transforms().to(device)
+    val_augment = get_val_transforms().to(device)
+
+    # Each rank gets its own shard under torchrun
+    train_sampler = distributed_sampler(train_ds, shuffle=True)
+    val_sampler = distributed_eval_sampler(val_ds)
+    train_loader = DataLoader(train_ds, shuffle=train_sampler is None, sampler=train_sampler,
+                              **loader_kwargs(args, device))
+    val_loader = DataLoader(val_ds, shuffle=False, sampler=val_sampler,
+                            **loader_kwargs(args, device))
 
     print(f"Train batches: {len(train_loader)},  Val batches: {len(val_loader)}")
 
     # ---- Model ----
-    model = EfficientNetEmotionModel(num_classes=8, pretrained=True).to(device)
+    model = EfficientNetEmotionModel(num_classes=8, pretrained=pretrained).to(device)
     total_params = sum(p.numel() for p in model.parameters())
     trainable = sum(p.numel() for p in model.parameters() if p.requires_grad)
     print(f"\nParameters: {total_params:,} total, {trainable:,} trainable")
+    # channels_last / DDP / torch.compile; `model` stays the module that gets saved
+    train_model = prepare_model(model, args)
 
     # ---- Loss (weighted for imbalance) ----
     class_weights = compute_class_weights(train_ds).to(device)
@@ -227,60 +301,106 @@ def main():
     criterion = nn.CrossEntropyLoss(weight=class_weights)
 
     # ---- Optimizer + Scheduler ----
-    optimizer = optim.Adam(model.parameters(), lr=LR, weight_decay=WEIGHT_DECAY)
+    optimizer = optim.Adam(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
     scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode="min",
-                                                      factor=0.5, patience=3)
+                                                      factor=args.lr_factor,
+                                                      patience=args.lr_patience)
 
     # ---- Training loop ----
     best_val_acc = 0.0
+    best_epoch = 0
+    best_state = None
+    history = []
+    stopped_early = False
 
     print("\n" + "=" * 60)
     print("Starting training...")
     print("=" * 60)
 
-    for epoch in range(1, NUM_EPOCHS + 1):
-        print(f"\nEpoch {epoch}/{NUM_EPOCHS}")
+    for epoch in range(1, args.epochs + 1):
+        print(f"\nEpoch {epoch}/{args.epochs}")
         print("-" * 40)
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
 
-        train_loss, train_acc = train_one_epoch(model, train_loader, criterion, optimizer, device)
-        val_loss, val_acc = evaluate(model, val_loader, criterion, device)
+        train_loss, train_acc, samples_per_sec = train_one_epoch(
+            train_model, train_loader, criterion, optimizer, device, train_augment, args)
+        val_loss, val_acc = evaluate(train_model, val_loader, criterion, device, val_augment, args)
         scheduler.step(val_loss)
 
         lr_now = optimizer.param_groups[0]["lr"]
-        print(f"  Train loss={train_loss:.4f}  acc={train_acc:.2f}%")
+        print(f"  Train loss={train_loss:.4f}  acc={train_acc:.2f}%  {samples_per_sec:.1f} samples/s")
         print(f"  Val   loss={val_loss:.4f}  acc={val_acc:.2f}%  lr={lr_now:.1e}")
 
         if val_acc > best_val_acc:
             best_val_acc = val_acc
-            torch.save(model.state_dict(), str(SAVE_PATH))
-            print(f"  *** Saved best model (val acc {val_acc:.2f}%) ***")
+            best_epoch = epoch
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            if save_path is not None:
+                save_on_main(best_state, str(save_path))
+                print(f"  *** Saved best model (val acc {val_acc:.2f}%) ***")
+
+        metrics = {
+            "epoch": epoch, "train_loss": train_loss, "train_acc": train_acc,
+            "val_loss": val_loss, "val_acc": val_acc, "samples_per_sec": samples_per_sec,
+        }
+        history.append(metrics)
+        if on_epoch is not None and on_epoch(epoch, metrics):
+            print(f"  Stopping early after epoch {epoch}")
+            stopped_early = True
+            break
 
     # ---- Final evaluation ----
     print("\n" + "=" * 60)
     print(f"Training complete.  Best val accuracy: {best_val_acc:.2f}%")
-    print(f"Model saved to: {SAVE_PATH}")
+    if save_path is not None:
+        print(f"Model saved to: {save_path}")
     print("=" * 60)
 
-    # Per-class accuracy
-    model.load_state_dict(torch.load(str(SAVE_PATH), map_location=device, weights_only=True))
+    # Per-class accuracy of the best weights (identical on every rank)
+    if best_state is not None:
+        model.load_state_dict(best_state)
     model.eval()
-    class_correct = [0] * 8
-    class_total = [0] * 8
+    matrix = torch.zeros(8, 8, dtype=torch.long)
 
     with torch.no_grad():
         for images, labels in val_loader:
-            images, labels = images.to(device), labels.to(device)
-            _, preds = model(images).max(1)
-            for i in range(len(labels)):
-                lab = labels[i].item()
-                class_total[lab] += 1
-                if preds[i] == labels[i]:
-                    class_correct[lab] += 1
-
-    print("\nPer-class accuracy:")
-    for i, emo in enumerate(EMOTION_CLASSES):
-        acc = 100.0 * class_correct[i] / class_total[i] if class_total[i] > 0 else 0
-        print(f"  {emo:>10s}: {acc:6.2f}%  ({class_correct[i]}/{class_total[i]})")
+            images = prepare_batch(val_augment(images.to(device)), args)
+            with autocast(args, device):
+                outputs = train_model(images)
+            matrix += confusion_matrix(outputs.argmax(1), labels, 8)
+
+    summary = summarize(all_reduce_sum(matrix), EMOTION_CLASSES)
+    print_per_class(summary)
+
+    return {
+        "best_acc": best_val_acc,
+        "best_epoch": best_epoch,
+        "epochs_run": len(history),
+        "stopped_early": stopped_early,
+        "final_acc": summary["accuracy"],
+        "macro_f1": summary["macro_f1"],
+        "history": history,
+        "state_dict": best_state,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_distributed()
+    configure_threads(args)
+
+    print("=" * 60)
+    print("EfficientNet-B4 + CBAM  —  Emotion Recognition Training")
+    print("=" * 60)
+
+    # ---- Config ----
+    SAVE_PATH = PROJECT_ROOT / "models" / "weights" / "efficientnet_emotion.pth"
+    SAVE_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    data_dir = main_process_first(prepare_data, args)
+    train(args, data_dir, SAVE_PATH)
+    cleanup_distributed()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""
+Batched Tensor Augmentation
+
+Augments whole training batches on the training device after collation,
+replacing per-sample torchvision PIL transforms in DataLoader workers.
+Workers only hand over uint8 tensors (see fer2013_pack.PackedFER2013Dataset).
+
+Features:
+    - Colour jitter (brightness / contrast / saturation), per-sample factors,
+      applied at the native 48px resolution where it is cheapest
+    - Flip, rotation and random crop folded into one affine matrix per sample
+      and applied with a single affine_grid + grid_sample, which also does
+      the resize to the model input size
+    - Gaussian blur as two grouped 1-D convolutions with per-sample sigma
+    - Evaluation mode (no random ops): one batched interpolate + normalise
+"""
+
+import math
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class BatchAugment(nn.Module):
+    """
+    Batch-wise augmentation + normalisation for (B, C, H, W) image tensors.
+
+    All random options default to off, so BatchAugment(out_size, mean, std)
+    is the evaluation pipeline.
+    """
+
+    def __init__(self, out_size=None, mean=(0.5,), std=(0.5,), flip_p=0.0, rotation=0.0,
+                 crop_scale=1.0, brightness=0.0, contrast=0.0, saturation=0.0,
+                 blur_p=0.0, blur_kernel=3, blur_sigma=(0.1, 2.0)):
+        """
+        Args:
+            out_size: Output side length (None keeps the input size)
+            mean, std: Per-channel normalisation
+            flip_p: Probability of a horizontal flip
+            rotation: Max rotation in degrees (uniform in [-rotation, rotation])
+            crop_scale: Side of the random crop relative to the resized image
+                        (e.g. 380/400 reproduces Resize(400) + RandomCrop(380))
+            brightness, contrast, saturation: Jitter strengths as in ColorJitter
+            blur_p: Probability of a Gaussian blur (applied at output resolution)
+            blur_kernel: Blur kernel size (odd)
+            blur_sigma: (min, max) blur sigma
+        """
+        super().__init__()
+        self.out_size = out_size
+        self.flip_p = flip_p
+        self.rotation = rotation
+        self.crop_scale = crop_scale
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.blur_p = blur_p
+        self.blur_kernel = blur_kernel
+        self.blur_sigma = blur_sigma
+        self.register_buffer("mean", torch.tensor(mean).view(1, -1, 1, 1), persistent=False)
+        self.register_buffer("std", torch.tensor(std).view(1, -1, 1, 1), persistent=False)
+
+    @property
+    def random(self):
+        return bool(self.flip_p or self.rotation or self.crop_scale < 1.0 or self.brightness
+                    or self.contrast or self.saturation or self.blur_p)
+
+    @torch.no_grad()
+    def forward(self, images):
+        """uint8 or float [0, 1] batch -> augmented, normalised float batch."""
+        x = images.float()
+        if images.dtype == torch.uint8:
+            x = x / 255.0
+        out_size = self.out_size or x.shape[-1]
+
+        if self.random:
+            x = self._jitter(x)
+            x = self._affine(x, out_size)
+            if self.blur_p:
+                x = self._blur(x)
+        elif x.shape[-1] != out_size or x.shape[-2] != out_size:
+            x = F.interpolate(x, size=(out_size, out_size), mode="bilinear",
+                              align_corners=False, antialias=out_size < x.shape[-1])
+
+        mean, std = self.mean.to(x.device), self.std.to(x.device)
+        return (x - mean) / std
+
+    # ------------------------------------------------------------------
+    # Ops
+    # ------------------------------------------------------------------
+
+    def _factors(self, strength, n, device):
+        if not strength:
+            return None
+        return torch.empty(n, 1, 1, 1, device=device).uniform_(max(0.0, 1 - strength), 1 + strength)
+
+    def _jitter(self, x):
+        n = x.shape[0]
+        factor = self._factors(self.brightness, n, x.device)
+        if factor is not None:
+            x = (x * factor).clamp_(0, 1)
+
+        factor = self._factors(self.contrast, n, x.device)
+        if factor is not None:
+            mean = _gray(x).mean(dim=(1, 2, 3), keepdim=True)
+            x = (mean + factor * (x - mean)).clamp_(0, 1)
+
+        factor = self._factors(self.saturation, n, x.device)
+        if factor is not None and x.shape[1] == 3:
+            gray = _gray(x)
+            x = (gray + factor * (x - gray)).clamp_(0, 1)
+        return x
+
+    def _affine(self, x, out_size):
+        """Crop, flip and rotate every sample in one grid_sample call."""
+        n, device = x.shape[0], x.device
+        angle = torch.empty(n, device=device).uniform_(-self.rotation, self.rotation) * (math.pi / 180)
+        cos, sin = torch.cos(angle), torch.sin(angle)
+        flip = torch.where(torch.rand(n, device=device) < self.flip_p, -1.0, 1.0)
+        s = self.crop_scale
+        shift = torch.empty(n, 2, device=device).uniform_(-(1 - s), 1 - s)
+
+        # input = s * Flip @ Rot @ output + shift  (normalised coordinates)
+        theta = torch.stack([
+            torch.stack([s * flip * cos, -s * flip * sin, shift[:, 0]], dim=1),
+            torch.stack([s * sin, s * cos, shift[:, 1]], dim=1),
+        ], dim=1)
+        grid = F.affine_grid(theta, (n, x.shape[1], out_size, out_size), align_corners=False)
+        return F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+
+    def _blur(self, x):
+        n, c, h, w = x.shape
+        r = self.blur_kernel // 2
+        sigma = torch.empty(n, device=x.device).uniform_(*self.blur_sigma)
+        offsets = torch.arange(-r, r + 1, device=x.device, dtype=x.dtype)
+        kernel = torch.exp(-offsets[None] ** 2 / (2 * sigma[:, None] ** 2))
+        kernel = kernel / kernel.sum(dim=1, keepdim=True)
+        # Samples that are not blurred get an identity kernel
+        identity = torch.zeros_like(kernel)
+        identity[:, r] = 1.0
+        keep = (torch.rand(n, device=x.device) < self.blur_p)[:, None]
+        kernel = torch.where(keep, kernel, identity).repeat_interleave(c, dim=0)
+
+        # Separable blur as grouped convs over all (sample, channel) planes
+        planes = x.reshape(1, n * c, h, w)
+        planes = F.conv2d(F.pad(planes, (r, r, 0, 0), mode="reflect"),
+                          kernel.view(n * c, 1, 1, -1), groups=n * c)
+        planes = F.conv2d(F.pad(planes, (0, 0, r, r), mode="reflect"),
+                          kernel.view(n * c, 1, -1, 1), groups=n * c)
+        return planes.view(n, c, h, w)
+
+
+def _gray(x):
+    if x.shape[1] == 1:
+        return x
+    weights = torch.tensor([0.299, 0.587, 0.114], device=x.device, dtype=x.dtype).view(1, 3, 1, 1)
+    return (x * weights).sum(dim=1, keepdim=True)
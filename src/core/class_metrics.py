@@ -0,0 +1,61 @@
+"""
+Classification Metrics
+
+Vectorised confusion matrices and the per-class / macro metrics derived
+from them. Shared by the training scripts (final per-class report) and
+evaluate.py.
+
+Conventions:
+    matrix[true, predicted] — rows are ground truth, columns predictions.
+    Classes without ground-truth samples (e.g. contempt on FER2013) are
+    left out of the macro averages.
+"""
+
+import torch
+
+
+def confusion_matrix(predicted, targets, num_classes):
+    """(num_classes, num_classes) int64 counts for one batch, via a single bincount."""
+    predicted = predicted.reshape(-1).long().cpu()
+    targets = targets.reshape(-1).long().cpu()
+    counts = torch.bincount(targets * num_classes + predicted, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+
+def summarize(matrix, class_names):
+    """Accuracy, macro-F1 and per-class precision / recall / F1 / support (percent)."""
+    matrix = torch.as_tensor(matrix, dtype=torch.float64)
+    true_pos = matrix.diag()
+    support = matrix.sum(1)
+    predicted = matrix.sum(0)
+    precision = true_pos / predicted.clamp(min=1)
+    recall = true_pos / support.clamp(min=1)
+    f1 = 2 * precision * recall / (precision + recall).clamp(min=1e-12)
+    present = support > 0
+
+    per_class = {
+        name: {
+            "precision": round(100 * precision[i].item(), 2),
+            "recall": round(100 * recall[i].item(), 2),
+            "f1": round(100 * f1[i].item(), 2),
+            "correct": int(true_pos[i].item()),
+            "support": int(support[i].item()),
+        }
+        for i, name in enumerate(class_names)
+    }
+    return {
+        "samples": int(support.sum().item()),
+        "accuracy": round(100 * true_pos.sum().item() / max(support.sum().item(), 1), 2),
+        "macro_f1": round(100 * f1[present].mean().item(), 2) if present.any() else 0.0,
+        "macro_recall": round(100 * recall[present].mean().item(), 2) if present.any() else 0.0,
+        "per_class": per_class,
+    }
+
+
+def print_per_class(summary):
+    """Per-class recall table as printed at the end of training."""
+    print("\nPer-class accuracy:")
+    for name, stats in summary["per_class"].items():
+        if stats["support"]:
+            print(f"  {name:>10s}: {stats['recall']:6.2f}%  ({stats['correct']}/{stats['support']})")
+    print(f"  {'macro-F1':>10s}: {summary['macro_f1']:6.2f}%")
@@ -0,0 +1,379 @@
+"""
+Knowledge Distillation: EfficientNet-B4 + CBAM -> CPU-fast student
+
+Trains a small student on the 8-class emotion space from the soft labels of
+the advanced model (teacher), so live webcam inference can run on CPU.
+
+Usage:
+    python src/core/distill.py --student fer2013_cnn --epochs 30 --bf16
+    python src/core/distill.py --student repvgg_a0 --student-size 224 --batch-size 64
+
+Outputs:
+    models/weights/fer2013_student.pth   FER2013CNN (1x48x48, 8 classes); loaded
+                                         by fer_detector ahead of the 7-class weights
+    models/weights/repvgg_student.pth    RepVGG-A0 in deploy form; drop-in for
+                                         repvgg.pth in emotion_detector
+    <output>_report.json                 accuracy / agreement / latency vs teacher
+
+Features:
+    - Teacher logits computed once per split and cached next to the packed
+      dataset (keyed by the teacher weights and dataset hashes)
+    - Loss: alpha * T^2 * KL(student/T || teacher/T) + (1 - alpha) * CE(labels)
+    - Batched augmentation and the performance options from train_perf.py
+"""
+
+import argparse
+import hashlib
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.utils.data import DataLoader, Dataset
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.advanced.efficientnet_emotion import EMOTION_CLASSES, EfficientNetEmotionModel
+from src.core.advanced.train_efficientnet import get_val_transforms as teacher_transforms
+from src.core.advanced.train_efficientnet import packed_label_map
+from src.core.batch_augment import BatchAugment
+from src.core.fer2013_pack import PackedFER2013Dataset, ensure_packed, load_manifest
+from src.core.repvgg import create_RepVGG_A0, repvgg_model_convert
+from src.core.train_fer2013 import FER2013CNN
+from src.core.train_perf import (
+    Throughput, accumulation_steps, add_perf_args, autocast, configure_threads, describe,
+    loader_kwargs, prepare_batch, prepare_model,
+)
+
+WEIGHTS_DIR = PROJECT_ROOT / "models" / "weights"
+DEFAULT_TEACHER = WEIGHTS_DIR / "efficientnet_emotion.pth"
+NUM_CLASSES = len(EMOTION_CLASSES)
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# name -> (channels, default output file)
+STUDENTS = {
+    "fer2013_cnn": (1, "fer2013_student.pth"),
+    "repvgg_a0": (3, "repvgg_student.pth"),
+}
+
+
+# =====================================================================
+# Students
+# =====================================================================
+
+def build_student(name):
+    if name == "fer2013_cnn":
+        return FER2013CNN(num_classes=NUM_CLASSES)
+    return create_RepVGG_A0(deploy=False)  # already 8 classes
+
+
+def student_transforms(name, size, train):
+    """Batch augmentation matching each student's inference preprocessing."""
+    if name == "fer2013_cnn":
+        if train:
+            return BatchAugment(mean=[0.5], std=[0.5], flip_p=0.5, rotation=10)
+        return BatchAugment(mean=[0.5], std=[0.5])
+    if train:
+        return BatchAugment(out_size=size, mean=IMAGENET_MEAN, std=IMAGENET_STD,
+                            flip_p=0.5, rotation=10, crop_scale=0.9,
+                            brightness=0.2, contrast=0.2)
+    return BatchAugment(out_size=size, mean=IMAGENET_MEAN, std=IMAGENET_STD)
+
+
+def export_student(name, model):
+    """Inference form of the student (RepVGG branches fused)."""
+    if name == "repvgg_a0":
+        return repvgg_model_convert(model.cpu())
+    return model
+
+
+# =====================================================================
+# Teacher soft labels
+# =====================================================================
+
+def _file_digest(path, length=16):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()[:length]
+
+
+def teacher_cache_path(packed_dir, teacher_path, split):
+    dataset_hash = load_manifest(packed_dir)["source_hash"][:16]
+    return Path(packed_dir) / f"teacher_{_file_digest(teacher_path)}_{dataset_hash}_{split}.npy"
+
+
+@torch.no_grad()
+def compute_teacher_logits(teacher, packed_dir, split, device, args):
+    """Teacher logits (N, 8) for a packed split, in PackedFER2013Dataset order."""
+    dataset = PackedFER2013Dataset(packed_dir, split, channels=3, label_map=packed_label_map())
+    loader = DataLoader(dataset, shuffle=False, **dict(loader_kwargs(args, device),
+                                                       batch_size=args.teacher_batch_size))
+    augment = teacher_transforms().to(device)
+    teacher.eval()
+    out = np.empty((len(dataset), NUM_CLASSES), dtype=np.float16)
+    start, pos = time.perf_counter(), 0
+    for batch_idx, (images, _) in enumerate(loader):
+        with autocast(args, device):
+            logits = teacher(prepare_batch(augment(images.to(device)), args))
+        out[pos:pos + len(logits)] = logits.float().cpu().numpy()
+        pos += len(logits)
+        if (batch_idx + 1) % 50 == 0:
+            rate = pos / (time.perf_counter() - start)
+            print(f"  teacher {split}: {pos}/{len(dataset)} ({rate:.1f} img/s)")
+    return out
+
+
+def load_teacher_logits(teacher, teacher_path, packed_dir, split, device, args):
+    """Cached teacher logits for `split`, computing them on first use."""
+    path = teacher_cache_path(packed_dir, teacher_path, split)
+    if path.exists():
+        print(f"[Distill] Using cached teacher logits {path.name}")
+        return np.load(path)
+    print(f"[Distill] Computing teacher logits for {split} (one-time)...")
+    logits = compute_teacher_logits(teacher, packed_dir, split, device, args)
+    np.save(path, logits)
+    return logits
+
+
+class SoftLabelDataset(Dataset):
+    """Packed samples paired with the teacher's logits for the same index."""
+
+    def __init__(self, base, teacher_logits):
+        assert len(base) == len(teacher_logits), "teacher cache does not match the dataset"
+        self.base = base
+        self.teacher_logits = teacher_logits
+
+    def __len__(self):
+        return len(self.base)
+
+    def __getitem__(self, idx):
+        image, label = self.base[idx]
+        return image, label, torch.from_numpy(self.teacher_logits[idx].astype(np.float32))
+
+
+# =====================================================================
+# Training
+# =====================================================================
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """Hinton et al.: softened KL to the teacher plus hard-label cross entropy."""
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.log_softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean", log_target=True,
+    ) * (temperature ** 2)
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+
+def distill_epoch(model, loader, optimizer, device, augment, args):
+    """One epoch; returns (loss, accuracy, samples/sec)."""
+    model.train()
+    running_loss, correct, total = 0.0, 0, 0
+    accum = accumulation_steps(args)
+    throughput = Throughput()
+
+    optimizer.zero_grad(set_to_none=True)
+    for batch_idx, (images, labels, teacher_logits) in enumerate(loader):
+        images = prepare_batch(augment(images.to(device)), args)
+        labels, teacher_logits = labels.to(device), teacher_logits.to(device)
+        with autocast(args, device):
+            outputs = model(images)
+        loss = distillation_loss(outputs.float(), teacher_logits, labels, args.temperature, args.alpha)
+        (loss / accum).backward()
+        if (batch_idx + 1) % accum == 0 or batch_idx + 1 == len(loader):
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+
+        running_loss += loss.item()
+        correct += outputs.argmax(1).eq(labels).sum().item()
+        total += labels.size(0)
+        throughput.add(labels.size(0))
+        if (batch_idx + 1) % 50 == 0:
+            print(f"    batch {batch_idx+1}/{len(loader)}  loss={loss.item():.4f}")
+
+    return running_loss / len(loader), 100.0 * correct / total, throughput.rate
+
+
+@torch.no_grad()
+def predict(model, loader, device, augment, args):
+    """Student logits for every sample of `loader` (float32, loader order)."""
+    model.eval()
+    outputs = []
+    for images, *_ in loader:
+        with autocast(args, device):
+            outputs.append(model(prepare_batch(augment(images.to(device)), args)).float().cpu())
+    return torch.cat(outputs)
+
+
+# =====================================================================
+# Report
+# =====================================================================
+
+@torch.no_grad()
+def measure_latency(model, shape, runs=30, batch_size=64):
+    """(median ms for one image, images/sec at `batch_size`) on CPU in fp32."""
+    model = model.cpu().eval()
+    single = torch.randn(1, *shape)
+    batch = torch.randn(batch_size, *shape)
+    for _ in range(3):
+        model(single)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(single)
+        times.append((time.perf_counter() - start) * 1000)
+    model(batch)
+    start = time.perf_counter()
+    model(batch)
+    return statistics.median(times), batch_size / (time.perf_counter() - start)
+
+
+def build_report(student_name, student, teacher, student_logits, teacher_logits, labels,
+                 student_shape, output_path, latency_runs):
+    labels = np.asarray(labels)
+    student_pred = student_logits.argmax(1).numpy()
+    teacher_pred = teacher_logits.argmax(1)
+    s_ms, s_ips = measure_latency(student, student_shape, latency_runs)
+    t_ms, t_ips = measure_latency(teacher, (3, 380, 380), max(3, latency_runs // 5), batch_size=8)
+    return {
+        "student": student_name,
+        "weights": str(output_path),
+        "classes": list(EMOTION_CLASSES),
+        "test_samples": int(len(labels)),
+        "student_accuracy": float((student_pred == labels).mean() * 100),
+        "teacher_accuracy": float((teacher_pred == labels).mean() * 100),
+        "agreement_with_teacher": float((student_pred == teacher_pred).mean() * 100),
+        "student_params": sum(p.numel() for p in student.parameters()),
+        "teacher_params": sum(p.numel() for p in teacher.parameters()),
+        "student_file_mb": round(Path(output_path).stat().st_size / 2**20, 2),
+        "student_latency_ms": round(s_ms, 2),
+        "teacher_latency_ms": round(t_ms, 2),
+        "student_images_per_sec": round(s_ips, 1),
+        "teacher_images_per_sec": round(t_ips, 1),
+        "speedup": round(t_ms / s_ms, 1),
+    }
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print(f"Distillation report ({report['test_samples']} test images)")
+    print("=" * 60)
+    print(f"{'':>22} {'teacher':>12} {'student':>12}")
+    print(f"{'accuracy %':>22} {report['teacher_accuracy']:>12.2f} {report['student_accuracy']:>12.2f}")
+    print(f"{'params':>22} {report['teacher_params']:>12,} {report['student_params']:>12,}")
+    print(f"{'latency ms (batch 1)':>22} {report['teacher_latency_ms']:>12.2f} {report['student_latency_ms']:>12.2f}")
+    print(f"{'images/sec (batched)':>22} {report['teacher_images_per_sec']:>12.1f} {report['student_images_per_sec']:>12.1f}")
+    print(f"Agreement with teacher: {report['agreement_with_teacher']:.2f}%   "
+          f"speedup: {report['speedup']}x")
+
+
+# =====================================================================
+# Main
+# =====================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distil EfficientNet-B4 + CBAM into a small student")
+    parser.add_argument("--teacher", default=str(DEFAULT_TEACHER), help="teacher state_dict")
+    parser.add_argument("--student", choices=sorted(STUDENTS), default="fer2013_cnn")
+    parser.add_argument("--student-size", type=int, default=224,
+                        help="input size for 3-channel students (fer2013_cnn is always 48)")
+    parser.add_argument("--output", default=None, help="student weights path")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="weight of the distillation term")
+    parser.add_argument("--teacher-batch-size", type=int, default=32)
+    parser.add_argument("--latency-runs", type=int, default=30)
+    add_perf_args(parser, batch_size=64, num_workers=2)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_threads(args)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    print("=" * 60)
+    print(f"Distillation: EfficientNet-B4 + CBAM -> {args.student}")
+    print("=" * 60)
+    print(f"Performance: {describe(args, device)}")
+
+    teacher_path = Path(args.teacher)
+    if not teacher_path.exists():
+        print(f"ERROR: teacher weights not found at {teacher_path}")
+        print("Train them with: python src/core/advanced/train_efficientnet.py")
+        return
+    channels, default_name = STUDENTS[args.student]
+    output_path = Path(args.output or WEIGHTS_DIR / default_name)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # ---- Teacher soft labels (cached) ----
+    packed_dir = ensure_packed(PROJECT_ROOT / "fer2013")
+    teacher = EfficientNetEmotionModel(num_classes=NUM_CLASSES, pretrained=False).to(device)
+    teacher.load_state_dict(torch.load(str(teacher_path), map_location=device, weights_only=True))
+    train_logits = load_teacher_logits(teacher, teacher_path, packed_dir, "train", device, args)
+    test_logits = load_teacher_logits(teacher, teacher_path, packed_dir, "test", device, args)
+
+    # ---- Data ----
+    label_map = packed_label_map()
+    train_ds = SoftLabelDataset(
+        PackedFER2013Dataset(packed_dir, "train", channels=channels, label_map=label_map), train_logits)
+    test_ds = SoftLabelDataset(
+        PackedFER2013Dataset(packed_dir, "test", channels=channels, label_map=label_map), test_logits)
+    train_loader = DataLoader(train_ds, shuffle=True, **loader_kwargs(args, device))
+    test_loader = DataLoader(test_ds, shuffle=False, **loader_kwargs(args, device))
+    size = 48 if args.student == "fer2013_cnn" else args.student_size
+    train_augment = student_transforms(args.student, size, train=True).to(device)
+    test_augment = student_transforms(args.student, size, train=False).to(device)
+
+    # ---- Student ----
+    student = build_student(args.student).to(device)
+    train_model = prepare_model(student, args)
+    optimizer = optim.AdamW(student.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, args.epochs))
+
+    best_acc, best_state = -1.0, None
+    for epoch in range(1, args.epochs + 1):
+        print(f"\nEpoch {epoch}/{args.epochs}")
+        loss, train_acc, rate = distill_epoch(train_model, train_loader, optimizer, device,
+                                              train_augment, args)
+        scheduler.step()
+        logits = predict(train_model, test_loader, device, test_augment, args)
+        val_acc = logits.argmax(1).eq(torch.tensor(test_ds.base.labels)).float().mean().item() * 100
+        print(f"  loss={loss:.4f}  train acc={train_acc:.2f}%  test acc={val_acc:.2f}%  "
+              f"{rate:.0f} samples/s")
+        if val_acc > best_acc:
+            best_acc = val_acc
+            best_state = {k: v.detach().clone() for k, v in student.state_dict().items()}
+
+    # ---- Export ----
+    student.load_state_dict(best_state)
+    exported = export_student(args.student, student)
+    torch.save(exported.state_dict(), str(output_path))
+    print(f"\nSaved student to {output_path}")
+
+    student_logits = predict(exported.to(device), test_loader, device, test_augment, args)
+    report = build_report(args.student, exported, teacher, student_logits,
+                          test_logits.astype(np.float32), test_ds.base.labels,
+                          (channels, size, size), output_path, args.latency_runs)
+    report_path = output_path.with_name(output_path.stem + "_report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+    print_report(report)
+    print(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Emotion Backend Benchmark
+
+End-to-end CPU latency of the face-crop classifiers selectable in
+emotion_engine (preprocessing + forward pass, N crops per call):
+
+    fer2013_cnn           fer_detector (per-face PIL transforms)
+    repvgg eager          repvgg_backend without TorchScript
+    repvgg fused          conv+ReLU fused TorchScript (default backend setting)
+    repvgg fused+cl       ... with channels_last
+    repvgg int8           static int8 (calibrated here on the benchmark crops)
+    efficientnet          EfficientNet-B4 + CBAM at 380px, no TTA (the live
+                          pipeline runs 3 TTA passes per face)
+
+Usage:
+    python src/core/emotion_backend_bench.py --faces 1 4 --runs 20 --threads 4
+
+Weights that are missing or unloadable are replaced by random ones; latency
+does not depend on the weight values.
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.repvgg import create_RepVGG_A0
+from src.core.repvgg_backend import DEFAULT_WEIGHTS, RepVGGBackend, load_deploy_model, preprocess_batch
+from src.core.repvgg_convert import quantize_int8
+
+
+def make_crops(count, seed=0):
+    """Smooth random 224x224 RGB crops (the size emotion_engine produces)."""
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(count):
+        crop = rng.integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+        crops.append(cv2.GaussianBlur(crop, (9, 9), 3))
+    return crops
+
+
+def time_call(fn, crops, runs, warmup=3):
+    """Median milliseconds per fn(crops) call."""
+    for _ in range(warmup):
+        fn(crops)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(crops)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+# =====================================================================
+# Backends
+# =====================================================================
+
+def _repvgg_model():
+    try:
+        return load_deploy_model(DEFAULT_WEIGHTS), ""
+    except Exception:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return create_RepVGG_A0(deploy=True).eval(), " (random weights)"
+
+
+def _fer_backend():
+    from src.core.fer_detector import FER2013Detector
+
+    detector = FER2013Detector()
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        detector.load_model()
+    note = " (random weights)" if "random weights" in out.getvalue() else ""
+    return detector.detect_emotion, note
+
+
+def _efficientnet_backend():
+    from src.core.advanced.efficientnet_emotion import EfficientNetEmotionModel
+    from src.core.advanced.face_preprocess import preprocess_face
+
+    model = EfficientNetEmotionModel(num_classes=8, pretrained=False).eval()
+    note = " (random weights)"
+    weights = PROJECT_ROOT / "models" / "weights" / "efficientnet_emotion.pth"
+    try:
+        model.load_state_dict(torch.load(str(weights), map_location="cpu", weights_only=True))
+        note = ""
+    except Exception:
+        pass
+
+    def classify(crops):
+        batch = torch.stack([preprocess_face(cv2.resize(c, (380, 380))) for c in crops])
+        with torch.inference_mode():
+            return model.get_probabilities(batch)
+
+    return classify, note
+
+
+def build_backends(names, calibration_crops):
+    """[(label, fn)] for the requested backends."""
+    backends = []
+    if "fer2013_cnn" in names:
+        fn, note = _fer_backend()
+        backends.append(("fer2013_cnn" + note, fn))
+    if "repvgg" in names:
+        model, note = _repvgg_model()
+        variants = [("repvgg eager", dict(optimize=False)),
+                    ("repvgg fused", dict()),
+                    ("repvgg fused+cl", dict(channels_last=True))]
+        for label, kwargs in variants:
+            backend = RepVGGBackend(**kwargs)
+            # Own copy: channels_last converts the model in place
+            with contextlib.redirect_stdout(io.StringIO()):
+                backend.load(model=copy.deepcopy(model))
+            backends.append((label + note, backend.predict))
+        int8 = RepVGGBackend(int8=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            int8.load(model=quantize_int8(model, [preprocess_batch(calibration_crops).contiguous()]))
+        backends.append(("repvgg int8" + note, int8.predict))
+    if "efficientnet" in names:
+        fn, note = _efficientnet_backend()
+        backends.append(("efficientnet" + note, fn))
+    return backends
+
+
+# =====================================================================
+# Main
+# =====================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU latency of the face-crop emotion classifiers")
+    parser.add_argument("--backends", nargs="+", default=["fer2013_cnn", "repvgg", "efficientnet"],
+                        choices=["fer2013_cnn", "repvgg", "efficientnet"])
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4], help="crops per call")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = default)")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"[BackendBench] threads={torch.get_num_threads()} faces={args.faces} runs={args.runs}")
+    backends = build_backends(args.backends, make_crops(16, seed=1))
+
+    rows = []
+    for faces in args.faces:
+        crops = make_crops(faces)
+        for label, fn in backends:
+            ms = time_call(fn, crops, args.runs)
+            rows.append((label, faces, ms))
+            print(f"[BackendBench] {label}: {faces} face(s) {ms:.1f} ms")
+
+    print(f"\n{'backend':<34} {'faces':>5} {'ms/call':>9} {'faces/s':>9}")
+    for label, faces, ms in rows:
+        print(f"{label:<34} {faces:>5} {ms:>9.1f} {faces * 1000 / ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
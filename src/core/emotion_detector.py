@@ -1,11 +1,10 @@
 import torch
 import torch.backends.cudnn as cudnn
-import torchvision.transforms as transforms
 from pathlib import Path
 import streamlit as st
 
-from PIL import Image
-from src.core.repvgg import create_RepVGG_A0 as create
+from src.core.repvgg import create_RepVGG_A0 as create, repvgg_match_state_dict
+from src.core.repvgg_backend import preprocess_batch
 
 # Lazy-loaded model — NOT created at import time
 _model = None
@@ -33,6 +32,8 @@ def init(device):
             # Or, set a flag so that `detect_emotion` can return an error
             raise FileNotFoundError(f"RepVGG weights not found at {weights_path}")
         state = torch.load(str(weights_path), map_location=device, weights_only=False)
+        # Channel-pruned weights (prune.py) have narrower layers
+        _model = repvgg_match_state_dict(_model, state).to(device)
         _model.load_state_dict(state)
         print(f"RepVGG weights loaded from {weights_path}") # Confirmation
     except FileNotFoundError as fnfe:
@@ -51,15 +52,8 @@ def detect_emotion(images, device=None, conf=True):
     """Detect emotions from a list of face crop images using RepVGG model."""
     used_device = device if device is not None else _device
     with torch.no_grad():
-        # Normalise and transform images
-        normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                        std=[0.229, 0.224, 0.225])
-        x = torch.stack([transforms.Compose([
-                transforms.Resize(256),
-                transforms.CenterCrop(224),
-                transforms.ToTensor(),
-                normalize,
-            ])(Image.fromarray(image)) for image in images])
+        # Resize/crop/normalise the whole batch at once (see repvgg_backend)
+        x = preprocess_batch(images).contiguous()
         # Feed through the model
         y = _model(x.to(used_device))
         result = []
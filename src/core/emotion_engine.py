@@ -2,8 +2,16 @@
 Emotion Detection Engine
 Centralized detection pipeline: face detection, emotion classification, fusion, text analysis.
 Extracted from app.py to separate ML logic from UI.
+
+Face-crop classifier (ERS_EMOTION_BACKEND):
+  auto           EfficientNet+CBAM pipeline when its weights load, else FER2013CNN (default)
+  efficientnet   same as auto
+  fer            always the Haar/YOLO + FER2013CNN pipeline
+  repvgg         Haar/YOLO + RepVGG-A0 fast backend (core/repvgg_backend.py)
 """
 
+import os
+
 import numpy as np
 import torch
 import cv2
@@ -11,6 +19,9 @@ import streamlit as st
 from PIL import Image
 
 from src.core.fer_detector import detect_emotion_fer
+from src.core.repvgg_backend import get_repvgg_backend
+from src.core.text_emotion import text_emotion_matcher
+from src.core.text_emotion_model import get_text_backend
 from src.core.utils.general import non_max_suppression, scale_coords
 from src.utils.constants import EMOTION_COLORS, EMOTION_EMOJIS
 
@@ -19,6 +30,26 @@ _FACE_CASCADE = cv2.CascadeClassifier(
     cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
 )
 
+EMOTION_BACKENDS = ("auto", "efficientnet", "fer", "repvgg")
+
+
+def get_emotion_backend():
+    """Configured face-crop classifier (see module docstring)."""
+    backend = os.environ.get("ERS_EMOTION_BACKEND", "auto").lower()
+    return backend if backend in EMOTION_BACKENDS else "auto"
+
+
+def classify_faces(face_crops, backend=None):
+    """[emotion, confidence] per RGB face crop with the legacy-pipeline classifier.
+
+    RepVGG falls back to FER2013CNN when its weights cannot be loaded.
+    """
+    if (backend or get_emotion_backend()) == "repvgg":
+        repvgg = get_repvgg_backend()
+        if repvgg is not None:
+            return repvgg.predict(face_crops)
+    return detect_emotion_fer(face_crops)
+
 
 # ===============================
 # Core Detection
@@ -39,9 +70,11 @@ def detect_faces_and_emotions(image, conf_thres=0.5, iou_thres=0.45):
     if not st.session_state.models_loaded:
         return None, "Models not loaded"
 
-    # --- Advanced pipeline (EfficientNet+CBAM) if available ---
+    backend = get_emotion_backend()
+
+    # --- Advanced pipeline (EfficientNet+CBAM) if available and selected ---
     adv = st.session_state.get("advanced_detector")
-    if adv is not None and adv.is_loaded:
+    if backend in ("auto", "efficientnet") and adv is not None and adv.is_loaded:
         results, err = _detect_advanced(image, adv)
         if results is not None:
             return results, err
@@ -132,7 +165,7 @@ def detect_faces_and_emotions(image, conf_thres=0.5, iou_thres=0.45):
 
         # --- Emotion classification ---
         try:
-            emotions = detect_emotion_fer(face_crops) if face_crops else []
+            emotions = classify_faces(face_crops, backend) if face_crops else []
         except Exception as e:
             st.error(f"Emotion detection error: {e}")
             emotions = []
@@ -240,28 +273,32 @@ def fuse_emotions(results):
 # ===============================
 
 def detect_emotion_from_text_simple(text):
-    """Simple keyword-based emotion detection from text."""
-    text_lower = text.lower()
-    emotion_keywords = {
-        "happy": ["happy", "joy", "excited", "great", "wonderful", "amazing", "fantastic",
-                  "love", "good", "positive", "cheerful", "delighted", "thrilled", "ecstatic"],
-        "sad": ["sad", "depressed", "down", "blue", "melancholy", "upset", "crying",
-                "tears", "hurt", "disappointed", "grief", "sorrow", "unhappy", "miserable"],
-        "anger": ["anger", "mad", "furious", "rage", "irritated", "annoyed", "frustrated",
-                  "pissed", "livid", "fuming", "outraged", "hostile", "bitter"],
-        "fear": ["anxious", "worried", "nervous", "scared", "afraid", "fear", "panic",
-                 "stress", "overwhelmed", "tense", "uneasy", "apprehensive", "terrified"],
-        "surprise": ["surprised", "shocked", "amazed", "astonished", "stunned",
-                     "bewildered", "confused", "unexpected", "wow", "incredible", "unbelievable"],
-        "disgust": ["disgusted", "grossed", "repulsed", "revolted", "sick",
-                    "nauseous", "appalled", "horrified", "disturbed", "offended"],
-    }
-    emotion_scores = {}
-    for emotion, keywords in emotion_keywords.items():
-        score = sum(1 for keyword in keywords if keyword in text_lower)
-        if score > 0:
-            emotion_scores[emotion] = score
-    return max(emotion_scores.items(), key=lambda x: x[1])[0] if emotion_scores else "neutral"
+    """Emotion detection from text.
+
+    Uses the local transformer backend (core/text_emotion_model.py) when a
+    model is installed, otherwise — or if it fails — the precompiled
+    keyword matcher from core/text_emotion.py. Returns "neutral" when
+    nothing matches.
+    """
+    backend = get_text_backend()
+    if backend is not None:
+        try:
+            emotion, _confidence = backend.predict(text)
+            return emotion
+        except Exception as e:
+            print(f"[EmotionEngine] Text model failed, using keywords: {e}")
+    return text_emotion_matcher.detect(text)
+
+
+def detect_emotions_from_texts(texts):
+    """Batch variant of detect_emotion_from_text_simple for many texts."""
+    backend = get_text_backend()
+    if backend is not None:
+        try:
+            return [emotion for emotion, _ in backend.predict_batch(texts)]
+        except Exception as e:
+            print(f"[EmotionEngine] Text model failed, using keywords: {e}")
+    return text_emotion_matcher.detect_batch(texts)
 
 
 # ===============================
@@ -0,0 +1,256 @@
+"""
+Emotion Classifier Evaluation
+
+Runs every registered face classifier over the FER2013 test split with
+batched inference and reports them side by side.
+
+Usage:
+    python src/core/evaluate.py
+    python src/core/evaluate.py --classifiers fer2013_cnn repvgg --repvgg-int8 \
+        --output data/eval_report.json --plot-dir data/eval_plots
+    python src/core/evaluate.py --classifiers efficientnet --face-cache
+
+Classifiers (weights are found the same way as at inference time):
+    fer2013_cnn    fer_detector's FER2013CNN (7 or 8 classes, pruned/distilled too)
+    repvgg         repvgg_backend (ERS_REPVGG_WEIGHTS, fused fp32 or --repvgg-int8)
+    efficientnet   EfficientNet-B4 + CBAM (models/weights/efficientnet_emotion.pth);
+                   with --face-cache on the aligned-face cache (face_cache.py),
+                   i.e. the live pipeline's detect → align → CLAHE faces
+
+Features:
+    - Packed FER2013 test set (fer2013_pack.py), each classifier's own
+      inference preprocessing applied to whole batches
+    - Confusion matrix accumulated with torch.bincount (class_metrics.py)
+    - 7- and 8-class models compared in the 8-class EMOTIONS space; FER2013
+      has no contempt samples, so contempt predictions only cost accuracy
+    - Accuracy, macro-F1, per-class recall and images/second in one report;
+      optional confusion-matrix plots via utils.metrics.ConfusionMatrix
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.advanced.face_cache import FaceCacheDataset, ensure_face_cache
+from src.core.advanced.train_efficientnet import EmotionDataset, get_val_transforms, packed_label_map
+from src.core.batch_augment import BatchAugment
+from src.core.class_metrics import confusion_matrix, summarize
+from src.core.fer2013_pack import PackedFER2013Dataset, ensure_packed
+from src.core.repvgg_backend import RepVGGBackend, preprocess_batch
+from src.utils.constants import EMOTIONS
+
+NUM_CLASSES = len(EMOTIONS)
+EFFICIENTNET_WEIGHTS = PROJECT_ROOT / "models" / "weights" / "efficientnet_emotion.pth"
+
+
+class Classifier:
+    """A model, its batch preprocessing and where its outputs land in EMOTIONS."""
+
+    def __init__(self, name, model, preprocess, labels, channels, weights, face_cache=None):
+        self.name = name
+        self.model = model
+        self.preprocess = preprocess
+        self.channels = channels
+        self.weights = str(weights)
+        self.face_cache = face_cache  # read the aligned-face cache instead of packed FER2013
+        # Output index -> EMOTIONS index ('angry' -> 'anger', ...)
+        self.output_map = torch.tensor(
+            [EMOTIONS.index(EmotionDataset.LABEL_MAP.get(label, label)) for label in labels])
+
+    @torch.no_grad()
+    def predict(self, images):
+        """uint8 (N, C, H, W) batch -> predicted EMOTIONS indices."""
+        logits = self.model(self.preprocess(images))
+        return self.output_map[logits.argmax(1).cpu()]
+
+
+# =====================================================================
+# Registry
+# =====================================================================
+
+def load_fer2013_cnn(args):
+    from src.core.fer_detector import FER2013Detector
+
+    detector = FER2013Detector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector.load_model()
+    if detector.model_path is None and not args.allow_random:
+        return None
+    compact = hasattr(detector.model, "widths")  # train_fer2013 arch: 1x48x48
+    channels = 1 if compact else 3
+    augment = BatchAugment(mean=[0.5] * channels, std=[0.5] * channels)
+    return Classifier("fer2013_cnn", detector.model.cpu().eval(), augment, detector.labels,
+                      channels, detector.model_path or "random weights")
+
+
+def load_repvgg(args):
+    backend = RepVGGBackend(int8=args.repvgg_int8)
+    if not backend.load():
+        if not args.allow_random:
+            return None
+        from src.core.repvgg import create_RepVGG_A0
+        with contextlib.redirect_stdout(io.StringIO()):
+            backend.load(model=create_RepVGG_A0(deploy=True))
+        backend.weights_path = Path("random weights")
+
+    def preprocess(images):
+        # The live backend's Resize(256) + CenterCrop(224) on HWC uint8 crops
+        crops = [np.ascontiguousarray(img.permute(1, 2, 0).numpy()) for img in images]
+        return preprocess_batch(crops).contiguous()
+
+    return Classifier(f"repvgg ({backend.mode})", backend.model, preprocess, EMOTIONS, 3,
+                      backend.weights_path)
+
+
+def load_efficientnet(args):
+    from src.core.advanced.efficientnet_emotion import EMOTION_CLASSES, EfficientNetEmotionModel
+
+    model = EfficientNetEmotionModel(num_classes=8, pretrained=False)
+    weights = EFFICIENTNET_WEIGHTS
+    try:
+        model.load_state_dict(torch.load(str(weights), map_location="cpu", weights_only=True))
+    except Exception as e:
+        print(f"[Evaluate] efficientnet: could not load {weights}: {e}")
+        if not args.allow_random:
+            return None
+        weights = "random weights"
+    if args.face_cache:
+        cache_dir = ensure_face_cache(PROJECT_ROOT / "fer2013", detect=not args.no_detect)
+        return Classifier("efficientnet (face cache)", model.eval(), get_val_transforms(),
+                          EMOTION_CLASSES, 3, weights, face_cache=cache_dir)
+    return Classifier("efficientnet", model.eval(), get_val_transforms(), EMOTION_CLASSES, 3, weights)
+
+
+CLASSIFIERS = {
+    "fer2013_cnn": load_fer2013_cnn,
+    "repvgg": load_repvgg,
+    "efficientnet": load_efficientnet,
+}
+
+
+# =====================================================================
+# Evaluation
+# =====================================================================
+
+def evaluate(classifier, packed_dir, batch_size, limit=None):
+    """Confusion matrix (EMOTIONS x EMOTIONS) and images/sec for one classifier."""
+    if classifier.face_cache is not None:
+        # Labels already index EMOTION_CLASSES (== EMOTIONS)
+        dataset = FaceCacheDataset(classifier.face_cache, "test")
+    else:
+        dataset = PackedFER2013Dataset(packed_dir, "test", channels=classifier.channels,
+                                       label_map=packed_label_map())
+    if limit and limit < len(dataset):
+        # Evenly spaced, so every class is represented
+        dataset = torch.utils.data.Subset(dataset, np.linspace(0, len(dataset) - 1, limit).astype(int))
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False)
+
+    matrix = torch.zeros(NUM_CLASSES, NUM_CLASSES, dtype=torch.long)
+    seconds, count = 0.0, 0
+    for images, labels in loader:
+        start = time.perf_counter()
+        predicted = classifier.predict(images)
+        seconds += time.perf_counter() - start
+        count += len(labels)
+        matrix += confusion_matrix(predicted, labels, NUM_CLASSES)
+    return matrix, count / max(seconds, 1e-9)
+
+
+def plot_confusion(matrix, name, plot_dir):
+    """Column-normalised heatmap via the detector ConfusionMatrix (needs matplotlib + seaborn)."""
+    try:
+        from src.core.utils.metrics import ConfusionMatrix
+    except ImportError as e:
+        print(f"[Evaluate] Skipping plot for {name}: {e}")
+        return
+    cm = ConfusionMatrix(nc=NUM_CLASSES)
+    cm.matrix[:NUM_CLASSES, :NUM_CLASSES] = matrix.T.numpy()  # ConfusionMatrix is [predicted, true]
+    out_dir = Path(plot_dir) / name.split()[0]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cm.plot(save_dir=out_dir, names=list(EMOTIONS))
+    print(f"[Evaluate] Confusion matrix plot: {out_dir / 'confusion_matrix.png'}")
+
+
+def print_report(results):
+    names = [r["classifier"] for r in results]
+    width = max(14, *(len(n) + 2 for n in names))
+    print("\n" + "=" * 60)
+    print(f"FER2013 test evaluation ({results[0]['samples']} images)")
+    print("=" * 60)
+    print(f"{'':>16}" + "".join(f"{n:>{width}}" for n in names))
+    for key, label in (("accuracy", "accuracy %"), ("macro_f1", "macro-F1 %"),
+                       ("images_per_sec", "images/sec")):
+        print(f"{label:>16}" + "".join(f"{r[key]:>{width}.2f}" for r in results))
+    print("\nPer-class recall %:")
+    for emotion in EMOTIONS:
+        if results[0]["per_class"][emotion]["support"]:
+            print(f"{emotion:>16}" + "".join(
+                f"{r['per_class'][emotion]['recall']:>{width}.2f}" for r in results))
+
+
+# =====================================================================
+# Main
+# =====================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the emotion classifiers on FER2013 test")
+    parser.add_argument("--classifiers", nargs="+", choices=sorted(CLASSIFIERS),
+                        default=list(CLASSIFIERS))
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=None, help="evaluate N evenly spaced test images only")
+    parser.add_argument("--repvgg-int8", action="store_true", help="evaluate the int8 RepVGG model")
+    parser.add_argument("--face-cache", action="store_true",
+                        help="evaluate efficientnet on the aligned-face cache (face_cache.py)")
+    parser.add_argument("--no-detect", action="store_true",
+                        help="face cache without face detection (images are already face crops)")
+    parser.add_argument("--allow-random", action="store_true",
+                        help="evaluate classifiers without weights using random weights (smoke test)")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = default)")
+    parser.add_argument("--output", default=None, help="write the report as JSON")
+    parser.add_argument("--plot-dir", default=None, help="save confusion-matrix plots here")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    packed_dir = ensure_packed(PROJECT_ROOT / "fer2013")
+    results = []
+    for key in args.classifiers:
+        classifier = CLASSIFIERS[key](args)
+        if classifier is None:
+            print(f"[Evaluate] {key}: no loadable weights, skipped (--allow-random to force)")
+            continue
+        print(f"[Evaluate] {classifier.name}: {classifier.weights}")
+        matrix, rate = evaluate(classifier, packed_dir, args.batch_size, args.limit)
+        summary = summarize(matrix, EMOTIONS)
+        results.append(dict(classifier=classifier.name, weights=classifier.weights,
+                            images_per_sec=round(rate, 1), confusion_matrix=matrix.tolist(),
+                            **summary))
+        print(f"[Evaluate] {classifier.name}: accuracy {summary['accuracy']:.2f}%  "
+              f"macro-F1 {summary['macro_f1']:.2f}%  {rate:.0f} img/s")
+        if args.plot_dir:
+            plot_confusion(matrix, classifier.name, args.plot_dir)
+
+    if not results:
+        print("[Evaluate] Nothing evaluated.")
+        return
+    print_report(results)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps({"classes": list(EMOTIONS), "results": results}, indent=2))
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
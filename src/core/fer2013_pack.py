@@ -0,0 +1,257 @@
+"""
+FER2013 Packer
+
+Decodes the FER2013 image folders once into flat uint8 arrays, so training
+epochs read pixels straight from a memory-mapped file instead of opening
+~35,900 tiny JPEGs per epoch.
+
+Usage:
+    python src/core/fer2013_pack.py [--data-dir fer2013] [--out-dir data/fer2013_packed]
+
+Layout of the packed directory:
+    <split>_images.npy   uint8   (N, 48, 48) grayscale
+    <split>_labels.npy   int64   (N,) index into CLASSES
+    manifest.json        classes, per-split counts, a hash of the source
+                         files (for staleness checks) and of the packed arrays
+
+Features:
+    - One-time decode; ensure_packed() repacks only when the source folders change
+    - PackedFER2013Dataset: memmap-backed Dataset returning uint8 tensors,
+      with optional 3-channel output and label remapping for 8-class models
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_DATA_DIR = PROJECT_ROOT / "fer2013"
+DEFAULT_PACKED_DIR = PROJECT_ROOT / "data" / "fer2013_packed"
+
+# Label order of the packed arrays (same as FER2013Dataset in train_fer2013.py)
+CLASSES = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+IMAGE_SIZE = 48
+SPLITS = ("train", "test")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+# =====================================================================
+# Source scanning
+# =====================================================================
+
+def list_split(data_dir, split):
+    """Sorted (path, label) pairs for one split of the FER2013 folder tree."""
+    split_dir = Path(data_dir) / split
+    if not split_dir.exists():
+        raise FileNotFoundError(f"Dataset split not found: {split_dir}")
+    items = []
+    for label, emotion in enumerate(CLASSES):
+        emotion_dir = split_dir / emotion
+        if not emotion_dir.exists():
+            continue
+        for path in sorted(emotion_dir.iterdir()):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                items.append((path, label))
+    return items
+
+
+def source_hash(data_dir):
+    """Hash of every source file's relative path, size and mtime."""
+    h = hashlib.sha256()
+    for split in SPLITS:
+        for path, label in list_split(data_dir, split):
+            st = path.stat()
+            h.update(f"{split}/{CLASSES[label]}/{path.name}:{st.st_size}:{int(st.st_mtime)}\n".encode())
+    return h.hexdigest()
+
+
+def _file_sha256(path, block=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(block):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# =====================================================================
+# Packing
+# =====================================================================
+
+def _decode(path):
+    try:
+        img = Image.open(path).convert("L")
+    except Exception as e:
+        print(f"  [skip] Could not read {path}: {e}")
+        return np.zeros((IMAGE_SIZE, IMAGE_SIZE), dtype=np.uint8)
+    if img.size != (IMAGE_SIZE, IMAGE_SIZE):
+        img = img.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def pack_split(data_dir, out_dir, split, workers=8):
+    """Decode one split into <split>_images.npy / <split>_labels.npy."""
+    items = list_split(data_dir, split)
+    out_dir = Path(out_dir)
+    images_path = out_dir / f"{split}_images.npy"
+    labels_path = out_dir / f"{split}_labels.npy"
+
+    images = np.lib.format.open_memmap(
+        images_path, mode="w+", dtype=np.uint8, shape=(len(items), IMAGE_SIZE, IMAGE_SIZE)
+    )
+    # PIL releases the GIL while decoding, so threads are enough here
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, pixels in enumerate(pool.map(_decode, [p for p, _ in items], chunksize=64)):
+            images[i] = pixels
+    images.flush()
+    del images
+
+    labels = np.array([label for _, label in items], dtype=np.int64)
+    np.save(labels_path, labels)
+    return {
+        "count": len(items),
+        "class_counts": np.bincount(labels, minlength=len(CLASSES)).tolist(),
+        "images_sha256": _file_sha256(images_path),
+        "labels_sha256": _file_sha256(labels_path),
+    }
+
+
+def pack(data_dir=DEFAULT_DATA_DIR, out_dir=DEFAULT_PACKED_DIR, workers=8):
+    """Pack every split and write the manifest. Returns the manifest."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "classes": CLASSES,
+        "image_size": IMAGE_SIZE,
+        "source_hash": source_hash(data_dir),
+        "splits": {},
+    }
+    for split in SPLITS:
+        manifest["splits"][split] = pack_split(data_dir, out_dir, split, workers)
+        print(f"[FER2013Pack] {split}: {manifest['splits'][split]['count']} images")
+
+    # Manifest last: its presence marks a complete pack
+    tmp = out_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, out_dir / MANIFEST_NAME)
+    print(f"[FER2013Pack] Packed to {out_dir} in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+def load_manifest(packed_dir=DEFAULT_PACKED_DIR):
+    try:
+        return json.loads((Path(packed_dir) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_packed(data_dir=DEFAULT_DATA_DIR, packed_dir=DEFAULT_PACKED_DIR, workers=8):
+    """Packed directory for `data_dir`, (re)packing only if missing or stale."""
+    manifest = load_manifest(packed_dir)
+    if (manifest is not None
+            and manifest.get("version") == MANIFEST_VERSION
+            and manifest.get("source_hash") == source_hash(data_dir)):
+        return Path(packed_dir)
+    print(f"[FER2013Pack] Packing {data_dir} (one-time decode)...")
+    pack(data_dir, packed_dir, workers)
+    return Path(packed_dir)
+
+
+# =====================================================================
+# Dataset
+# =====================================================================
+
+class PackedFER2013Dataset(Dataset):
+    """
+    FER2013 split read from the packed memmap; no per-sample decode.
+
+    Samples are uint8 tensors of shape (channels, 48, 48), so transforms must
+    be tensor transforms (convert to float with ConvertImageDtype).
+    """
+
+    def __init__(self, packed_dir=DEFAULT_PACKED_DIR, split="train", transform=None,
+                 channels=1, label_map=None):
+        """
+        Args:
+            packed_dir: Directory written by pack() / ensure_packed()
+            split: 'train' or 'test'
+            transform: Optional tensor transform applied per sample
+            channels: 1 for grayscale, 3 to repeat the gray channel as RGB
+            label_map: Optional {packed class name: target index}; samples whose
+                       class is missing from the map are dropped
+        """
+        self.packed_dir = Path(packed_dir)
+        self.split = split
+        self.transform = transform
+        self.channels = channels
+        self._images_path = self.packed_dir / f"{split}_images.npy"
+        self._images = None  # opened lazily, once per DataLoader worker
+
+        labels = np.load(self.packed_dir / f"{split}_labels.npy")
+        self.indices = np.arange(len(labels))
+        if label_map is not None:
+            lookup = np.array([label_map.get(c, -1) for c in CLASSES], dtype=np.int64)
+            labels = lookup[labels]
+            self.indices = np.flatnonzero(labels >= 0)
+            labels = labels[self.indices]
+        self.labels = labels.tolist()
+
+        print(f"Loaded {len(self.labels)} packed images from {split} set")
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(self._images_path, mmap_mode="r")
+        return self._images
+
+    def __getstate__(self):
+        # Workers re-open the memmap instead of pickling it
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        image = torch.from_numpy(np.array(self.images[self.indices[idx]]))[None]
+        if self.channels == 3:
+            image = image.expand(3, -1, -1)
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack FER2013 into uint8 memmap arrays")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    parser.add_argument("--out-dir", default=str(DEFAULT_PACKED_DIR))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--force", action="store_true", help="repack even if up to date")
+    args = parser.parse_args()
+
+    if args.force:
+        pack(args.data_dir, args.out_dir, args.workers)
+    else:
+        ensure_packed(args.data_dir, args.out_dir, args.workers)
+
+
+if __name__ == "__main__":
+    main()
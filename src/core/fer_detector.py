@@ -17,6 +17,8 @@ import sys
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.utils.constants import EMOTIONS
+
 
 class FER2013CNN(nn.Module):
     """
@@ -97,7 +99,14 @@ class FER2013CNN(nn.Module):
 class FER2013Detector:
     """
     Emotion detector using FER2013-trained model.
-    Maps 7 emotions: angry, disgust, fear, happy, sad, surprise, neutral
+    Maps 7 emotions: angry, disgust, fear, happy, sad, surprise, neutral,
+    or the app's 8 emotions when loaded with distilled 8-class weights
+    (see distill.py).
+    
+    The architecture is read from the weight file: this module's 3-channel
+    FER2013CNN, or the compact 1-channel FER2013CNN from train_fer2013.py.
+    Weights are tried in order: ERS_FER_WEIGHTS, fer2013_pruned.pth,
+    fer2013_student.pth, fer2013_cnn_best.pth, fer2013_cnn.pth.
     """
     
     # FER2013 emotion labels
@@ -108,6 +117,7 @@ class FER2013Detector:
         self.model = None
         self.model_path = None
         self.is_loaded = False
+        self.labels = self.EMOTION_LABELS
         
         # Image preprocessing for FER2013
         self.transform = transforms.Compose([
@@ -115,38 +125,65 @@ class FER2013Detector:
             transforms.ToTensor(),
             transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
         ])
+    
+    @staticmethod
+    def _candidate_paths():
+        weights_dir = PROJECT_ROOT / "models" / "weights"
+        paths = [
+            weights_dir / "fer2013_pruned.pth",
+            weights_dir / "fer2013_student.pth",
+            weights_dir / "fer2013_cnn_best.pth",
+            weights_dir / "fer2013_cnn.pth",
+        ]
+        override = os.environ.get("ERS_FER_WEIGHTS")
+        if override:
+            paths.insert(0, Path(override))
+        return paths
+    
+    def _build_model(self, state_dict):
+        """Model, labels and transform matching a state_dict."""
+        num_classes = state_dict[[k for k in state_dict if k.endswith('.weight')][-1]].shape[0]
+        labels = EMOTIONS if num_classes == len(EMOTIONS) else self.EMOTION_LABELS
+        if 'grayscale.weight' in state_dict:
+            return FER2013CNN(num_classes=num_classes), labels, self.transform
+        
+        # Compact single-channel model (train_fer2013.py / distill.py / prune.py)
+        from src.core.train_fer2013 import FER2013CNN as CompactFER2013CNN
+        transform = transforms.Compose([
+            transforms.Grayscale(num_output_channels=1),
+            transforms.Resize((48, 48)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.5], std=[0.5])
+        ])
+        widths = CompactFER2013CNN.widths_from_state_dict(state_dict)
+        return CompactFER2013CNN(num_classes=num_classes, widths=widths), labels, transform
         
     def load_model(self):
         """Load the FER2013 trained model"""
         if self.is_loaded:
             return True
-            
-        # Create model
-        self.model = FER2013CNN(num_classes=7).to(self.device)
-        
-        # Model path - check for trained model first
-        self.model_path = PROJECT_ROOT / "models" / "weights" / "fer2013_cnn.pth"
-        best_model_path = PROJECT_ROOT / "models" / "weights" / "fer2013_cnn_best.pth"
         
-        # Try to load the best model first, then regular model
-        load_path = None
-        if best_model_path.exists():
-            load_path = best_model_path
-            print(f"Loading best trained model from {load_path}")
-        elif self.model_path.exists():
-            load_path = self.model_path
-            print(f"Loading trained model from {load_path}")
-        
-        if load_path and load_path.exists():
+        # Try the pruned and distilled models first, then the best model, then regular model
+        self.model = None
+        for load_path in self._candidate_paths():
+            if not load_path.exists():
+                continue
             try:
                 state_dict = torch.load(load_path, map_location=self.device, weights_only=True)
-                self.model.load_state_dict(state_dict)
-                print("Successfully loaded FER2013 trained model!")
+                model, labels, transform = self._build_model(state_dict)
+                model.load_state_dict(state_dict)
             except Exception as e:
-                print(f"Could not load trained model weights: {e}")
-                print("Using untrained model - results may be less accurate")
-        else:
-            print("No trained model found. Model will use random weights.")
+                print(f"Could not load trained model weights from {load_path}: {e}")
+                continue
+            self.model, self.labels, self.transform = model.to(self.device), labels, transform
+            self.model_path = load_path
+            print(f"Successfully loaded FER2013 trained model from {load_path} "
+                  f"({len(labels)} classes)")
+            break
+        
+        if self.model is None:
+            self.model = FER2013CNN(num_classes=7).to(self.device)
+            print("No loadable trained model found. Model will use random weights.")
             print("Run train_fer2013.py to train the model on FER2013 dataset.")
             
         self.model.eval()
@@ -217,7 +254,7 @@ class FER2013Detector:
                 confidence_val = confidence.item() * 100
                 
                 # Map to emotion label
-                emotion = self.EMOTION_LABELS[emotion_idx]
+                emotion = self.labels[emotion_idx]
                 
                 results.append([emotion, confidence_val])
                 
@@ -0,0 +1,356 @@
+"""
+Structured Channel Pruning: FER2013CNN and RepVGG-A0
+
+Removes whole conv filters / hidden units (not individual weights), so the
+result is a smaller dense model that is actually faster on CPU. Each pruning
+ratio is fine-tuned on the packed FER2013 data and the sweep is reported as
+an accuracy vs. latency Pareto table.
+
+Usage:
+    python src/core/prune.py --model fer2013_cnn --ratios 0.25 0.5 0.625 0.75 --epochs 5
+    python src/core/prune.py --model repvgg_a0 --source models/weights/repvgg_student.pth \
+        --input-size 224 --ratios 0.25 0.5 --epochs 3 --bf16
+
+Outputs:
+    models/weights/fer2013_pruned.pth    FER2013CNN with narrower layers; loaded by
+                                         fer_detector ahead of the other weights
+    models/weights/repvgg_pruned.pth     RepVGG-A0 deploy form; drop-in for repvgg.pth
+    <output>_report.json                 the Pareto table and the chosen ratio
+
+Features:
+    - Channels ranked by L1 norm of their filters (BatchNorm scale folded in
+      for FER2013CNN); the same ratio is applied to every prunable layer
+    - Kept widths rounded to a multiple of --round-to for SIMD-friendly shapes
+    - RepVGG is pruned in deploy form, where every block is a plain conv + ReLU
+      chain (training-form weights are converted first)
+    - Chosen model: the fastest one within --max-drop accuracy points of the
+      unpruned source
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.advanced.train_efficientnet import packed_label_map
+from src.core.distill import measure_latency, student_transforms
+from src.core.fer2013_pack import PackedFER2013Dataset, ensure_packed
+from src.core.repvgg import create_RepVGG_A0, repvgg_match_state_dict
+from src.core.repvgg_backend import load_deploy_model
+from src.core.train_fer2013 import FER2013CNN, train_epoch, validate
+from src.core.train_perf import (
+    add_perf_args, configure_threads, describe, loader_kwargs, prepare_model,
+)
+
+WEIGHTS_DIR = PROJECT_ROOT / "models" / "weights"
+
+# name -> (input channels, source weights in preference order, default output file)
+MODELS = {
+    "fer2013_cnn": (1, ("fer2013_student.pth", "fer2013_cnn_best.pth", "fer2013_cnn.pth"),
+                    "fer2013_pruned.pth"),
+    "repvgg_a0": (3, ("repvgg_student.pth", "repvgg.pth"), "repvgg_pruned.pth"),
+}
+
+# FER2013CNN: (conv, batchnorm) prefixes in forward order
+FER_CONVS = (("features.0", "features.1"), ("features.4", "features.5"), ("features.8", "features.9"))
+FER_SPATIAL = 6 * 6  # feature map size entering the classifier
+
+
+# =====================================================================
+# Channel ranking
+# =====================================================================
+
+def filter_scores(weight, bn=None):
+    """L1 norm of each output filter, scaled by |gamma| / std when a BatchNorm follows."""
+    scores = weight.detach().abs().flatten(1).sum(1).float()
+    if bn is not None:
+        gamma, running_var, eps = bn
+        scores = scores * (gamma.detach().abs() / (running_var + eps).sqrt())
+    return scores
+
+
+def keep_count(channels, ratio, round_to=8, min_channels=8):
+    """Channels left after removing `ratio` of them, rounded to a multiple of `round_to`."""
+    keep = channels * (1.0 - ratio)
+    if round_to > 1:
+        keep = round(keep / round_to) * round_to
+    return int(min(channels, max(min_channels, keep)))
+
+
+def select_channels(scores, keep):
+    """Indices of the `keep` highest-scoring channels, in their original order."""
+    return torch.topk(scores, keep).indices.sort().values
+
+
+# =====================================================================
+# State-dict surgery
+# =====================================================================
+
+def prune_fer2013_cnn(state_dict, ratio, round_to=8):
+    """Pruned copy of a FER2013CNN state_dict (conv filters and hidden FC units)."""
+    sd = {k: v.clone() for k, v in state_dict.items()}
+    prev = None  # kept input channels of the current layer
+    for conv, bn in FER_CONVS:
+        if prev is not None:
+            sd[f"{conv}.weight"] = sd[f"{conv}.weight"][:, prev]
+        bn_stats = (sd[f"{bn}.weight"], sd[f"{bn}.running_var"], 1e-5)
+        scores = filter_scores(sd[f"{conv}.weight"], bn_stats)
+        prev = select_channels(scores, keep_count(len(scores), ratio, round_to))
+        for key in (f"{conv}.weight", f"{conv}.bias", f"{bn}.weight", f"{bn}.bias",
+                    f"{bn}.running_mean", f"{bn}.running_var"):
+            sd[key] = sd[key][prev]
+
+    # Flatten is channel-major: drop the 6x6 block of FC inputs of each removed channel
+    fc1 = sd["classifier.1.weight"]
+    sd["classifier.1.weight"] = fc1.view(fc1.shape[0], -1, FER_SPATIAL)[:, prev].flatten(1)
+
+    hidden = select_channels(filter_scores(sd["classifier.1.weight"]),
+                             keep_count(fc1.shape[0], ratio, round_to))
+    sd["classifier.1.weight"] = sd["classifier.1.weight"][hidden]
+    sd["classifier.1.bias"] = sd["classifier.1.bias"][hidden]
+    sd["classifier.4.weight"] = sd["classifier.4.weight"][:, hidden]
+    return {k: v.contiguous() for k, v in sd.items()}
+
+
+def prune_repvgg(state_dict, ratio, round_to=8):
+    """Pruned copy of a deploy-form RepVGG state_dict (every block's filters)."""
+    sd = {k: v.clone() for k, v in state_dict.items()}
+    blocks = [k[:-len(".rbr_reparam.weight")] for k in sd if k.endswith(".rbr_reparam.weight")]
+    prev, prev_channels = None, 3
+    for block in blocks:
+        weight_key, bias_key = f"{block}.rbr_reparam.weight", f"{block}.rbr_reparam.bias"
+        if sd[weight_key].shape[1] != prev_channels:
+            raise ValueError(f"{block}: grouped RepVGG convs cannot be pruned")
+        if prev is not None:
+            sd[weight_key] = sd[weight_key][:, prev]
+        scores = filter_scores(sd[weight_key])
+        prev_channels = len(scores)
+        prev = select_channels(scores, keep_count(len(scores), ratio, round_to))
+        sd[weight_key], sd[bias_key] = sd[weight_key][prev], sd[bias_key][prev]
+    sd["linear.weight"] = sd["linear.weight"][:, prev]
+    return {k: v.contiguous() for k, v in sd.items()}
+
+
+PRUNERS = {"fer2013_cnn": prune_fer2013_cnn, "repvgg_a0": prune_repvgg}
+
+
+# =====================================================================
+# Models
+# =====================================================================
+
+def build_model(name, state_dict):
+    """Dense model with the layer widths stored in `state_dict`, weights loaded."""
+    if name == "fer2013_cnn":
+        model = FER2013CNN(num_classes=state_dict["classifier.4.weight"].shape[0],
+                           widths=FER2013CNN.widths_from_state_dict(state_dict))
+    else:
+        model = repvgg_match_state_dict(create_RepVGG_A0(deploy=True), state_dict)
+    model.load_state_dict(state_dict)
+    return model
+
+
+def load_source(name, path):
+    """Source state_dict on CPU; RepVGG training-form weights are converted to deploy form."""
+    if name == "repvgg_a0":
+        return load_deploy_model(path).state_dict()
+    return torch.load(str(path), map_location="cpu", weights_only=True)
+
+
+def default_source(name):
+    _, candidates, _ = MODELS[name]
+    for filename in candidates:
+        if (WEIGHTS_DIR / filename).exists():
+            return WEIGHTS_DIR / filename
+    return WEIGHTS_DIR / candidates[-1]
+
+
+def num_classes(model):
+    return list(model.parameters())[-1].shape[0]
+
+
+def count_params(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+# =====================================================================
+# Sweep
+# =====================================================================
+
+def finetune(model, train_loader, test_loader, device, train_augment, test_augment, args):
+    """Fine-tune a pruned model; returns (best test accuracy, best state_dict on CPU)."""
+    train_model = prepare_model(model, args)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.AdamW(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, args.epochs))
+
+    best_acc, best_state = -1.0, None
+    for epoch in range(1, args.epochs + 1):
+        loss, train_acc, rate = train_epoch(train_model, train_loader, criterion, optimizer,
+                                            device, train_augment, args)
+        scheduler.step()
+        _, val_acc = validate(train_model, test_loader, criterion, device, test_augment, args)
+        print(f"  epoch {epoch}/{args.epochs}: loss={loss:.4f}  train acc={train_acc:.2f}%  "
+              f"test acc={val_acc:.2f}%  {rate:.0f} samples/s")
+        if val_acc > best_acc:
+            best_acc = val_acc
+            best_state = {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
+    return best_acc, best_state
+
+
+def pareto_front(rows):
+    """Mark rows that no other row beats on both accuracy and latency."""
+    for row in rows:
+        row["pareto"] = not any(
+            other["accuracy"] >= row["accuracy"] and other["latency_ms"] <= row["latency_ms"]
+            and (other["accuracy"], other["latency_ms"]) != (row["accuracy"], row["latency_ms"])
+            for other in rows
+        )
+    return rows
+
+
+def choose(rows, max_drop):
+    """Fastest row within `max_drop` accuracy points of the unpruned baseline."""
+    baseline = next(row for row in rows if row["ratio"] == 0.0)
+    eligible = [row for row in rows if row["accuracy"] >= baseline["accuracy"] - max_drop]
+    return min(eligible, key=lambda row: row["latency_ms"])
+
+
+def print_table(rows, chosen):
+    print("\n" + "=" * 60)
+    print("Pruning sweep (accuracy vs CPU latency)")
+    print("=" * 60)
+    print(f"{'ratio':>6} {'widths':>22} {'params':>10} {'acc %':>7} {'ms':>7} {'img/s':>8}  pareto")
+    for row in rows:
+        widths = "/".join(str(w) for w in row["widths"])
+        if len(widths) > 22:
+            widths = f"{sum(row['widths'])} ch"
+        mark = "*" if row["pareto"] else ""
+        chosen_mark = "  <- chosen" if row is chosen else ""
+        print(f"{row['ratio']:>6.3f} {widths:>22} {row['params']:>10,} {row['accuracy']:>7.2f} "
+              f"{row['latency_ms']:>7.2f} {row['images_per_sec']:>8.1f}  {mark:^6}{chosen_mark}")
+
+
+def layer_widths(name, state_dict):
+    if name == "fer2013_cnn":
+        return list(FER2013CNN.widths_from_state_dict(state_dict))
+    return [v.shape[0] for k, v in state_dict.items() if k.endswith(".rbr_reparam.weight")]
+
+
+# =====================================================================
+# Main
+# =====================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Structured channel pruning + fine-tuning sweep")
+    parser.add_argument("--model", choices=sorted(MODELS), default="fer2013_cnn")
+    parser.add_argument("--source", default=None,
+                        help="weights to prune (default: first existing trained weights)")
+    parser.add_argument("--output", default=None, help="path for the chosen pruned weights")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.25, 0.5, 0.625, 0.75],
+                        help="fraction of channels removed from every prunable layer")
+    parser.add_argument("--round-to", type=int, default=8, help="round kept widths to a multiple")
+    parser.add_argument("--max-drop", type=float, default=1.0,
+                        help="accuracy points the chosen model may lose vs the source")
+    parser.add_argument("--input-size", type=int, default=224,
+                        help="input size for repvgg_a0 (fer2013_cnn is always 48)")
+    parser.add_argument("--epochs", type=int, default=5, help="fine-tuning epochs per ratio")
+    parser.add_argument("--lr", type=float, default=5e-4)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--latency-runs", type=int, default=30)
+    add_perf_args(parser, batch_size=64, num_workers=2)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_threads(args)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    print("=" * 60)
+    print(f"Structured pruning: {args.model}")
+    print("=" * 60)
+    print(f"Performance: {describe(args, device)}")
+
+    channels, _, default_name = MODELS[args.model]
+    source_path = Path(args.source) if args.source else default_source(args.model)
+    if not source_path.exists():
+        print(f"ERROR: source weights not found at {source_path}")
+        return
+    output_path = Path(args.output or WEIGHTS_DIR / default_name)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    source = load_source(args.model, source_path)
+    base_model = build_model(args.model, source)
+    print(f"Source: {source_path} ({count_params(base_model):,} params, "
+          f"{num_classes(base_model)} classes)")
+
+    # ---- Data (8-class models use the EMOTIONS order) ----
+    packed_dir = ensure_packed(PROJECT_ROOT / "fer2013")
+    label_map = packed_label_map() if num_classes(base_model) == 8 else None
+    train_ds = PackedFER2013Dataset(packed_dir, "train", channels=channels, label_map=label_map)
+    test_ds = PackedFER2013Dataset(packed_dir, "test", channels=channels, label_map=label_map)
+    train_loader = DataLoader(train_ds, shuffle=True, **loader_kwargs(args, device))
+    test_loader = DataLoader(test_ds, shuffle=False, **loader_kwargs(args, device))
+    size = 48 if args.model == "fer2013_cnn" else args.input_size
+    train_augment = student_transforms(args.model, size, train=True).to(device)
+    test_augment = student_transforms(args.model, size, train=False).to(device)
+    input_shape = (channels, size, size)
+
+    # ---- Sweep ----
+    rows, states = [], {}
+    for ratio in [0.0] + sorted(r for r in args.ratios if r > 0):
+        print(f"\n[Prune] ratio {ratio:.3f}")
+        if ratio == 0.0:
+            state = source
+            _, acc = validate(base_model.to(device), test_loader, nn.CrossEntropyLoss(),
+                              device, test_augment, args)
+        else:
+            model = build_model(args.model, PRUNERS[args.model](source, ratio, args.round_to))
+            acc, state = finetune(model.to(device), train_loader, test_loader, device,
+                                  train_augment, test_augment, args)
+        model = build_model(args.model, state)
+        ms, ips = measure_latency(model, input_shape, args.latency_runs)
+        rows.append({
+            "ratio": ratio,
+            "widths": layer_widths(args.model, state),
+            "params": count_params(model),
+            "accuracy": round(acc, 2),
+            "latency_ms": round(ms, 3),
+            "images_per_sec": round(ips, 1),
+        })
+        states[ratio] = state
+        print(f"[Prune] ratio {ratio:.3f}: acc={acc:.2f}%  {ms:.2f} ms  {ips:.0f} img/s")
+
+    pareto_front(rows)
+    chosen = choose(rows, args.max_drop)
+    print_table(rows, chosen)
+
+    # ---- Export ----
+    torch.save(states[chosen["ratio"]], str(output_path))
+    report = {
+        "model": args.model,
+        "source": str(source_path),
+        "weights": str(output_path),
+        "input_shape": list(input_shape),
+        "max_drop": args.max_drop,
+        "fine_tune_epochs": args.epochs,
+        "chosen_ratio": chosen["ratio"],
+        "rows": rows,
+    }
+    report_path = output_path.with_name(output_path.stem + "_report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved ratio {chosen['ratio']} model to {output_path}")
+    print(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -300,4 +300,23 @@ def repvgg_model_convert(model:torch.nn.Module, save_path=None, do_copy=True):
             module.switch_to_deploy()
     if save_path is not None:
         torch.save(model.state_dict(), save_path)
-    return model
\ No newline at end of file
+    return model
+
+#   Deploy-form models whose layer widths differ from the stock configuration (e.g. channel-pruned
+#   by src/core/prune.py) are loaded by resizing every reparam conv and the classifier to the
+#   shapes stored in the state_dict first:
+#   model = repvgg_match_state_dict(create_RepVGG_A0(deploy=True), state_dict)
+#   model.load_state_dict(state_dict)
+def repvgg_match_state_dict(model:torch.nn.Module, state_dict):
+    for name, module in model.named_modules():
+        if isinstance(module, RepVGGBlock) and hasattr(module, 'rbr_reparam'):
+            weight = state_dict[name + '.rbr_reparam.weight']
+            conv = module.rbr_reparam
+            if tuple(weight.shape) != tuple(conv.weight.shape):
+                module.rbr_reparam = nn.Conv2d(in_channels=weight.shape[1] * conv.groups, out_channels=weight.shape[0],
+                                               kernel_size=conv.kernel_size, stride=conv.stride, padding=conv.padding,
+                                               dilation=conv.dilation, groups=conv.groups, bias=True, padding_mode=conv.padding_mode)
+    weight = state_dict['linear.weight']
+    if tuple(weight.shape) != tuple(model.linear.weight.shape):
+        model.linear = nn.Linear(weight.shape[1], weight.shape[0])
+    return model
@@ -0,0 +1,245 @@
+"""
+RepVGG Fast Emotion Backend
+
+Deploy-form RepVGG-A0 face-crop classifier tuned for CPU inference; one of
+the classifiers selectable in emotion_engine (ERS_EMOTION_BACKEND=repvgg).
+
+Features:
+  - Training-time, deploy-form and channel-pruned checkpoints all load
+    (training branches are fused with repvgg_model_convert on the fly)
+  - Batched NumPy/OpenCV preprocessing: one cv2.resize per crop, then a
+    single vectorised normalise for the whole batch (no PIL, no per-call
+    transforms.Compose)
+  - Conv+ReLU fusion: fp32 models are traced and frozen with
+    torch.jit.optimize_for_inference (oneDNN conv+ReLU kernels)
+  - Optional channels_last and int8 (static quantisation, produced
+    offline by repvgg_convert.py --int8)
+
+Environment:
+  ERS_REPVGG_WEIGHTS         checkpoint path (default models/weights/repvgg.pth)
+  ERS_REPVGG_INT8            "1" to use <weights>_int8.pt when it exists
+  ERS_REPVGG_CHANNELS_LAST   "1" for channels_last activations (fp32 only)
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from src.core.repvgg import RepVGGBlock, create_RepVGG_A0, repvgg_match_state_dict, repvgg_model_convert
+from src.utils.constants import EMOTIONS
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_WEIGHTS = PROJECT_ROOT / "models" / "weights" / "repvgg.pth"
+
+INPUT_SIZE = 224
+RESIZE_SIZE = 256  # shorter side before the centre crop (torchvision Resize(256) + CenterCrop(224))
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# (x / 255 - mean) / std  ==  x * _SCALE - _OFFSET
+_SCALE = 1.0 / (255.0 * IMAGENET_STD)
+_OFFSET = IMAGENET_MEAN / IMAGENET_STD
+
+
+def int8_path(weights_path):
+    """Where repvgg_convert.py --int8 writes the quantised TorchScript model."""
+    weights_path = Path(weights_path)
+    return weights_path.with_name(weights_path.stem + "_int8.pt")
+
+
+# =====================================================================
+# Preprocessing
+# =====================================================================
+
+def preprocess_batch(images, size=INPUT_SIZE, resize=RESIZE_SIZE):
+    """RGB uint8 crops -> normalised float32 (N, 3, size, size) tensor.
+
+    Same geometry as Resize(resize) + CenterCrop(size). The returned tensor
+    is an NCHW view of NHWC memory, i.e. already channels_last; call
+    .contiguous() for the default layout.
+    """
+    batch = np.empty((len(images), size, size, 3), dtype=np.uint8)
+    for i, image in enumerate(images):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+        h, w = image.shape[:2]
+        scale = resize / min(h, w)
+        new_h, new_w = max(size, round(h * scale)), max(size, round(w * scale))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        resized = cv2.resize(image, (new_w, new_h), interpolation=interpolation)
+        top, left = int(round((new_h - size) / 2.0)), int(round((new_w - size) / 2.0))
+        batch[i] = resized[top:top + size, left:left + size]
+
+    x = batch.astype(np.float32)
+    x *= _SCALE
+    x -= _OFFSET
+    return torch.from_numpy(x).permute(0, 3, 1, 2)
+
+
+# =====================================================================
+# Model preparation
+# =====================================================================
+
+def read_checkpoint(weights_path, map_location="cpu"):
+    """Plain state_dict from a checkpoint (unwraps {'state_dict': ...} and DDP prefixes)."""
+    state = torch.load(str(weights_path), map_location=map_location, weights_only=False)
+    if isinstance(state, dict) and "state_dict" in state:
+        state = state["state_dict"]
+    elif isinstance(state, dict) and "model" in state:
+        state = state["model"]
+    return {k.removeprefix("module."): v for k, v in state.items()}
+
+
+def is_training_form(state):
+    return any(".rbr_dense." in k for k in state)
+
+
+def load_deploy_model(weights_path, map_location="cpu"):
+    """Deploy-form RepVGG-A0 from a training, deploy or pruned checkpoint."""
+    state = read_checkpoint(weights_path, map_location)
+    if is_training_form(state):
+        model = create_RepVGG_A0(deploy=False)
+        model.load_state_dict(state)
+        return repvgg_model_convert(model, do_copy=False).eval()
+
+    model = repvgg_match_state_dict(create_RepVGG_A0(deploy=True), state)
+    model.load_state_dict(state)
+    return model.eval()
+
+
+def fuse_conv_relu(model):
+    """Fuse each deploy block's conv and ReLU into one ConvReLU2d module (in place).
+
+    Needed before static int8 quantisation so the ReLU runs inside the
+    quantised conv kernel.
+    """
+    for module in model.modules():
+        if isinstance(module, RepVGGBlock) and hasattr(module, "rbr_reparam"):
+            if not isinstance(module.se, torch.nn.Identity):
+                continue
+            torch.ao.quantization.fuse_modules(module, [["rbr_reparam", "nonlinearity"]], inplace=True)
+    return model
+
+
+def quantized_engine():
+    """Best available CPU int8 engine (x86 / fbgemm on Intel & AMD, qnnpack on ARM)."""
+    engines = torch.backends.quantized.supported_engines
+    return next((e for e in ("x86", "fbgemm", "qnnpack") if e in engines), engines[0])
+
+
+def optimize_fp32(model, channels_last=False):
+    """Trace + freeze with conv/ReLU fusion for CPU inference; eager model on failure."""
+    example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+        example = example.contiguous(memory_format=torch.channels_last)
+    try:
+        with torch.no_grad():
+            return torch.jit.optimize_for_inference(torch.jit.trace(model, example))
+    except Exception as e:
+        print(f"[RepVGGBackend] TorchScript optimisation failed, using eager model: {e}")
+        return model
+
+
+# =====================================================================
+# Backend
+# =====================================================================
+
+class RepVGGBackend:
+    """Batched RepVGG-A0 classifier for RGB face crops."""
+
+    def __init__(self, weights_path=None, int8=False, channels_last=False, optimize=True):
+        self.weights_path = Path(weights_path or DEFAULT_WEIGHTS)
+        self.int8 = int8
+        self.channels_last = channels_last
+        self.optimize = optimize
+
+        self.model = None
+        self.mode = None
+        self.is_loaded = False
+
+    def load(self, model=None):
+        """Load and optimise the model. Returns True on success.
+
+        `model` skips reading the checkpoint: a deploy-form RepVGG, or with
+        int8=True an already quantised one (repvgg_convert.quantize_int8).
+        """
+        if self.is_loaded:
+            return True
+        try:
+            quantized = int8_path(self.weights_path)
+            if self.int8 and (model is not None or quantized.exists()):
+                torch.backends.quantized.engine = quantized_engine()
+                if model is None:
+                    model = torch.jit.load(str(quantized), map_location="cpu")
+                self.mode = "int8"
+            else:
+                if self.int8:
+                    print(f"[RepVGGBackend] {quantized.name} not found "
+                          f"(run repvgg_convert.py --int8) — using fp32.")
+                    self.int8 = False
+                if model is None:
+                    model = load_deploy_model(self.weights_path)
+                model = model.cpu().eval()
+                if self.optimize:
+                    model = optimize_fp32(model, self.channels_last)
+                elif self.channels_last:
+                    model = model.to(memory_format=torch.channels_last)
+                self.mode = "fp32" + ("+channels_last" if self.channels_last else "")
+            self.model = model.eval()
+        except Exception as e:
+            print(f"[RepVGGBackend] Failed to load {self.weights_path}: {e}")
+            return False
+        self.is_loaded = True
+        print(f"[RepVGGBackend] Loaded {self.weights_path.name} ({self.mode})")
+        return True
+
+    def predict(self, images):
+        """Classify RGB uint8 crops. Returns [[emotion, confidence 0-100], ...]."""
+        if not images:
+            return []
+        x = preprocess_batch(images)
+        if self.int8 or not self.channels_last:
+            x = x.contiguous()
+        with torch.inference_mode():
+            probs = torch.softmax(self.model(x).float(), dim=1)
+        conf, idx = probs.max(dim=1)
+        return [[EMOTIONS[i], c * 100.0] for i, c in zip(idx.tolist(), conf.tolist())]
+
+
+# =====================================================================
+# Lazily-created shared backend
+# =====================================================================
+
+_backend = None
+_backend_failed = False
+_backend_lock = threading.Lock()
+
+
+def get_repvgg_backend():
+    """Return the loaded shared backend, or None if RepVGG weights cannot be loaded.
+
+    Loading is attempted once per process.
+    """
+    global _backend, _backend_failed
+    if _backend is not None or _backend_failed:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None and not _backend_failed:
+            backend = RepVGGBackend(
+                weights_path=os.environ.get("ERS_REPVGG_WEIGHTS"),
+                int8=os.environ.get("ERS_REPVGG_INT8") == "1",
+                channels_last=os.environ.get("ERS_REPVGG_CHANNELS_LAST") == "1",
+            )
+            if backend.load():
+                _backend = backend
+            else:
+                _backend_failed = True
+    return _backend
@@ -0,0 +1,151 @@
+"""
+RepVGG Checkpoint Conversion
+
+Converts a training-time RepVGG-A0 checkpoint (3x3 + 1x1 + identity
+branches with BatchNorm) into deploy form (one 3x3 conv per block), checks
+that both give the same outputs, and optionally writes a static int8
+TorchScript model for the fast backend (repvgg_backend.py).
+
+Usage:
+    python src/core/repvgg_convert.py RepVGG-A0-train.pth --output models/weights/repvgg.pth
+    python src/core/repvgg_convert.py models/weights/repvgg.pth --output models/weights/repvgg.pth \
+        --int8 --calibration-images 512
+
+Outputs:
+    <output>            deploy-form state_dict (loaded by emotion_detector / repvgg_backend)
+    <output>_int8.pt    with --int8: conv+ReLU fused, int8 TorchScript model
+                        (ERS_REPVGG_INT8=1)
+
+Deploy-form and pruned checkpoints are accepted too (conversion is then a
+no-op), so --int8 can be run on existing weights.
+"""
+
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.fer2013_pack import PackedFER2013Dataset, ensure_packed
+from src.core.repvgg import create_RepVGG_A0
+from src.core.repvgg_backend import (
+    INPUT_SIZE, fuse_conv_relu, int8_path, is_training_form, load_deploy_model, preprocess_batch,
+    quantized_engine, read_checkpoint,
+)
+
+
+# =====================================================================
+# Calibration / quantisation
+# =====================================================================
+
+def calibration_batches(num_images, batch_size=32, seed=0):
+    """Preprocessed batches of packed FER2013 training faces (RGB, 224x224)."""
+    packed_dir = ensure_packed(PROJECT_ROOT / "fer2013")
+    dataset = PackedFER2013Dataset(packed_dir, "train", channels=3)
+    rng = np.random.default_rng(seed)
+    indices = rng.choice(len(dataset), size=min(num_images, len(dataset)), replace=False)
+    for start in range(0, len(indices), batch_size):
+        crops = [np.ascontiguousarray(dataset[int(i)][0].permute(1, 2, 0).numpy())
+                 for i in indices[start:start + batch_size]]
+        yield preprocess_batch(crops).contiguous()
+
+
+def quantize_int8(model, batches):
+    """Static int8 copy of a deploy-form RepVGG, calibrated on `batches`; TorchScript."""
+    torch.backends.quantized.engine = quantized_engine()
+    qmodel = torch.ao.quantization.QuantWrapper(fuse_conv_relu(copy.deepcopy(model).cpu().eval()))
+    qmodel.eval()
+    qmodel.qconfig = torch.ao.quantization.get_default_qconfig(torch.backends.quantized.engine)
+    torch.ao.quantization.prepare(qmodel, inplace=True)
+    with torch.no_grad():
+        for batch in batches:
+            qmodel(batch)
+    torch.ao.quantization.convert(qmodel, inplace=True)
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(qmodel, torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)))
+
+
+# =====================================================================
+# Checks
+# =====================================================================
+
+@torch.no_grad()
+def check_conversion(source_path, deploy_model, samples=4):
+    """Max |train - deploy| output difference for a training checkpoint (None otherwise)."""
+    state = read_checkpoint(source_path)
+    if not is_training_form(state):
+        return None
+    train_model = create_RepVGG_A0(deploy=False)
+    train_model.load_state_dict(state)
+    x = torch.randn(samples, 3, INPUT_SIZE, INPUT_SIZE)
+    return (train_model.eval()(x) - deploy_model(x)).abs().max().item()
+
+
+@torch.no_grad()
+def agreement(reference, model, batches):
+    """Top-1 agreement (%) between two models on `batches`."""
+    same = total = 0
+    for batch in batches:
+        same += reference(batch).argmax(1).eq(model(batch).argmax(1)).sum().item()
+        total += len(batch)
+    return 100.0 * same / max(total, 1)
+
+
+def _time_ms(model, runs=10):
+    x = torch.randn(8, 3, INPUT_SIZE, INPUT_SIZE)
+    with torch.no_grad():
+        model(x)
+        start = time.perf_counter()
+        for _ in range(runs):
+            model(x)
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+# =====================================================================
+# Main
+# =====================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert RepVGG-A0 checkpoints to deploy form / int8")
+    parser.add_argument("source", help="training-time, deploy or pruned checkpoint")
+    parser.add_argument("--output", default=None,
+                        help="deploy state_dict path (default: <source>_deploy.pth)")
+    parser.add_argument("--int8", action="store_true", help="also write <output>_int8.pt")
+    parser.add_argument("--calibration-images", type=int, default=256)
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    output = Path(args.output or source.with_name(source.stem + "_deploy.pth"))
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    model = load_deploy_model(source)
+    diff = check_conversion(source, model)
+    if diff is not None:
+        print(f"[RepVGGConvert] Training -> deploy max output difference: {diff:.2e}")
+        if diff > 1e-3:
+            print("[RepVGGConvert] WARNING: difference is larger than expected")
+    if output.resolve() != source.resolve():
+        torch.save(model.state_dict(), str(output))
+        print(f"[RepVGGConvert] Deploy weights written to {output}")
+
+    if args.int8:
+        print(f"[RepVGGConvert] Calibrating int8 on {args.calibration_images} FER2013 faces...")
+        qmodel = quantize_int8(model, calibration_batches(args.calibration_images))
+        path = int8_path(output)
+        torch.jit.save(qmodel, str(path))
+        check_batches = list(calibration_batches(128, seed=1))
+        print(f"[RepVGGConvert] int8 model written to {path}")
+        print(f"[RepVGGConvert] Top-1 agreement with fp32: {agreement(model, qmodel, check_batches):.1f}%")
+        print(f"[RepVGGConvert] Batch-8 latency: fp32 {_time_ms(model):.1f} ms, "
+              f"int8 {_time_ms(qmodel):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Hyperparameter Sweep Runner
+
+Runs a grid or random search over the training scripts' hyperparameters
+in a process pool and prints a leaderboard. Every trial is the normal
+training loop (train_fer2013.train / train_efficientnet.train) called with
+its own argument set; no weights are written unless --save-weights is given.
+
+Usage:
+    python src/core/sweep.py --param lr=1e-3,3e-4,1e-4 --param weight_decay=0,1e-4 \
+        --parallel 4 --epochs 10
+    python src/core/sweep.py --space sweep.json --trials 12 --seed 0 --patience 3
+    python src/core/sweep.py --model efficientnet --param lr=1e-4,3e-5 --parallel 1 --epochs 5
+
+    --param takes a training-script option (dest or flag spelling) and a
+    comma-separated list of values; --space takes a JSON file
+    {"lr": [0.001, 0.0003], "batch_size": [32, 64], "bf16": [true, false]}.
+    Any option sweep.py does not know is passed to every trial (--epochs 10
+    above).
+
+Outputs (default data/sweeps/<model>/):
+    trials/<hash>.json     result of one configuration (the cache)
+    trials/<hash>.log      that trial's training output
+    trials/<hash>.pth      best weights, with --save-weights
+    leaderboard.csv/.json  this sweep's trials ranked by --metric
+
+Features:
+    - Trials run in spawned worker processes, each limited to
+      --trial-threads intra-op threads (default: CPU count / --parallel)
+      with DataLoader workers off, so parallel trials don't oversubscribe
+      the cores
+    - The dataset is packed once (fer2013_pack.py, or face_cache.py for
+      EfficientNet --face-cache); every trial opens the same memmap files,
+      so the images live once in the page cache
+    - Results are cached under a hash of the model, the complete training
+      argument set (defaults included, thread / loader options excluded)
+      and the packed data's source hash; re-running a sweep only trains
+      the configurations that are new (--rerun to force). Early-stopped
+      results are only reused under the same stopping settings
+    - Early stopping: --patience epochs without a new best accuracy, and a
+      median rule that stops a trial after --grace-epochs once its best
+      accuracy falls below the median of finished trials at the same epoch
+"""
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.fer2013_pack import load_manifest
+
+# name -> module providing parse_args(argv), prepare_data(args) and
+# train(args, data_dir, ..., on_epoch=...)
+MODELS = {
+    "fer2013_cnn": "src.core.train_fer2013",
+    "efficientnet": "src.core.advanced.train_efficientnet",
+}
+
+# Options that change speed but not the result; left out of the cache key
+NON_RESULT_OPTIONS = ("threads", "interop_threads", "num_workers", "prefetch_factor")
+
+METRICS = ("best_acc", "final_acc", "macro_f1")
+
+
+# =====================================================================
+# Search space
+# =====================================================================
+
+def parse_param(text):
+    """'lr=1e-3,3e-4' -> ('lr', ['1e-3', '3e-4'])."""
+    name, sep, values = text.partition("=")
+    if not sep or not values:
+        raise ValueError(f"--param expects name=v1,v2,...: {text!r}")
+    return name.strip().lstrip("-").replace("-", "_"), [v.strip() for v in values.split(",")]
+
+
+def load_space(args):
+    """{option dest: [values as strings]} from --space and --param (--param wins)."""
+    space = {}
+    if args.space:
+        for name, values in json.loads(Path(args.space).read_text()).items():
+            values = values if isinstance(values, list) else [values]
+            space[name.replace("-", "_")] = [json.dumps(v) if isinstance(v, bool) else str(v)
+                                             for v in values]
+    for text in args.param:
+        name, values = parse_param(text)
+        space[name] = values
+    return space
+
+
+def configurations(space, trials=None, seed=0):
+    """Grid over `space`; a random subset of `trials` configurations if given."""
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if trials and trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    return grid
+
+
+def to_argv(config):
+    """{dest: value} -> training-script argv; booleans toggle store_true flags."""
+    argv = []
+    for name, value in config.items():
+        flag = "--" + name.replace("_", "-")
+        if value.lower() in ("true", "false"):
+            if value.lower() == "true":
+                argv.append(flag)
+        else:
+            argv += [flag, value]
+    return argv
+
+
+def config_hash(model, args, data_hash):
+    """Cache key: model + every result-relevant training option + packed data."""
+    options = {k: v for k, v in sorted(vars(args).items()) if k not in NON_RESULT_OPTIONS}
+    text = json.dumps({"model": model, "options": options, "data": data_hash},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+# =====================================================================
+# Early stopping
+# =====================================================================
+
+class TrialStopper:
+    """on_epoch callback for train(): patience and median stopping rules.
+
+    `reference` holds the per-epoch accuracy curves of finished trials; a
+    trial past `grace_epochs` whose best accuracy so far is below their
+    median best at the same epoch is stopped.
+    """
+
+    def __init__(self, patience=0, grace_epochs=0, reference=()):
+        self.patience = patience
+        self.grace_epochs = grace_epochs
+        self.reference = [curve for curve in reference if curve]
+        self.best = float("-inf")
+        self.best_epoch = 0
+        self.reason = None
+
+    def median_best(self, epoch):
+        bests = [max(curve[:epoch]) for curve in self.reference if len(curve) >= epoch]
+        return statistics.median(bests) if len(bests) >= 2 else None
+
+    def __call__(self, epoch, metrics):
+        if metrics["val_acc"] > self.best:
+            self.best, self.best_epoch = metrics["val_acc"], epoch
+        if self.patience and epoch - self.best_epoch >= self.patience:
+            self.reason = f"no improvement for {self.patience} epochs"
+            return True
+        if self.grace_epochs and epoch >= self.grace_epochs:
+            median = self.median_best(epoch)
+            if median is not None and self.best < median:
+                self.reason = f"best {self.best:.2f}% below median {median:.2f}% at epoch {epoch}"
+                return True
+        return False
+
+
+# =====================================================================
+# Trials (run in worker processes)
+# =====================================================================
+
+def run_trial(model, argv, data_dir, trial_dir, key, patience, grace_epochs, reference,
+              save_weights):
+    """Train one configuration; its output goes to trials/<key>.log. Returns the result dict."""
+    import torch
+
+    module = importlib.import_module(MODELS[model])
+    args = module.parse_args(argv)
+    log_path = Path(trial_dir) / f"{key}.log"
+    stopper = TrialStopper(patience, grace_epochs, reference)
+
+    start = time.perf_counter()
+    with open(log_path, "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        module.configure_threads(args)
+        torch.manual_seed(0)
+        result = module.train(args, data_dir, None, on_epoch=stopper)
+
+    state_dict = result.pop("state_dict")
+    weights = None
+    if save_weights and state_dict is not None:
+        weights = str(Path(trial_dir) / f"{key}.pth")
+        torch.save(state_dict, weights)
+
+    history = result["history"]
+    result.update(
+        key=key,
+        model=model,
+        argv=argv,
+        options={k: v for k, v in sorted(vars(args).items())},
+        stop_reason=stopper.reason,
+        stopping={"patience": patience, "grace_epochs": grace_epochs},
+        samples_per_sec=round(statistics.mean(h["samples_per_sec"] for h in history), 1) if history else 0.0,
+        seconds=round(time.perf_counter() - start, 1),
+        log=str(log_path),
+        weights=weights,
+    )
+    return result
+
+
+def load_cached(path, stopping):
+    """Cached result for a trial, or None if it has to (re)run.
+
+    Trials that ran to completion are reused under any stopping policy; a
+    trial cut short is only reused under the same --patience /
+    --grace-epochs, since other settings might have let it continue.
+    """
+    if not path.exists():
+        return None
+    result = json.loads(path.read_text())
+    if result.get("stopped_early") and result.get("stopping") != stopping:
+        return None
+    return result
+
+
+def _worker_init(threads):
+    # Spawned workers inherit the environment but import torch fresh
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+
+# =====================================================================
+# Leaderboard
+# =====================================================================
+
+def leaderboard(results, metric):
+    return sorted(results, key=lambda r: r.get(metric, 0.0), reverse=True)
+
+
+def print_leaderboard(ranked, space, metric):
+    names = sorted(space)
+    print("\n" + "=" * 60)
+    print(f"Leaderboard ({len(ranked)} trials, ranked by {metric})")
+    print("=" * 60)
+    header = f"{'#':>3} {'trial':<16} " + " ".join(f"{n:>12}" for n in names)
+    header += f" {'best_acc':>9} {'macro_f1':>9} {'epochs':>7} {'samples/s':>10}"
+    print(header)
+    for rank, r in enumerate(ranked, 1):
+        stopped = "*" if r["stopped_early"] else " "
+        row = f"{rank:>3} {r['key']:<16} " + " ".join(f"{r['config'][n]:>12}" for n in names)
+        row += (f" {r['best_acc']:>9.2f} {r['macro_f1']:>9.2f} {r['epochs_run']:>6}{stopped}"
+                f" {r['samples_per_sec']:>10.1f}")
+        print(row)
+    print("(* stopped early)")
+
+
+def write_leaderboard(ranked, space, out_dir):
+    names = sorted(space)
+    columns = ["rank", "key", *names, "best_acc", "best_epoch", "final_acc", "macro_f1",
+               "epochs_run", "stopped_early", "stop_reason", "samples_per_sec", "seconds", "weights"]
+    with open(out_dir / "leaderboard.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rank, r in enumerate(ranked, 1):
+            row = {"rank": rank, **r["config"], **r}
+            writer.writerow([row.get(c) for c in columns])
+    board = [{"rank": rank, **{k: v for k, v in r.items() if k != "history"}}
+             for rank, r in enumerate(ranked, 1)]
+    (out_dir / "leaderboard.json").write_text(json.dumps(board, indent=2))
+
+
+# =====================================================================
+# Main
+# =====================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Parallel hyperparameter sweep over the training scripts",
+        allow_abbrev=False,
+        epilog="Unrecognised options are passed to every trial's training script.")
+    parser.add_argument("--model", choices=sorted(MODELS), default="fer2013_cnn")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="values to sweep for one training option (repeatable)")
+    parser.add_argument("--space", default=None, help="JSON file {option: [values]}")
+    parser.add_argument("--trials", type=int, default=None,
+                        help="random search: sample this many configurations from the grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parallel", type=int, default=2, help="trials running at once")
+    parser.add_argument("--trial-threads", type=int, default=0,
+                        help="torch threads per trial (0 = CPU count / --parallel)")
+    parser.add_argument("--patience", type=int, default=0,
+                        help="stop a trial after N epochs without improvement (0 = off)")
+    parser.add_argument("--grace-epochs", type=int, default=0,
+                        help="median stopping rule from this epoch on (0 = off)")
+    parser.add_argument("--metric", choices=METRICS, default="best_acc")
+    parser.add_argument("--out-dir", default=None, help="default data/sweeps/<model>")
+    parser.add_argument("--save-weights", action="store_true", help="keep each trial's best weights")
+    parser.add_argument("--rerun", action="store_true", help="ignore cached results")
+    return parser.parse_known_args(argv)
+
+
+def main(argv=None):
+    args, base_argv = parse_args(argv)
+    space = load_space(args)
+    if not space:
+        print("ERROR: nothing to sweep (use --param or --space)")
+        return
+
+    out_dir = Path(args.out_dir or PROJECT_ROOT / "data" / "sweeps" / args.model)
+    trial_dir = out_dir / "trials"
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    threads = args.trial_threads or max(1, (os.cpu_count() or 1) // args.parallel)
+
+    print("=" * 60)
+    print(f"Hyperparameter sweep: {args.model}")
+    print("=" * 60)
+
+    # ---- Trials and cache lookup ----
+    module = importlib.import_module(MODELS[args.model])
+    configs = configurations(space, args.trials, args.seed)
+    stopping = {"patience": args.patience, "grace_epochs": args.grace_epochs}
+    trials, results, data_hashes = [], [], {}
+    for config in configs:
+        trial_argv = base_argv + to_argv(config)
+        try:
+            trial_args = module.parse_args(trial_argv)
+        except SystemExit:
+            print(f"ERROR: invalid training options {trial_argv}")
+            return
+        # Packed (or face-cached) once here; trials only open the memmap files
+        data_dir = str(module.prepare_data(trial_args))
+        if data_dir not in data_hashes:
+            data_hashes[data_dir] = load_manifest(data_dir)["source_hash"]
+        key = config_hash(args.model, trial_args, data_hashes[data_dir])
+        cached = load_cached(trial_dir / f"{key}.json", stopping) if not args.rerun else None
+        if cached is not None:
+            results.append({**cached, "config": config})
+        else:
+            trials.append((key, config, data_dir,
+                           trial_argv + ["--threads", str(threads), "--num-workers", "0"]))
+
+    print(f"[Sweep] {len(configs)} configurations: {len(results)} cached, {len(trials)} to run")
+    print(f"[Sweep] {min(args.parallel, max(len(trials), 1))} parallel trials x {threads} threads")
+    print(f"[Sweep] Results: {out_dir}")
+
+    # ---- Run ----
+    def reference():
+        # Accuracy curves of every finished trial of this model (median rule)
+        curves = []
+        for path in trial_dir.glob("*.json"):
+            curves.append([h["val_acc"] for h in json.loads(path.read_text()).get("history", [])])
+        return curves
+
+    pending = iter(trials)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.parallel, mp_context=context, initializer=_worker_init,
+                             initargs=(threads,)) as pool:
+        running = {}
+
+        def submit():
+            trial = next(pending, None)
+            if trial is None:
+                return
+            key, config, data_dir, trial_argv = trial
+            future = pool.submit(run_trial, args.model, trial_argv, data_dir, str(trial_dir),
+                                 key, args.patience, args.grace_epochs, reference(),
+                                 args.save_weights)
+            running[future] = (key, config)
+            print(f"[Sweep] Started {key}: {' '.join(to_argv(config))}")
+
+        for _ in range(args.parallel):
+            submit()
+        while running:
+            future = next(as_completed(running))
+            key, config = running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[Sweep] {key} failed: {e} (see {trial_dir / (key + '.log')})")
+            else:
+                (trial_dir / f"{key}.json").write_text(json.dumps(result, indent=2))
+                results.append({**result, "config": config})
+                note = f", stopped: {result['stop_reason']}" if result["stopped_early"] else ""
+                print(f"[Sweep] Finished {key}: best {result['best_acc']:.2f}% at epoch "
+                      f"{result['best_epoch']} ({result['epochs_run']} epochs, "
+                      f"{result['seconds']:.0f}s{note})")
+            submit()
+
+    if not results:
+        print("[Sweep] No finished trials.")
+        return
+    ranked = leaderboard(results, args.metric)
+    print_leaderboard(ranked, space, args.metric)
+    write_leaderboard(ranked, space, out_dir)
+    print(f"\nLeaderboard written to {out_dir / 'leaderboard.csv'}")
+
+
+if __name__ == "__main__":
+    main()
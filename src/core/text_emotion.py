@@ -0,0 +1,136 @@
+"""
+Keyword Text Emotion Matcher
+
+Precompiled, single-pass keyword matcher used by text mode (and for
+scoring journal entries / chat messages in bulk).
+
+Features:
+  - All keywords compiled once at import into a single regex with word
+    boundaries (no more "mad" matching inside "made")
+  - Common inflections accepted via a shared suffix group
+  - Negation window: "not happy", "never really scared" do not count;
+    curly apostrophes are normalised first ("I don’t feel good")
+  - Per-emotion scores, plus a batch API that scans many texts in one
+    regex pass
+"""
+
+import re
+from bisect import bisect_right
+
+# Keyword lists per emotion. Order matters: on a score tie the emotion
+# listed first wins (same behaviour as the original heuristic).
+EMOTION_KEYWORDS = {
+    "happy": ["happy", "joy", "excited", "great", "wonderful", "amazing", "fantastic",
+              "love", "loving", "good", "positive", "cheerful", "delighted", "thrilled",
+              "ecstatic", "enjoy"],
+    "sad": ["sad", "depressed", "down", "blue", "melancholy", "upset", "crying",
+            "tears", "hurt", "disappointed", "grief", "sorrow", "unhappy", "miserable"],
+    "anger": ["anger", "angry", "mad", "furious", "rage", "irritated", "annoyed",
+              "frustrated", "frustrating", "pissed", "livid", "fuming", "outraged",
+              "hostile", "bitter"],
+    "fear": ["anxious", "worried", "nervous", "scared", "afraid", "fear", "panic",
+             "panicked", "panicking", "stress", "overwhelmed", "tense", "uneasy",
+             "apprehensive", "terrified"],
+    "surprise": ["surprised", "shocked", "amazed", "astonished", "stunned",
+                 "bewildered", "confused", "unexpected", "wow", "incredible", "unbelievable"],
+    "disgust": ["disgusted", "grossed", "repulsed", "revolted", "sick",
+                "nauseous", "appalled", "horrified", "disturbed", "offended"],
+}
+
+# Tokens that flip the meaning of a following keyword
+NEGATIONS = frozenset({
+    "not", "no", "never", "nor", "neither", "without", "hardly", "barely",
+    "isn't", "wasn't", "aren't", "weren't", "don't", "doesn't", "didn't",
+    "can't", "cannot", "couldn't", "won't", "wouldn't", "shouldn't",
+    "isnt", "wasnt", "arent", "dont", "doesnt", "didnt", "cant", "wont",
+})
+
+# How many tokens before a keyword are checked for a negation
+NEGATION_WINDOW = 3
+
+# Inflections accepted after any keyword ("stressed", "fearful", "hurting")
+_SUFFIXES = r"(?:s|es|d|ed|ing|ful|ly)?"
+
+# Characters that end a clause — negation never reaches across them
+_CLAUSE_BREAK = re.compile(r"[.!?;,:\n]")
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Separator used to scan a batch of texts in a single pass
+_BATCH_SEP = "\n"
+
+
+class KeywordEmotionMatcher:
+    """Word-boundary keyword matcher with negation handling."""
+
+    def __init__(self, keywords=None, negations=NEGATIONS, negation_window=NEGATION_WINDOW):
+        keywords = keywords or EMOTION_KEYWORDS
+        self.emotions = tuple(keywords)
+        self.negations = negations
+        self.negation_window = negation_window
+
+        self._keyword_emotion = {}
+        for emotion, words in keywords.items():
+            for word in words:
+                self._keyword_emotion.setdefault(word.lower(), emotion)
+
+        # Longest first so alternation prefers "panicked" over "panic"
+        alternation = "|".join(
+            re.escape(w) for w in sorted(self._keyword_emotion, key=len, reverse=True)
+        )
+        self._pattern = re.compile(rf"\b(?P<kw>{alternation}){_SUFFIXES}\b")
+
+    def score(self, text):
+        """Per-emotion keyword hit counts for one text (all emotions present, 0 if none)."""
+        return self.score_batch([text])[0]
+
+    def detect(self, text):
+        """Dominant emotion for one text, or "neutral" if nothing matched."""
+        return self._best(self.score(text))
+
+    def score_batch(self, texts):
+        """Per-emotion scores for many texts, scanned in one regex pass."""
+        # Curly apostrophes normalised so "don’t" is one negation token
+        texts = [(t or "").lower().replace("’", "'") for t in texts]
+        scores = [dict.fromkeys(self.emotions, 0) for _ in texts]
+        if not texts:
+            return scores
+
+        blob = _BATCH_SEP.join(texts)
+        # Start offset of each text inside the blob, for mapping matches back
+        offsets = []
+        pos = 0
+        for t in texts:
+            offsets.append(pos)
+            pos += len(t) + len(_BATCH_SEP)
+
+        for m in self._pattern.finditer(blob):
+            if self._is_negated(blob, m.start()):
+                continue
+            emotion = self._keyword_emotion[m.group("kw")]
+            scores[bisect_right(offsets, m.start()) - 1][emotion] += 1
+        return scores
+
+    def detect_batch(self, texts):
+        """Dominant emotion for each text in `texts`."""
+        return [self._best(s) for s in self.score_batch(texts)]
+
+    def _is_negated(self, text, start):
+        """True if a negation token appears shortly before `start` in the same clause."""
+        window = text[max(0, start - 48):start]
+        breaks = list(_CLAUSE_BREAK.finditer(window))
+        if breaks:
+            window = window[breaks[-1].end():]
+        tokens = _TOKEN.findall(window)[-self.negation_window:]
+        return any(tok in self.negations or tok.endswith("n't") for tok in tokens)
+
+    @staticmethod
+    def _best(scores):
+        best, best_score = "neutral", 0
+        for emotion, score in scores.items():
+            if score > best_score:
+                best, best_score = emotion, score
+        return best
+
+
+# Built once at import and shared by every caller
+text_emotion_matcher = KeywordEmotionMatcher()
@@ -0,0 +1,255 @@
+"""
+Transformer Text Emotion Backend (optional)
+
+Local distilled text-emotion classifier that sits behind
+`detect_emotion_from_text_simple`. The keyword matcher in
+core/text_emotion.py stays the fallback whenever the model is missing,
+fails to load, or times out.
+
+Expected layout (a Hugging Face model saved with `save_pretrained`):
+    models/weights/text_emotion/
+        config.json, tokenizer files, model weights
+
+Features:
+  - Loads from local files only (never downloads at runtime)
+  - Micro-batching: concurrent requests arriving within a few ms are run
+    as one forward pass on a background worker thread
+  - LRU cache keyed by normalised text
+  - CPU thread budget and optional int8 dynamic quantisation
+
+Environment:
+  ERS_TEXT_MODEL_DIR   override the model directory
+  ERS_TEXT_BACKEND     "keyword" disables the transformer backend
+  ERS_TEXT_THREADS     torch intra-op thread budget (process-wide)
+  ERS_TEXT_INT8        "1" to quantise Linear layers to int8
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_DEFAULT_MODEL_DIR = PROJECT_ROOT / "models" / "weights" / "text_emotion"
+
+# Map common emotion-model label names to the project's 8 classes
+LABEL_MAP = {
+    "anger": "anger", "angry": "anger", "annoyance": "anger",
+    "contempt": "contempt",
+    "disgust": "disgust",
+    "fear": "fear", "nervousness": "fear",
+    "joy": "happy", "happy": "happy", "happiness": "happy", "love": "happy",
+    "neutral": "neutral",
+    "sadness": "sad", "sad": "sad", "grief": "sad",
+    "surprise": "surprise",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Cache key for a text: lowercased with whitespace collapsed."""
+    return _WHITESPACE.sub(" ", (text or "").strip().lower())
+
+
+class TransformerTextEmotionBackend:
+    """Batched, cached wrapper around a local sequence-classification model."""
+
+    def __init__(self, model_dir=None, max_batch_size=16, max_wait_ms=8,
+                 cache_size=2048, num_threads=None, quantize=False, max_length=128):
+        self.model_dir = Path(model_dir or _DEFAULT_MODEL_DIR)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.max_length = max_length
+
+        self.model = None
+        self.tokenizer = None
+        self.labels = ()
+        self.is_loaded = False
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._worker = None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Load tokenizer + model from local files. Returns True on success."""
+        if self.is_loaded:
+            return True
+        if not (self.model_dir / "config.json").exists():
+            print(f"[TextEmotionModel] No model found at {self.model_dir} — using keyword matcher.")
+            return False
+
+        try:
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+            if self.num_threads:
+                torch.set_num_threads(int(self.num_threads))
+
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                str(self.model_dir), local_files_only=True
+            )
+            model = AutoModelForSequenceClassification.from_pretrained(
+                str(self.model_dir), local_files_only=True
+            )
+            model.eval()
+            if self.quantize:
+                model = torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            self.model = model
+
+            id2label = model.config.id2label
+            self.labels = tuple(
+                LABEL_MAP.get(str(id2label[i]).lower(), "neutral")
+                for i in range(len(id2label))
+            )
+        except Exception as e:
+            print(f"[TextEmotionModel] Failed to load model: {e}")
+            return False
+
+        self._worker = threading.Thread(
+            target=self._worker_loop, name="text-emotion-batcher", daemon=True
+        )
+        self._worker.start()
+        self.is_loaded = True
+        print(f"[TextEmotionModel] Loaded {self.model_dir.name} "
+              f"({'int8' if self.quantize else 'fp32'}, labels={sorted(set(self.labels))})")
+        return True
+
+    # ------------------------------------------------------------------
+    # Inference
+    # ------------------------------------------------------------------
+
+    def predict(self, text, timeout=2.0):
+        """Classify one text. Returns (emotion, confidence 0–100).
+
+        Concurrent callers are coalesced into one batch by the worker thread.
+        Raises TimeoutError if the worker doesn't answer within `timeout`.
+        """
+        key = normalize_text(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        future = Future()
+        self._requests.put((key, future))
+        return future.result(timeout=timeout)
+
+    def predict_batch(self, texts):
+        """Classify many texts directly on the calling thread (cache-aware)."""
+        keys = [normalize_text(t) for t in texts]
+        results = [self._cache_get(k) for k in keys]
+        missing = sorted({k for k, r in zip(keys, results) if r is None})
+        computed = {}
+        for i in range(0, len(missing), self.max_batch_size * 4):
+            chunk = missing[i:i + self.max_batch_size * 4]
+            computed.update(zip(chunk, self._infer(chunk)))
+        return [r if r is not None else computed[k] for k, r in zip(keys, results)]
+
+    def _worker_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Identical texts in one batch are only run once
+            unique = list(dict.fromkeys(key for key, _ in batch))
+            try:
+                outputs = dict(zip(unique, self._infer(unique)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for key, future in batch:
+                future.set_result(outputs[key])
+
+    def _infer(self, keys):
+        import torch
+
+        enc = self.tokenizer(
+            keys, padding=True, truncation=True,
+            max_length=self.max_length, return_tensors="pt",
+        )
+        with torch.inference_mode():
+            probs = torch.softmax(self.model(**enc).logits, dim=-1)
+        conf, idx = probs.max(dim=-1)
+        results = [
+            (self.labels[i], c * 100.0) for i, c in zip(idx.tolist(), conf.tolist())
+        ]
+        for key, res in zip(keys, results):
+            self._cache_put(key, res)
+        return results
+
+    # ------------------------------------------------------------------
+    # LRU cache
+    # ------------------------------------------------------------------
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            res = self._cache.get(key)
+            if res is not None:
+                self._cache.move_to_end(key)
+            return res
+
+    def _cache_put(self, key, value):
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+# =====================================================================
+# Lazily-created shared backend
+# =====================================================================
+
+_backend = None
+_backend_failed = False
+_backend_lock = threading.Lock()
+
+
+def get_text_backend():
+    """Return the loaded shared backend, or None to use the keyword matcher.
+
+    Loading is attempted once per process; a missing or broken model is
+    remembered so the fallback path stays cheap.
+    """
+    global _backend, _backend_failed
+    if _backend is not None or _backend_failed:
+        return _backend
+    if os.environ.get("ERS_TEXT_BACKEND", "").lower() == "keyword":
+        _backend_failed = True
+        return None
+
+    with _backend_lock:
+        if _backend is None and not _backend_failed:
+            backend = TransformerTextEmotionBackend(
+                model_dir=os.environ.get("ERS_TEXT_MODEL_DIR"),
+                num_threads=os.environ.get("ERS_TEXT_THREADS"),
+                quantize=os.environ.get("ERS_TEXT_INT8") == "1",
+            )
+            if backend.load():
+                _backend = backend
+            else:
+                _backend_failed = True
+    return _backend
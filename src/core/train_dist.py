@@ -0,0 +1,163 @@
+"""
+Distributed Data-Parallel Training Helpers
+
+CPU data-parallel training with torch.distributed (gloo backend), shared by
+train_fer2013.py and advanced/train_efficientnet.py. Without torchrun the
+helpers fall back to plain single-process behaviour.
+
+Usage:
+    # 4 processes on this machine
+    torchrun --standalone --nproc_per_node 4 src/core/train_fer2013.py --bf16
+
+    # 2 machines x 8 processes
+    torchrun --nnodes 2 --nproc_per_node 8 --rdzv_backend c10d \
+        --rdzv_endpoint host0:29500 src/core/advanced/train_efficientnet.py
+
+Features:
+    - gloo process group from the torchrun environment (RANK, WORLD_SIZE, ...)
+    - DistributedDataParallel model wrapping (gradient all-reduce), with
+      no_sync() on gradient-accumulation micro-batches
+    - DistributedSampler for training; unpadded strided shards for
+      evaluation so each sample is counted once. Metrics all-reduced so
+      every rank sees the same loss / accuracy (and takes the same
+      scheduler steps)
+    - Only rank 0 prints, packs the dataset and writes checkpoints
+"""
+
+import builtins
+import contextlib
+import os
+
+import torch
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data.distributed import DistributedSampler
+
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+
+def rank():
+    return dist.get_rank() if is_distributed() else 0
+
+
+def world_size():
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main_process():
+    return rank() == 0
+
+
+def local_world_size():
+    """Processes sharing this machine (for splitting CPU threads)."""
+    return int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+
+
+# =====================================================================
+# Setup / teardown
+# =====================================================================
+
+def setup_distributed(backend="gloo"):
+    """Join the process group if launched by torchrun. Returns (rank, world_size)."""
+    if int(os.environ.get("WORLD_SIZE", 1)) > 1 and not is_distributed():
+        dist.init_process_group(backend=backend)
+        _quiet_non_main_ranks()
+        print(f"[TrainDist] {backend} process group: world size {world_size()}")
+    return rank(), world_size()
+
+
+def cleanup_distributed():
+    if is_distributed():
+        dist.destroy_process_group()
+
+
+def _quiet_non_main_ranks():
+    """Only rank 0 prints; print(..., force=True) prints from any rank."""
+    builtin_print = builtins.print
+    main = is_main_process()
+
+    def print(*args, **kwargs):
+        force = kwargs.pop("force", False)
+        if main or force:
+            builtin_print(*args, **kwargs)
+
+    builtins.print = print
+
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
+
+
+def main_process_first(fn, *args, **kwargs):
+    """Run `fn` on rank 0 first (e.g. dataset packing), then on the other ranks."""
+    if not is_main_process():
+        barrier()
+    result = fn(*args, **kwargs)
+    if is_main_process():
+        barrier()
+    return result
+
+
+# =====================================================================
+# Model / data
+# =====================================================================
+
+def wrap_model(model):
+    """DistributedDataParallel wrapper when running distributed (CPU: no device_ids)."""
+    if not is_distributed():
+        return model
+    return DistributedDataParallel(model)
+
+
+def sync_gradients(model, sync):
+    """Context for one backward pass: skip the all-reduce unless `sync`.
+
+    Used with gradient accumulation so only the last micro-batch of each
+    effective batch pays for communication.
+    """
+    if sync or not hasattr(model, "no_sync"):
+        return contextlib.nullcontext()
+    return model.no_sync()
+
+
+def distributed_sampler(dataset, shuffle):
+    """DistributedSampler for `dataset`, or None when not distributed."""
+    if not is_distributed():
+        return None
+    return DistributedSampler(dataset, shuffle=shuffle)
+
+
+def distributed_eval_sampler(dataset):
+    """Unpadded shard of `dataset` for evaluation, or None when not distributed.
+
+    DistributedSampler repeats samples so every rank gets the same count,
+    which double-counts them once metrics are summed across ranks. A strided
+    shard covers each sample exactly once (ranks may differ by one sample;
+    evaluation runs under no_grad, so DDP issues no collectives per batch).
+    """
+    if not is_distributed():
+        return None
+    return range(rank(), len(dataset), world_size())
+
+
+def all_reduce_sum(*values):
+    """Sum numbers (or equally shaped tensors) across ranks; returns the same structure."""
+    if not is_distributed():
+        return values if len(values) > 1 else values[0]
+    if len(values) == 1 and torch.is_tensor(values[0]):
+        tensor = values[0].detach().to("cpu", torch.float64)
+        dist.all_reduce(tensor)
+        return tensor
+    tensor = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(tensor)
+    reduced = tuple(tensor.tolist())
+    return reduced if len(reduced) > 1 else reduced[0]
+
+
+def save_on_main(state_dict, path):
+    """torch.save on rank 0 only."""
+    if is_main_process():
+        torch.save(state_dict, path)
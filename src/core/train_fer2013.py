@@ -1,14 +1,20 @@
 """
 FER2013 Dataset Training Script
 Trains a CNN model on the FER2013 dataset for high-accuracy emotion recognition
+
+Usage:
+    python src/core/train_fer2013.py [--epochs 10] [--bf16 --channels-last --compile ...]
+    torchrun --standalone --nproc_per_node 4 src/core/train_fer2013.py ...
+    (performance options: see train_perf.py; multi-process: train_dist.py;
+    hyperparameter sweeps: sweep.py)
 """
 
 import os
+import argparse
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
-from torchvision import transforms
 from PIL import Image
 import numpy as np
 from pathlib import Path
@@ -18,6 +24,18 @@ import sys
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.core.batch_augment import BatchAugment
+from src.core.class_metrics import confusion_matrix, print_per_class, summarize
+from src.core.fer2013_pack import PackedFER2013Dataset, ensure_packed, load_manifest
+from src.core.train_dist import (
+    all_reduce_sum, cleanup_distributed, distributed_eval_sampler, distributed_sampler,
+    main_process_first, save_on_main, setup_distributed, sync_gradients,
+)
+from src.core.train_perf import (
+    Throughput, accumulation_steps, add_perf_args, autocast, configure_threads, describe,
+    loader_kwargs, prepare_batch, prepare_model,
+)
+
 
 class FER2013Dataset(Dataset):
     """
@@ -86,28 +104,35 @@ class FER2013CNN(nn.Module):
     """
     Simple CNN model for FER2013 emotion recognition.
     Optimized for faster training while maintaining good accuracy.
+
+    `widths` are the three conv widths and the hidden FC width; smaller
+    values come from structured pruning (see prune.py).
     """
     
-    def __init__(self, num_classes=7):
+    DEFAULT_WIDTHS = (32, 64, 128, 256)
+    
+    def __init__(self, num_classes=7, widths=DEFAULT_WIDTHS):
         super(FER2013CNN, self).__init__()
+        c1, c2, c3, hidden = widths
+        self.widths = tuple(widths)
         
         # Feature extraction layers - simpler architecture
         self.features = nn.Sequential(
             # Block 1: 48x48 -> 24x24
-            nn.Conv2d(1, 32, kernel_size=3, padding=1),
-            nn.BatchNorm2d(32),
+            nn.Conv2d(1, c1, kernel_size=3, padding=1),
+            nn.BatchNorm2d(c1),
             nn.ReLU(inplace=True),
             nn.MaxPool2d(2, 2),
             
             # Block 2: 24x24 -> 12x12
-            nn.Conv2d(32, 64, kernel_size=3, padding=1),
-            nn.BatchNorm2d(64),
+            nn.Conv2d(c1, c2, kernel_size=3, padding=1),
+            nn.BatchNorm2d(c2),
             nn.ReLU(inplace=True),
             nn.MaxPool2d(2, 2),
             
             # Block 3: 12x12 -> 6x6
-            nn.Conv2d(64, 128, kernel_size=3, padding=1),
-            nn.BatchNorm2d(128),
+            nn.Conv2d(c2, c3, kernel_size=3, padding=1),
+            nn.BatchNorm2d(c3),
             nn.ReLU(inplace=True),
             nn.MaxPool2d(2, 2),
         )
@@ -115,55 +140,63 @@ class FER2013CNN(nn.Module):
         # Classifier
         self.classifier = nn.Sequential(
             nn.Flatten(),
-            nn.Linear(128 * 6 * 6, 256),
+            nn.Linear(c3 * 6 * 6, hidden),
             nn.ReLU(inplace=True),
             nn.Dropout(0.5),
-            nn.Linear(256, num_classes),
+            nn.Linear(hidden, num_classes),
         )
         
     def forward(self, x):
         x = self.features(x)
         x = self.classifier(x)
         return x
+    
+    @staticmethod
+    def widths_from_state_dict(state_dict):
+        """Layer widths stored in a (possibly pruned) state_dict."""
+        return tuple(state_dict[key].shape[0] for key in (
+            'features.0.weight', 'features.4.weight', 'features.8.weight', 'classifier.1.weight'))
 
 
 def get_transforms(train=True):
-    """Get data transforms for training and testing"""
+    """Get batch augmentation for training and testing.
+
+    Applied to whole uint8 batches on the device after collation (see
+    batch_augment.BatchAugment); DataLoader workers do no per-sample work.
+    """
     
     if train:
-        return transforms.Compose([
-            transforms.Resize((48, 48)),
-            transforms.Grayscale(num_output_channels=1),
-            transforms.RandomHorizontalFlip(p=0.5),
-            transforms.RandomRotation(10),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.5], std=[0.5])
-        ])
+        return BatchAugment(mean=[0.5], std=[0.5], flip_p=0.5, rotation=10)
     else:
-        return transforms.Compose([
-            transforms.Resize((48, 48)),
-            transforms.Grayscale(num_output_channels=1),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.5], std=[0.5])
-        ])
+        return BatchAugment(mean=[0.5], std=[0.5])
 
 
-def train_epoch(model, dataloader, criterion, optimizer, device):
-    """Train for one epoch"""
+def train_epoch(model, dataloader, criterion, optimizer, device, augment, args):
+    """Train for one epoch. Returns (loss, accuracy, samples/sec)."""
     model.train()
     running_loss = 0.0
     correct = 0
     total = 0
+    accum = accumulation_steps(args)
+    throughput = Throughput()
     
+    optimizer.zero_grad(set_to_none=True)
     for batch_idx, (images, labels) in enumerate(dataloader):
-        images = images.to(device)
+        images = prepare_batch(augment(images.to(device)), args)
         labels = labels.to(device)
         
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
+        # Step once per effective batch (and on the last, possibly partial, one);
+        # under DDP only that micro-batch all-reduces gradients
+        step = (batch_idx + 1) % accum == 0 or batch_idx + 1 == len(dataloader)
+        with sync_gradients(model, step):
+            with autocast(args, device):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
+            (loss / accum).backward()
+        
+        if step:
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
         
         running_loss += loss.item()
         _, predicted = outputs.max(1)
@@ -173,12 +206,15 @@ def train_epoch(model, dataloader, criterion, optimizer, device):
         if (batch_idx + 1) % 10 == 0:
             print(f'  Batch {batch_idx + 1}/{len(dataloader)}, Loss: {loss.item():.4f}')
     
-    epoch_loss = running_loss / len(dataloader)
+    # Totals over all ranks (identity when not distributed)
+    seconds = throughput.seconds
+    running_loss, batches, correct, total = all_reduce_sum(running_loss, len(dataloader), correct, total)
+    epoch_loss = running_loss / batches
     epoch_acc = 100. * correct / total
-    return epoch_loss, epoch_acc
+    return epoch_loss, epoch_acc, total / seconds
 
 
-def validate(model, dataloader, criterion, device):
+def validate(model, dataloader, criterion, device, augment, args):
     """Validate the model"""
     model.eval()
     running_loss = 0.0
@@ -187,18 +223,20 @@ def validate(model, dataloader, criterion, device):
     
     with torch.no_grad():
         for images, labels in dataloader:
-            images = images.to(device)
+            images = prepare_batch(augment(images.to(device)), args)
             labels = labels.to(device)
             
-            outputs = model(images)
-            loss = criterion(outputs, labels)
+            with autocast(args, device):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
             
             running_loss += loss.item()
             _, predicted = outputs.max(1)
             total += labels.size(0)
             correct += predicted.eq(labels).sum().item()
     
-    epoch_loss = running_loss / len(dataloader)
+    running_loss, batches, correct, total = all_reduce_sum(running_loss, len(dataloader), correct, total)
+    epoch_loss = running_loss / batches
     epoch_acc = 100. * correct / total
     return epoch_loss, epoch_acc
 
@@ -220,65 +258,60 @@ def count_images_in_dataset(root_dir):
     return train_count, test_count
 
 
-def main():
-    """Main training function"""
-    
-    print("=" * 60)
-    print("FER2013 Emotion Recognition Training")
-    print("=" * 60)
-    
-    # Configuration
-    DATA_DIR = PROJECT_ROOT / "fer2013"
-    MODEL_DIR = PROJECT_ROOT / "models" / "weights"
-    MODEL_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # Training hyperparameters - optimized for faster training
-    BATCH_SIZE = 32
-    NUM_EPOCHS = 10
-    LEARNING_RATE = 0.001
-    WEIGHT_DECAY = 1e-4
-    
-    # Check dataset
-    train_count, test_count = count_images_in_dataset(DATA_DIR)
-    print(f"\nDataset: {train_count} training images, {test_count} test images")
-    
-    if train_count == 0:
-        print("ERROR: No training images found!")
-        return
-    
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train FER2013CNN on FER2013")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--lr", type=float, default=0.001)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--lr-factor", type=float, default=0.5,
+                        help="ReduceLROnPlateau factor")
+    parser.add_argument("--lr-patience", type=int, default=3,
+                        help="ReduceLROnPlateau patience (epochs)")
+    add_perf_args(parser, batch_size=32, num_workers=2)
+    return parser.parse_args(argv)
+
+
+def prepare_data(args):
+    """Packed FER2013 directory (the image folders decoded once into memmap arrays)."""
+    return ensure_packed(PROJECT_ROOT / "fer2013")
+
+
+def train(args, packed_dir, model_dir=None, on_epoch=None):
+    """Train FER2013CNN on the packed dataset with the hyperparameters in `args`.
+    
+    Args:
+        args: parse_args() namespace (epochs, lr, weight_decay, performance options)
+        packed_dir: directory written by fer2013_pack.ensure_packed
+        model_dir: where fer2013_cnn_best.pth / fer2013_cnn.pth are saved
+            (None: nothing is written, e.g. sweep trials)
+        on_epoch: optional callback(epoch, metrics) after each validation;
+            returning True stops training early
+    
+    Returns:
+        dict with best_acc, best_epoch, epochs_run, stopped_early, final
+        accuracy / macro-F1 of the best model and the per-epoch history
+    """
     # Device configuration
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"\nUsing device: {device}")
+    print(f"Performance: {describe(args, device)}")
     
     # Create datasets
-    train_dataset = FER2013Dataset(
-        root_dir=DATA_DIR,
-        split='train',
-        transform=get_transforms(train=True)
-    )
-    
-    test_dataset = FER2013Dataset(
-        root_dir=DATA_DIR,
-        split='test',
-        transform=get_transforms(train=False)
-    )
-    
-    # Create data loaders
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=BATCH_SIZE,
-        shuffle=True,
-        num_workers=2,
-        pin_memory=True if torch.cuda.is_available() else False
-    )
-    
-    test_loader = DataLoader(
-        test_dataset,
-        batch_size=BATCH_SIZE,
-        shuffle=False,
-        num_workers=2,
-        pin_memory=True if torch.cuda.is_available() else False
-    )
+    train_dataset = PackedFER2013Dataset(packed_dir, split='train')
+    test_dataset = PackedFER2013Dataset(packed_dir, split='test')
+    
+    # Augmentation runs batch-wise on the device
+    train_augment = get_transforms(train=True).to(device)
+    test_augment = get_transforms(train=False).to(device)
+    
+    # Create data loaders (each rank gets its own shard under torchrun;
+    # the test shard is unpadded so no sample is counted twice)
+    train_sampler = distributed_sampler(train_dataset, shuffle=True)
+    test_sampler = distributed_eval_sampler(test_dataset)
+    train_loader = DataLoader(train_dataset, shuffle=train_sampler is None, sampler=train_sampler,
+                              **loader_kwargs(args, device))
+    test_loader = DataLoader(test_dataset, shuffle=False, sampler=test_sampler,
+                             **loader_kwargs(args, device))
     
     print(f"\nTraining batches: {len(train_loader)}")
     print(f"Test batches: {len(test_loader)}")
@@ -292,10 +325,14 @@ def main():
     print(f"\nTotal parameters: {total_params:,}")
     print(f"Trainable parameters: {trainable_params:,}")
     
+    # channels_last / DDP / torch.compile; `model` stays the module that gets saved
+    train_model = prepare_model(model, args)
+    
     # Loss function and optimizer
     criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE, weight_decay=WEIGHT_DECAY)
-    scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', factor=0.5, patience=3)
+    optimizer = optim.Adam(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', factor=args.lr_factor,
+                                                     patience=args.lr_patience)
     
     # Training loop
     print("\n" + "=" * 60)
@@ -303,18 +340,26 @@ def main():
     print("=" * 60)
     
     best_test_acc = 0.0
+    best_epoch = 0
     best_model_state = None
+    history = []
+    stopped_early = False
     
-    for epoch in range(NUM_EPOCHS):
-        print(f"\nEpoch {epoch + 1}/{NUM_EPOCHS}")
+    for epoch in range(args.epochs):
+        print(f"\nEpoch {epoch + 1}/{args.epochs}")
         print("-" * 40)
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
         
         # Train
-        train_loss, train_acc = train_epoch(model, train_loader, criterion, optimizer, device)
-        print(f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%")
+        train_loss, train_acc, samples_per_sec = train_epoch(
+            train_model, train_loader, criterion, optimizer, device, train_augment, args
+        )
+        print(f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, "
+              f"{samples_per_sec:.0f} samples/s")
         
         # Validate
-        val_loss, val_acc = validate(model, test_loader, criterion, device)
+        val_loss, val_acc = validate(train_model, test_loader, criterion, device, test_augment, args)
         print(f"Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%")
         
         # Update learning rate
@@ -323,60 +368,100 @@ def main():
         # Save best model
         if val_acc > best_test_acc:
             best_test_acc = val_acc
-            best_model_state = model.state_dict().copy()
+            best_epoch = epoch + 1
+            # Clone: state_dict() tensors alias the live parameters
+            best_model_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
             print(f"*** New best model! Val Acc: {val_acc:.2f}% ***")
             
-            # Save best model immediately
-            best_model_path = MODEL_DIR / "fer2013_cnn_best.pth"
-            torch.save(best_model_state, best_model_path)
-            print(f"Saved best model to {best_model_path}")
+            # Save best model immediately (rank 0 only)
+            if model_dir is not None:
+                best_model_path = Path(model_dir) / "fer2013_cnn_best.pth"
+                save_on_main(best_model_state, best_model_path)
+                print(f"Saved best model to {best_model_path}")
+        
+        metrics = {
+            "epoch": epoch + 1, "train_loss": train_loss, "train_acc": train_acc,
+            "val_loss": val_loss, "val_acc": val_acc, "samples_per_sec": samples_per_sec,
+        }
+        history.append(metrics)
+        if on_epoch is not None and on_epoch(epoch + 1, metrics):
+            print(f"Stopping early after epoch {epoch + 1}")
+            stopped_early = True
+            break
     
     # Load best model and save final
     if best_model_state is not None:
         model.load_state_dict(best_model_state)
     
-    final_model_path = MODEL_DIR / "fer2013_cnn.pth"
-    torch.save(model.state_dict(), final_model_path)
-    print(f"\nFinal model saved to {final_model_path}")
+    if model_dir is not None:
+        final_model_path = Path(model_dir) / "fer2013_cnn.pth"
+        save_on_main(model.state_dict(), final_model_path)
+        print(f"\nFinal model saved to {final_model_path}")
     
     # Final evaluation
     print("\n" + "=" * 60)
     print("Final Evaluation on Test Set")
     print("=" * 60)
     
-    final_loss, final_acc = validate(model, test_loader, criterion, device)
-    print(f"Final Test Accuracy: {final_acc:.2f}%")
-    
     # Per-class accuracy
     model.eval()
-    class_correct = [0] * 7
-    class_total = [0] * 7
+    matrix = torch.zeros(7, 7, dtype=torch.long)
     
     with torch.no_grad():
         for images, labels in test_loader:
-            images = images.to(device)
-            labels = labels.to(device)
-            outputs = model(images)
-            _, predicted = outputs.max(1)
-            
-            for i in range(len(labels)):
-                label = labels[i].item()
-                class_total[label] += 1
-                if predicted[i] == labels[i]:
-                    class_correct[label] += 1
-    
-    print("\nPer-class accuracy:")
-    for i in range(7):
-        emotion = FER2013Dataset.IDX_TO_EMOTION[i]
-        acc = 100. * class_correct[i] / class_total[i] if class_total[i] > 0 else 0
-        print(f"  {emotion}: {acc:.2f}%")
+            images = prepare_batch(test_augment(images.to(device)), args)
+            with autocast(args, device):
+                outputs = train_model(images)
+            matrix += confusion_matrix(outputs.argmax(1), labels, 7)
+    
+    summary = summarize(all_reduce_sum(matrix), FER2013Dataset.EMOTION_LABELS)
+    print(f"Final Test Accuracy: {summary['accuracy']:.2f}%")
+    print_per_class(summary)
     
     print("\n" + "=" * 60)
     print("Training Complete!")
     print(f"Best Test Accuracy: {best_test_acc:.2f}%")
     print("=" * 60)
+    
+    return {
+        "best_acc": best_test_acc,
+        "best_epoch": best_epoch,
+        "epochs_run": len(history),
+        "stopped_early": stopped_early,
+        "final_acc": summary["accuracy"],
+        "macro_f1": summary["macro_f1"],
+        "history": history,
+        "state_dict": best_model_state,
+    }
+
+
+def main(argv=None):
+    """Main training function"""
+    args = parse_args(argv)
+    setup_distributed()
+    configure_threads(args)
+    
+    print("=" * 60)
+    print("FER2013 Emotion Recognition Training")
+    print("=" * 60)
+    
+    # Configuration
+    MODEL_DIR = PROJECT_ROOT / "models" / "weights"
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # Decode the image folders once into memmap arrays (no-op when up to date)
+    packed_dir = main_process_first(prepare_data, args)
+    splits = load_manifest(packed_dir)["splits"]
+    train_count, test_count = splits["train"]["count"], splits["test"]["count"]
+    print(f"\nDataset: {train_count} training images, {test_count} test images")
+    
+    if train_count == 0:
+        print("ERROR: No training images found!")
+        return
+    
+    train(args, packed_dir, MODEL_DIR)
+    cleanup_distributed()
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,135 @@
+"""
+Data-Parallel Scaling Benchmark
+
+Runs the real training step (train_fer2013.train_epoch or
+train_efficientnet.train_one_epoch) under 1..N local gloo ranks and
+reports global samples/second and scaling efficiency.
+
+Usage:
+    python src/core/train_scaling_bench.py --ranks 1 2 4 8 --samples 4096
+    python src/core/train_scaling_bench.py --model efficientnet --ranks 1 2 4 \
+        --samples 256 --batch-size 8 --bf16 --channels-last
+
+Efficiency for N ranks = rate(N) / (N * rate(1)). Every rank gets the same
+number of threads in every run (--threads-per-rank), so the numbers show
+the cost of distribution rather than of changing per-process resources.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, Subset
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.fer2013_pack import PackedFER2013Dataset, ensure_packed
+from src.core.train_dist import distributed_sampler
+from src.core.train_perf import add_perf_args, loader_kwargs, prepare_model
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _build(model_name, packed_dir):
+    """(model, dataset, augment, train_fn) for the benchmarked script."""
+    if model_name == "efficientnet":
+        from src.core.advanced import train_efficientnet as script
+        from src.core.advanced.efficientnet_emotion import EfficientNetEmotionModel
+        dataset = PackedFER2013Dataset(packed_dir, "train", channels=3,
+                                       label_map=script.packed_label_map())
+        model = EfficientNetEmotionModel(num_classes=8, pretrained=False)
+        return model, dataset, script.get_train_transforms(), script.train_one_epoch
+    from src.core import train_fer2013 as script
+    dataset = PackedFER2013Dataset(packed_dir, "train")
+    return script.FER2013CNN(num_classes=7), dataset, script.get_transforms(train=True), script.train_epoch
+
+
+def _worker(rank, world, port, args, results):
+    os.environ.update({
+        "MASTER_ADDR": "127.0.0.1", "MASTER_PORT": str(port),
+        "RANK": str(rank), "WORLD_SIZE": str(world),
+        "LOCAL_RANK": str(rank), "LOCAL_WORLD_SIZE": str(world),
+    })
+    torch.set_num_threads(args.threads_per_rank)
+    if world > 1:
+        dist.init_process_group("gloo", rank=rank, world_size=world)
+    torch.manual_seed(0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, dataset, augment, train_fn = _build(args.model, args.packed_dir)
+    dataset = Subset(dataset, range(min(args.samples, len(dataset))))
+    device = torch.device("cpu")
+    train_model = prepare_model(model, args)
+    optimizer = optim.Adam(model.parameters(), lr=1e-3)
+    sampler = distributed_sampler(dataset, shuffle=True)
+    loader = DataLoader(dataset, shuffle=sampler is None, sampler=sampler, **loader_kwargs(args, device))
+
+    rates = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for epoch in range(args.warmup + args.epochs):
+            if sampler is not None:
+                sampler.set_epoch(epoch)
+            _, _, rate = train_fn(train_model, loader, nn.CrossEntropyLoss(), optimizer,
+                                  device, augment, args)
+            if epoch >= args.warmup:
+                rates.append(rate)
+    if rank == 0:
+        results[world] = sum(rates) / len(rates)
+    if world > 1:
+        dist.destroy_process_group()
+
+
+def run(args):
+    ensure_packed(packed_dir=args.packed_dir)
+    manager = mp.Manager()
+    results = manager.dict()
+    for world in args.ranks:
+        start = time.perf_counter()
+        mp.spawn(_worker, args=(world, _free_port(), args, results), nprocs=world, join=True)
+        print(f"[ScalingBench] {world} rank(s): {results[world]:8.1f} samples/s "
+              f"({time.perf_counter() - start:.1f}s)")
+
+    base = results.get(1)
+    print(f"\n{'ranks':>5} {'samples/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for world in args.ranks:
+        rate = results[world]
+        speedup = rate / base if base else float("nan")
+        print(f"{world:>5} {rate:>10.1f} {speedup:>8.2f} {speedup / world:>10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data-parallel training scaling benchmark")
+    parser.add_argument("--model", choices=("fer2013_cnn", "efficientnet"), default="fer2013_cnn")
+    parser.add_argument("--ranks", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--samples", type=int, default=4096, help="training samples per epoch")
+    parser.add_argument("--epochs", type=int, default=2, help="timed epochs per run")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--threads-per-rank", type=int, default=0,
+                        help="0 = CPU count divided by the largest --ranks value")
+    parser.add_argument("--packed-dir", default=str(PROJECT_ROOT / "data" / "fer2013_packed"))
+    add_perf_args(parser, batch_size=32, num_workers=0)
+    args = parser.parse_args()
+    if 1 not in args.ranks:
+        args.ranks = [1] + args.ranks
+    args.threads_per_rank = args.threads_per_rank or max(1, (os.cpu_count() or 1) // max(args.ranks))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import streamlit as st
 from datetime import datetime, timedelta
 
+from src.state.history_store import EmotionHistoryStore
+
 # Correctly use lowercase keys to match the application's normalized data
 EMOTION_SCORE = {
     'anger': -3, 'contempt': -2, 'disgust': -2, 'fear': -2,
@@ -15,14 +17,11 @@ def update_ers(current_emotion):
     This function now correctly uses st.session_state for history.
     """
     if 'emotion_history' not in st.session_state:
-        st.session_state.emotion_history = []
+        st.session_state.emotion_history = EmotionHistoryStore()
 
     now = datetime.now()
-    # Filter for emotions within the recent period
-    recent_emotions = [
-        rec for rec in st.session_state.emotion_history 
-        if now - rec['timestamp'] <= RECENT_PERIOD
-    ]
+    # Only the recent window is materialized, not the whole history
+    recent_emotions = st.session_state.emotion_history.since(now - RECENT_PERIOD)
     
     # If no recent history, the score is just the current emotion's score
     if not recent_emotions:
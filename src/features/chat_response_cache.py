@@ -0,0 +1,215 @@
+"""
+Chat Response Cache
+
+Sits in front of the chatbot's LLM calls. Many messages are near-identical
+under the same detected emotion ("I feel sad", "feeling sad today"), so a
+previous reply can be reused instead of paying another round trip.
+
+Features:
+  - Partitioned per emotion; each partition is a bounded LRU with TTL
+  - Exact hits on a normalised message (lowercase, stopwords removed,
+    light suffix stemming, word order ignored)
+  - Near-duplicate hits via MinHash signatures + LSH banding, verified
+    with exact Jaccard similarity against a threshold
+  - Negation words are kept and must match ("not sad" never reuses "sad")
+
+Callers are responsible for bypassing the cache for crisis messages.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_PER_EMOTION = 256
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_THRESHOLD = 0.6
+
+STOPWORDS = frozenset("""
+a an the i im me my myself we our you your he she it its they them this that
+these those am is are was were be been being have has had do does did so just
+really very today right now bit kind sort to of in on at for with about and or
+but if then than too also still some any
+""".split())
+
+# Normalised to "not"; a negated message never matches a non-negated one
+NEGATIONS = frozenset({"not", "no", "never", "nothing", "nobody", "without", "cant", "dont",
+                       "wont", "isnt", "wasnt", "didnt", "doesnt", "cannot"})
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_SUFFIXES = ("ing", "edly", "ed", "ly", "es", "s")
+
+# MinHash parameters: NUM_PERM = BANDS * ROWS
+NUM_PERM = 64
+BANDS = 16
+_MERSENNE = (1 << 61) - 1
+
+
+def _stem(token):
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def message_tokens(text):
+    """Normalised token set for a chat message."""
+    tokens = set()
+    for tok in _TOKEN.findall((text or "").lower()):
+        if tok.endswith("n't"):
+            tokens.add("not")
+            continue
+        tok = tok.replace("'", "")
+        if tok in NEGATIONS:
+            tokens.add("not")
+            continue
+        if tok in STOPWORDS:
+            continue
+        tokens.add(_stem(tok))
+    return frozenset(tokens)
+
+
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _MinHasher:
+    """Universal-hash MinHash over token sets (vectorised with NumPy)."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=7):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens):
+        if not tokens:
+            return np.full(len(self.a), np.iinfo(np.uint64).max, dtype=np.uint64)
+        x = np.array([_token_hash(t) % _MERSENNE for t in tokens], dtype=np.uint64)
+        # (a * x + b) mod p, in uint64 with wrap-around — fine for hashing
+        h = (self.a[None, :] * x[:, None] + self.b[None, :]) % np.uint64(_MERSENNE)
+        return h.min(axis=0)
+
+
+class _Partition:
+    """Bounded LRU of cached replies for one emotion, with an LSH index."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires_at, tokens, signature, response)
+        self.buckets = {}             # (band, band_hash) -> set(keys)
+
+
+class ChatResponseCache:
+    """Per-emotion reply cache with exact and near-duplicate lookups."""
+
+    def __init__(self, max_per_emotion=DEFAULT_MAX_PER_EMOTION, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_per_emotion = max_per_emotion
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = _MinHasher(num_perm)
+        self._partitions = {}
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0}
+
+    def get(self, emotion, message):
+        """Cached reply for a (near-)identical message under `emotion`, or None."""
+        tokens = message_tokens(message)
+        if not tokens:
+            return None
+        key = " ".join(sorted(tokens))
+        now = time.monotonic()
+        with self._lock:
+            part = self._partitions.get(self._emotion_key(emotion))
+            if part is None:
+                self.stats["misses"] += 1
+                return None
+
+            entry = part.entries.get(key)
+            if entry is not None and entry[0] >= now:
+                part.entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry[3]
+
+            # Single-word messages only ever match exactly
+            if len(tokens) > 1:
+                signature = self._hasher.signature(tokens)
+                best_key, best_sim = None, self.threshold
+                for cand in self._candidates(part, signature):
+                    expires_at, cand_tokens, _, _ = part.entries[cand]
+                    if expires_at < now or not self._same_negation(tokens, cand_tokens):
+                        continue
+                    sim = len(tokens & cand_tokens) / len(tokens | cand_tokens)
+                    if sim >= best_sim:
+                        best_key, best_sim = cand, sim
+                if best_key is not None:
+                    part.entries.move_to_end(best_key)
+                    self.stats["near_hits"] += 1
+                    return part.entries[best_key][3]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, emotion, message, response):
+        tokens = message_tokens(message)
+        if not tokens or not response:
+            return
+        key = " ".join(sorted(tokens))
+        signature = self._hasher.signature(tokens)
+        with self._lock:
+            part = self._partitions.setdefault(self._emotion_key(emotion), _Partition())
+            if key in part.entries:
+                self._remove(part, key)
+            part.entries[key] = (time.monotonic() + self.ttl, tokens, signature, response)
+            for band_key in self._band_keys(signature):
+                part.buckets.setdefault(band_key, set()).add(key)
+            while len(part.entries) > self.max_per_emotion:
+                self._remove(part, next(iter(part.entries)))
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _emotion_key(emotion):
+        emotion = (emotion or "neutral").lower()
+        return "anger" if emotion == "angry" else emotion
+
+    @staticmethod
+    def _same_negation(a, b):
+        # All negations are normalised to "not" by message_tokens
+        return ("not" in a) == ("not" in b)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield band, chunk.tobytes()
+
+    def _candidates(self, part, signature):
+        found = set()
+        for band_key in self._band_keys(signature):
+            found |= part.buckets.get(band_key, set())
+        return found
+
+    def _remove(self, part, key):
+        _, _, signature, _ = part.entries.pop(key)
+        for band_key in self._band_keys(signature):
+            bucket = part.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del part.buckets[band_key]
+
+
+# Shared by all chatbot sessions in the process
+chat_response_cache = ChatResponseCache()
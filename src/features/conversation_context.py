@@ -0,0 +1,215 @@
+"""
+Conversation Context Manager
+
+Builds the conversation part of each chatbot prompt under a fixed token
+budget, so prompt size (and LLM latency) stays flat however long the chat
+runs.
+
+Features:
+  - Sliding window of the most recent turns, kept verbatim
+  - Older turns folded into a rolling summary every N turns
+  - Local extractive summariser by default; optionally refined by a cheap
+    LLM call in the background (ERS_CHAT_SUMMARY=llm)
+  - Hard per-request token budget: newest turns are dropped first, the
+    summary is trimmed to its own cap, huge messages are truncated
+"""
+
+import math
+import os
+import re
+import threading
+
+DEFAULT_WINDOW_TURNS = 6
+DEFAULT_TOKEN_BUDGET = 1200
+DEFAULT_SUMMARY_EVERY = 4
+DEFAULT_SUMMARY_TOKENS = 250
+
+# Rough chars-per-token ratio for English text (no tokenizer dependency)
+_CHARS_PER_TOKEN = 4
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+SUMMARY_PROMPT = (
+    "Summarise this conversation between a user and a wellness companion in at most "
+    "{words} words. Keep what the user shared about their feelings, situation and "
+    "anything they found helpful. Write in third person about 'the user'.\n\n"
+    "Earlier summary:\n{summary}\n\nNew messages:\n{turns}"
+)
+
+
+def estimate_tokens(text):
+    """Approximate token count of `text`."""
+    return math.ceil(len(text or "") / _CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut `text` to about `max_tokens` tokens (on a word boundary)."""
+    limit = max_tokens * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+def _format_turn(turn):
+    speaker = "User" if turn["role"] == "user" else "Companion"
+    return f"{speaker}: {turn['content']}"
+
+
+class ConversationContext:
+    """Sliding window + rolling summary for one chat session."""
+
+    def __init__(self, window_turns=DEFAULT_WINDOW_TURNS, token_budget=DEFAULT_TOKEN_BUDGET,
+                 summary_every=DEFAULT_SUMMARY_EVERY, summary_tokens=DEFAULT_SUMMARY_TOKENS,
+                 llm_client=None):
+        self.window_turns = window_turns
+        self.token_budget = token_budget
+        self.summary_every = summary_every
+        self.summary_tokens = summary_tokens
+        self.llm_client = llm_client
+
+        self.turns = []          # recent turns, oldest first
+        self.summary_points = []  # local summary, one line per folded user turn
+        self.llm_summary = None
+        self._points_since_llm = []  # local points not yet covered by llm_summary
+        self._summary_version = 0
+        # Re-entrant: a finished LLM future may call back while we hold it
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Updating
+    # ------------------------------------------------------------------
+
+    def add_exchange(self, user_message, assistant_message):
+        """Record one user/companion exchange and fold old turns if due."""
+        with self._lock:
+            self.turns.append({"role": "user", "content": user_message})
+            self.turns.append({"role": "assistant", "content": assistant_message})
+            overflow = len(self.turns) - self.window_turns
+            if overflow >= self.summary_every:
+                folded, self.turns = self.turns[:overflow], self.turns[overflow:]
+                self._fold(folded)
+
+    def clear(self):
+        with self._lock:
+            self.turns = []
+            self.summary_points = []
+            self.llm_summary = None
+            self._points_since_llm = []
+            self._summary_version += 1
+
+    def __len__(self):
+        return len(self.turns)
+
+    @property
+    def summary(self):
+        if self.llm_summary:
+            return "\n".join([self.llm_summary] + [f"- {p}" for p in self._points_since_llm])
+        return "\n".join(f"- {p}" for p in self.summary_points)
+
+    # ------------------------------------------------------------------
+    # Prompt building
+    # ------------------------------------------------------------------
+
+    def render(self, reserved_tokens=0):
+        """Summary + recent turns as prompt text, within the token budget.
+
+        Args:
+            reserved_tokens: tokens already used by the rest of the prompt
+                             (instructions, current message)
+        """
+        budget = self.token_budget - reserved_tokens
+        if budget <= 0:
+            return ""
+        with self._lock:
+            summary = self.summary
+            turns = list(self.turns)
+
+        sections = []
+        if summary:
+            summary = truncate_to_tokens(summary, min(self.summary_tokens, budget))
+            sections.append(f"Summary of the earlier conversation:\n{summary}")
+            budget -= estimate_tokens(sections[0])
+
+        # Newest turns first until the budget runs out
+        recent = []
+        for turn in reversed(turns):
+            line = _format_turn(turn)
+            cost = estimate_tokens(line) + 1
+            if cost > budget:
+                break
+            recent.append(line)
+            budget -= cost
+        if recent:
+            sections.append("Recent messages:\n" + "\n".join(reversed(recent)))
+        return "\n\n".join(sections)
+
+    def build_prompt(self, head, user_message, tail=""):
+        """Full prompt: head, conversation context, current message, tail.
+
+        The current message is capped at half the budget so it can never
+        push the prompt over budget on its own.
+        """
+        user_message = truncate_to_tokens(user_message, self.token_budget // 2)
+        fixed = f"{head}User: {user_message}\n{tail}"
+        context = self.render(reserved_tokens=estimate_tokens(fixed))
+        if context:
+            return f"{head}{context}\n\nUser: {user_message}\n{tail}"
+        return fixed
+
+    # ------------------------------------------------------------------
+    # Summarisation
+    # ------------------------------------------------------------------
+
+    def _fold(self, folded):
+        """Fold turns into the summary (caller holds the lock)."""
+        for turn in folded:
+            if turn["role"] != "user":
+                continue
+            first = _SENTENCE.split(turn["content"].strip(), 1)[0]
+            point = "The user said: " + truncate_to_tokens(first, 40)
+            self.summary_points.append(point)
+            self._points_since_llm.append(point)
+        # Keep only the newest points that fit the summary cap
+        for points in (self.summary_points, self._points_since_llm):
+            while len(points) > 1 and estimate_tokens("\n".join(points)) > self.summary_tokens:
+                points.pop(0)
+
+        self._summary_version += 1
+        if self.llm_client is not None:
+            self._refine_with_llm(folded, self._summary_version)
+
+    def _refine_with_llm(self, folded, version):
+        """Ask the LLM for a better summary in the background."""
+        prompt = SUMMARY_PROMPT.format(
+            words=int(self.summary_tokens * 0.75),
+            summary=self.summary or "(none)",
+            turns="\n".join(_format_turn(t) for t in folded),
+        )
+        future = self.llm_client.submit(prompt)
+
+        def apply(f):
+            try:
+                text = f.result().strip()
+            except Exception as e:
+                print(f"[ConversationContext] Summary refresh failed: {e}")
+                return
+            with self._lock:
+                # Ignore results that were overtaken by a later fold or clear
+                if version == self._summary_version and text:
+                    self.llm_summary = truncate_to_tokens(text, self.summary_tokens)
+                    self._points_since_llm = []
+
+        future.add_done_callback(apply)
+
+
+def make_context(llm_client=None):
+    """New context configured from the environment.
+
+    ERS_CHAT_SUMMARY=llm enables background LLM summaries (needs a client),
+    ERS_CHAT_TOKEN_BUDGET overrides the per-request token budget.
+    """
+    use_llm = os.environ.get("ERS_CHAT_SUMMARY", "local").lower() == "llm"
+    return ConversationContext(
+        token_budget=int(os.environ.get("ERS_CHAT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)),
+        llm_client=llm_client if use_llm else None,
+    )
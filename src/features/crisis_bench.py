@@ -0,0 +1,79 @@
+"""
+Crisis Detector Benchmark
+
+Scores CrisisDetector against the labelled corpus in
+src/data/crisis_corpus.jsonl (precision / recall / misclassified lines)
+and measures per-message latency.
+
+Usage:
+    python -m src.features.crisis_bench [--corpus path] [--repeat 2000]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from src.features.crisis_detector import crisis_detector
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent.parent / "data" / "crisis_corpus.jsonl"
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(corpus):
+    tp = fp = fn = tn = 0
+    errors = []
+    for row in corpus:
+        predicted = crisis_detector.is_crisis(row["text"])
+        actual = bool(row["label"])
+        if predicted and actual:
+            tp += 1
+        elif predicted:
+            fp += 1
+            errors.append(("false positive", row["text"]))
+        elif actual:
+            fn += 1
+            errors.append(("false negative", row["text"]))
+        else:
+            tn += 1
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "precision": precision, "recall": recall, "errors": errors}
+
+
+def time_per_message(texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            crisis_detector.is_crisis(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate and time the crisis detector")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    result = evaluate(corpus)
+    print(f"[CrisisBench] {len(corpus)} labelled messages, {crisis_detector.phrase_count} phrases")
+    print(f"  precision={result['precision']:.3f} recall={result['recall']:.3f} "
+          f"(tp={result['tp']} fp={result['fp']} fn={result['fn']} tn={result['tn']})")
+    for kind, text in result["errors"]:
+        print(f"  {kind}: {text}")
+
+    texts = [row["text"] for row in corpus]
+    print(f"  {time_per_message(texts, args.repeat):.1f} µs per message")
+    long_text = " ".join(texts) * 4
+    print(f"  {time_per_message([long_text], max(1, args.repeat // 50)):.1f} µs "
+          f"for a {len(long_text)}-char journal entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Gemini Client Benchmark
+
+Runs GeminiClient against the local stub server (or any GEMINI_API_BASE)
+and reports latency, time-to-first-token and failure handling.
+
+Usage:
+    python -m src.features.gemini_bench --requests 50 --concurrency 8 \
+        --latency-ms 300 --fail-rate 0.2 --hang-rate 0.02
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.features.gemini_client import GeminiClient, GeminiError
+from src.features.gemini_stub_server import start_in_thread
+
+
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def _run_stream(client, prompt):
+    start = time.perf_counter()
+    first = None
+    text = []
+    for chunk in client.stream(prompt):
+        if first is None:
+            first = time.perf_counter() - start
+        text.append(chunk)
+    return first, time.perf_counter() - start, "".join(text)
+
+
+def run(args):
+    base_url = args.base_url
+    server = None
+    if not base_url:
+        server, base_url = start_in_thread(
+            latency_ms=args.latency_ms, chunk_delay_ms=args.chunk_delay_ms,
+            fail_rate=args.fail_rate, hang_rate=args.hang_rate, seed=0,
+        )
+    client = GeminiClient(
+        api_key="bench", base_url=base_url,
+        timeout=(2.0, args.read_timeout), max_retries=args.retries, backoff=args.backoff,
+    )
+    prompt = "I feel anxious about tomorrow."
+
+    ttft, totals, errors = [], [], 0
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(_run_stream, client, prompt) for _ in range(args.requests)]
+        for f in futures:
+            try:
+                first, total, _ = f.result()
+            except GeminiError:
+                errors += 1
+                continue
+            if first is not None:
+                ttft.append(first * 1000)
+            totals.append(total * 1000)
+    wall = time.perf_counter() - wall
+
+    print(f"[GeminiBench] {args.requests} streamed requests, concurrency {args.concurrency}, "
+          f"{wall:.2f}s wall")
+    print(f"  ok={len(totals)} errors={errors} "
+          f"http_requests={client.stats['requests']} retries={client.stats['retries']}")
+    if totals:
+        print(f"  first token  p50={_percentile(ttft, 50):7.1f} ms  p95={_percentile(ttft, 95):7.1f} ms")
+        print(f"  full reply   p50={_percentile(totals, 50):7.1f} ms  p95={_percentile(totals, 95):7.1f} ms"
+              f"  mean={statistics.mean(totals):7.1f} ms")
+    if server:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Gemini chat client")
+    parser.add_argument("--base-url", default=None, help="skip the stub and hit this API base")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--chunk-delay-ms", type=float, default=30)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--read-timeout", type=float, default=5.0)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=0.2)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
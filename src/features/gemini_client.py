@@ -0,0 +1,205 @@
+"""
+Gemini Chat Client
+
+Thin REST client for the Gemini generateContent API, shared by the
+wellness chatbot and the companion prompt in emotion/gemini_integration.py.
+
+Features:
+  - One pooled requests.Session per client (no per-message model setup)
+  - Connect/read timeouts on every call
+  - Retries with exponential backoff + jitter on 429 / 5xx / network errors
+  - Token streaming over server-sent events (streamGenerateContent?alt=sse)
+  - HTTP work runs on a small thread pool, off the Streamlit script thread
+
+Environment:
+  GEMINI_API_KEY    API key (GOOGLE_API_KEY is accepted as well)
+  GEMINI_MODEL      model name, default "gemini-1.5-flash"
+  GEMINI_API_BASE   API base URL; point it at gemini_stub_server for
+                    offline testing and benchmarks
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_BASE = "https://generativelanguage.googleapis.com"
+DEFAULT_MODEL = "gemini-1.5-flash"
+API_VERSION = "v1beta"
+
+# (connect, read) seconds; read applies between streamed chunks too
+DEFAULT_TIMEOUT = (5.0, 30.0)
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Shared by all clients; chat calls are I/O bound
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini")
+
+# Sentinel marking the end of a stream on the chunk queue
+_DONE = object()
+
+
+class GeminiError(Exception):
+    """Raised when the Gemini API call fails after all retries."""
+
+
+class GeminiClient:
+    """Session-pooled Gemini REST client with timeouts, retries and streaming."""
+
+    def __init__(self, api_key=None, model=None, base_url=None, system_instruction=None,
+                 timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF):
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+        self.model = (model or os.environ.get("GEMINI_MODEL") or DEFAULT_MODEL).removeprefix("models/")
+        self.base_url = (base_url or os.environ.get("GEMINI_API_BASE") or DEFAULT_API_BASE).rstrip("/")
+        self.system_instruction = system_instruction
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if self.api_key:
+            self.session.headers["x-goog-api-key"] = self.api_key
+
+        # Counters for benchmarks / diagnostics
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.api_key)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def generate(self, prompt, system_instruction=None):
+        """Blocking call: full response text for `prompt`."""
+        url = self._url(f"models/{self.model}:generateContent")
+        resp = self._post(url, self._payload(prompt, system_instruction))
+        return self._extract_text(resp.json())
+
+    def submit(self, prompt, system_instruction=None):
+        """Run `generate` on the client thread pool; returns a Future."""
+        return _executor.submit(self.generate, prompt, system_instruction)
+
+    def stream(self, prompt, system_instruction=None):
+        """Yield response text chunks as they arrive.
+
+        The HTTP request runs on the thread pool; this generator only
+        drains a queue, so it can be handed straight to st.write_stream.
+        Raises GeminiError on failure or if no chunk arrives within the
+        read timeout.
+        """
+        chunks = queue.Queue()
+        _executor.submit(self._stream_worker, prompt, system_instruction, chunks)
+        wait = self.timeout[1] + self.timeout[0]
+        while True:
+            try:
+                item = chunks.get(timeout=wait)
+            except queue.Empty:
+                raise GeminiError(f"No response from Gemini within {wait:.0f}s")
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def list_models(self):
+        """Names of models that support generateContent."""
+        url = self._url("models")
+        names = []
+        params = {"pageSize": 100}
+        while True:
+            data = self._request("GET", url, params=params).json()
+            for m in data.get("models", []):
+                if "generateContent" in m.get("supportedGenerationMethods", []):
+                    names.append(m["name"])
+            token = data.get("nextPageToken")
+            if not token:
+                return names
+            params["pageToken"] = token
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _url(self, path):
+        return f"{self.base_url}/{API_VERSION}/{path}"
+
+    def _payload(self, prompt, system_instruction):
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        instruction = system_instruction or self.system_instruction
+        if instruction:
+            payload["systemInstruction"] = {"parts": [{"text": instruction}]}
+        return payload
+
+    def _post(self, url, payload, **kwargs):
+        return self._request("POST", url, json=payload, **kwargs)
+
+    def _request(self, method, url, **kwargs):
+        """HTTP request with timeout and retry/backoff on transient errors."""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+                delay = self.backoff * (2 ** (attempt - 1))
+                time.sleep(delay + random.uniform(0, delay / 2))
+            self._count("requests")
+            try:
+                resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                continue
+            if resp.status_code in _RETRY_STATUS:
+                last_error = GeminiError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                resp.close()
+                continue
+            if resp.status_code >= 400:
+                self._count("failures")
+                raise GeminiError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+            return resp
+        self._count("failures")
+        raise GeminiError(f"Gemini request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def _stream_worker(self, prompt, system_instruction, chunks):
+        url = self._url(f"models/{self.model}:streamGenerateContent")
+        try:
+            # Retries only cover establishing the stream, never a half-sent answer
+            resp = self._post(url, self._payload(prompt, system_instruction),
+                              params={"alt": "sse"}, stream=True)
+            with resp:
+                for line in resp.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    text = self._extract_text(json.loads(line[5:].strip()))
+                    if text:
+                        chunks.put(text)
+            chunks.put(_DONE)
+        except GeminiError as e:
+            chunks.put(e)
+        except Exception as e:
+            chunks.put(GeminiError(f"Gemini stream failed: {e}"))
+
+    @staticmethod
+    def _extract_text(data):
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(p.get("text", "") for p in parts)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
@@ -0,0 +1,163 @@
+"""
+Gemini Model Discovery
+
+Finds a Gemini model that supports generateContent once per process and
+shares one configured GeminiClient across every Streamlit session.
+
+Features:
+  - Discovery result persisted to a small JSON file with a TTL, so app
+    restarts skip the list-models round trip
+  - Discovery runs on a background thread: the shared client is usable
+    straight away with the cached (or default) model and switches over
+    when discovery finishes
+  - Thread-safe accessor; a missing API key yields no client instead of
+    an error, and nothing here touches the Streamlit UI
+  - GEMINI_MODEL, when set, is used as-is and skips discovery
+
+Environment:
+  ERS_GEMINI_MODEL_CACHE   cache file (default data/gemini_models.json)
+  ERS_GEMINI_MODEL_TTL     cache lifetime in hours (default 24)
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.features.gemini_client import DEFAULT_MODEL, GeminiClient, GeminiError
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CACHE_PATH = PROJECT_ROOT / "data" / "gemini_models.json"
+DEFAULT_TTL_HOURS = 24.0
+
+_client = None
+_client_lock = threading.Lock()
+_discovery = None  # background discovery thread, started at most once
+
+
+def _cache_path():
+    return Path(os.environ.get("ERS_GEMINI_MODEL_CACHE", DEFAULT_CACHE_PATH))
+
+
+def _cache_ttl():
+    return float(os.environ.get("ERS_GEMINI_MODEL_TTL", DEFAULT_TTL_HOURS)) * 3600
+
+
+def choose_model(names, preferred=DEFAULT_MODEL):
+    """Pick a model from discovered names: `preferred`, else a flash model, else the first."""
+    names = [n.removeprefix("models/") for n in names]
+    if preferred in names:
+        return preferred
+    for name in names:
+        if "flash" in name:
+            return name
+    return names[0] if names else None
+
+
+# ==========================================
+# On-disk cache
+# ==========================================
+
+def load_cached_model(base_url, path=None, ttl_seconds=None):
+    """Cached model name for `base_url`, or None if missing or expired."""
+    path = Path(path or _cache_path())
+    ttl_seconds = _cache_ttl() if ttl_seconds is None else ttl_seconds
+    try:
+        entry = json.loads(path.read_text()).get(base_url)
+    except (OSError, ValueError):
+        return None
+    if not entry or time.time() - entry.get("fetched_at", 0) > ttl_seconds:
+        return None
+    return entry.get("model")
+
+
+def save_cached_model(base_url, model, models, path=None):
+    """Record the discovery result for `base_url` (atomic replace)."""
+    path = Path(path or _cache_path())
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        data = {}
+    data[base_url] = {"model": model, "models": models, "fetched_at": time.time()}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[GeminiModels] Could not write model cache: {e}")
+
+
+# ==========================================
+# Discovery
+# ==========================================
+
+def discover_model(client):
+    """List models over the network, persist the choice and apply it to `client`."""
+    try:
+        names = client.list_models()
+    except GeminiError as e:
+        print(f"[GeminiModels] Model discovery failed, keeping {client.model}: {e}")
+        return None
+    model = choose_model(names)
+    if model is None:
+        print(f"[GeminiModels] No models support generateContent, keeping {client.model}")
+        return None
+    save_cached_model(client.base_url, model, [n.removeprefix("models/") for n in names])
+    client.model = model
+    print(f"[GeminiModels] Using model {model}")
+    return model
+
+
+def _start_discovery(client):
+    global _discovery
+    _discovery = threading.Thread(
+        target=discover_model, args=(client,), name="gemini-discovery", daemon=True,
+    )
+    _discovery.start()
+
+
+def wait_for_discovery(timeout=None):
+    """Block until background discovery (if any) has finished. For scripts and benchmarks."""
+    if _discovery is not None:
+        _discovery.join(timeout)
+
+
+# ==========================================
+# Shared client
+# ==========================================
+
+def get_shared_client(api_key=None):
+    """The process-wide GeminiClient, or None when no API key is configured.
+
+    Never blocks on the network: the first call builds the client with the
+    cached model (or the default) and, if needed, starts discovery in the
+    background.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    # Checked before building anything: without a key every render would
+    # otherwise create (and drop) a GeminiClient and its requests.Session
+    api_key = api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None:
+            client = GeminiClient(api_key=api_key)
+            if not os.environ.get("GEMINI_MODEL"):
+                cached = load_cached_model(client.base_url)
+                if cached:
+                    client.model = cached
+                else:
+                    _start_discovery(client)
+            _client = client
+    return _client
+
+
+def reset_shared_client():
+    """Drop the shared client (e.g. after the API key changes)."""
+    global _client
+    with _client_lock:
+        _client = None
@@ -0,0 +1,167 @@
+"""
+Gemini Stub Server
+
+Local HTTP server that mimics the parts of the Gemini REST API used by
+GeminiClient, so the chatbot can be exercised and benchmarked offline.
+
+Endpoints:
+  GET  /v1beta/models
+  POST /v1beta/models/<model>:generateContent
+  POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+
+Usage:
+    python -m src.features.gemini_stub_server --port 8765 --latency-ms 300 \
+        --chunk-delay-ms 40 --fail-rate 0.1
+    GEMINI_API_BASE=http://127.0.0.1:8765 GEMINI_API_KEY=stub streamlit run src/app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+STUB_MODELS = [
+    {"name": "models/gemini-1.5-flash", "supportedGenerationMethods": ["generateContent", "countTokens"]},
+    {"name": "models/embedding-001", "supportedGenerationMethods": ["embedContent"]},
+]
+
+DEFAULT_REPLY = (
+    "That sounds like a lot to carry. You might try a few slow breaths, "
+    "or write down what is on your mind in the Mood Journal."
+)
+
+
+class StubConfig:
+    """Latency and failure knobs shared by all request handlers."""
+
+    def __init__(self, latency_ms=200, chunk_delay_ms=30, fail_rate=0.0,
+                 hang_rate=0.0, reply=DEFAULT_REPLY, seed=None):
+        self.latency = latency_ms / 1000.0
+        self.chunk_delay = chunk_delay_ms / 1000.0
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def roll(self):
+        """Decide the fate of one request: "fail", "hang" or "ok"."""
+        with self.lock:
+            self.requests += 1
+            r = self.rng.random()
+        if r < self.fail_rate:
+            return "fail"
+        if r < self.fail_rate + self.hang_rate:
+            return "hang"
+        return "ok"
+
+
+def _response(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]},
+                            "finishReason": "STOP"}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    config = None  # set per server in make_server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip("/").endswith("/models"):
+            self._json(200, {"models": STUB_MODELS})
+        else:
+            self._json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+
+        fate = self.config.roll()
+        if fate == "hang":
+            time.sleep(3600)
+        time.sleep(self.config.latency)
+        if fate == "fail":
+            self._json(503, {"error": {"code": 503, "message": "Service unavailable (stub)"}})
+            return
+
+        prompt = ""
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                prompt += part.get("text", "")
+        reply = self.config.reply if prompt else "Hello!"
+
+        if path.endswith(":streamGenerateContent"):
+            self._stream(reply)
+        elif path.endswith(":generateContent"):
+            self._json(200, _response(reply))
+        else:
+            self._json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = reply.split(" ")
+        for i in range(0, len(words), 3):
+            chunk = " ".join(words[i:i + 3]) + ("" if i + 3 >= len(words) else " ")
+            self.wfile.write(f"data: {json.dumps(_response(chunk))}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.config.chunk_delay)
+        self.close_connection = True
+
+
+def make_server(host="127.0.0.1", port=0, **config):
+    """Create (but don't start) a stub server; port 0 picks a free port."""
+    handler = type("StubHandler", (_Handler,), {"config": StubConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a stub server on a background thread. Returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="gemini-stub", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gemini API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--chunk-delay-ms", type=float, default=30)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, latency_ms=args.latency_ms, chunk_delay_ms=args.chunk_delay_ms,
+        fail_rate=args.fail_rate, hang_rate=args.hang_rate,
+    )
+    print(f"[GeminiStub] Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
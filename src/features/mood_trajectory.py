@@ -0,0 +1,157 @@
+"""
+Mood Trajectory Playlist Planner
+
+Builds playlists that move the listener from their current emotional state
+towards the mood goal for that emotion (MOOD_GOAL_MAPPING), instead of
+shuffling random picks.
+
+Features:
+  - Tracks indexed in a KD-tree over normalised (energy, valence, tempo)
+  - Straight-line path from the start point to the goal point
+  - Each step filled with its nearest unused track (no repeats)
+  - Playlist length driven by track durations (e.g. "30 minutes")
+"""
+
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from src.utils.constants import MOOD_GOAL_MAPPING
+
+# Target (energy 0–10, valence 0–10, tempo BPM) for each mood goal
+MOOD_GOAL_FEATURES = {
+    "Hopeful & Energetic": (7.0, 8.0, 120.0),
+    "Calm & Relaxed": (3.0, 6.0, 75.0),
+    "Safe & Grounded": (4.0, 7.0, 85.0),
+    "Motivated & Focused": (7.0, 7.0, 115.0),
+    "Joyful & Energetic": (8.0, 9.0, 128.0),
+    "Cleansed & Refreshed": (5.0, 7.0, 100.0),
+    "Curious & Engaged": (6.0, 7.0, 110.0),
+    "Open & Empathetic": (5.0, 7.0, 95.0),
+    "Balanced": (5.0, 5.0, 90.0),
+}
+
+# Divisors that bring each axis to roughly 0–1 before distance lookups
+_AXIS_SCALE = np.array([10.0, 10.0, 200.0], dtype=np.float32)
+
+# Neighbours fetched per step in the first (batched) query
+_NEIGHBOURS = 16
+
+
+def profile_point(profile):
+    """(energy, valence, tempo) of a MusicRecommender emotion profile."""
+    low, high = profile["tempo_range"]
+    return np.array(
+        [profile["energy_level"], profile["valence_score"], (low + high) / 2],
+        dtype=np.float32,
+    )
+
+
+def goal_point(emotion):
+    """(energy, valence, tempo) target for the mood goal of `emotion`."""
+    goal = MOOD_GOAL_MAPPING.get(emotion, "Balanced")
+    return np.array(MOOD_GOAL_FEATURES.get(goal, MOOD_GOAL_FEATURES["Balanced"]),
+                    dtype=np.float32)
+
+
+class MoodTrajectoryPlanner:
+    """Nearest-neighbour playlist planning over a MusicCatalog."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        points = np.column_stack([catalog.energy, catalog.valence, catalog.tempo])
+        self.tree = cKDTree(points / _AXIS_SCALE)
+        durations = catalog.duration[catalog.duration > 0]
+        self.typical_duration = float(np.median(durations)) if len(durations) else 210.0
+
+    def plan(self, start, goal, duration_minutes=None, num_tracks=None):
+        """Plan a path from `start` to `goal` and fill it with catalog tracks.
+
+        Args:
+            start, goal: (energy, valence, tempo) points
+            duration_minutes: stop once the playlist is at least this long
+            num_tracks: alternatively, an exact number of tracks
+
+        Returns:
+            List of (catalog index, step target point) pairs, in play order
+        """
+        n = len(self.catalog)
+        if n == 0:
+            return []
+        if num_tracks is None:
+            target_sec = (duration_minutes or 30) * 60
+            num_tracks = math.ceil(target_sec / self.typical_duration)
+        else:
+            target_sec = None
+        steps = min(max(1, num_tracks), n)
+
+        start = np.asarray(start, dtype=np.float32)
+        goal = np.asarray(goal, dtype=np.float32)
+        waypoints = start + np.linspace(0.0, 1.0, steps)[:, None] * (goal - start)
+
+        # One batched query for every waypoint; re-query only on exhaustion
+        k = min(_NEIGHBOURS, n)
+        _, neighbours = self.tree.query(waypoints / _AXIS_SCALE, k=k)
+        neighbours = np.asarray(neighbours).reshape(steps, k)
+
+        used = np.zeros(n, dtype=bool)
+        pool = _UnusedPool(self.tree, n)
+        picks = []
+        total = 0.0
+        for step, point in enumerate(waypoints):
+            idx = next((int(i) for i in neighbours[step] if not used[i]), None)
+            if idx is None:
+                idx = pool.nearest(point / _AXIS_SCALE, used)
+            if idx is None:
+                break
+            used[idx] = True
+            picks.append((idx, point))
+            total += float(self.catalog.duration[idx])
+
+        # Top up at the goal if real durations fell short of the target length
+        while target_sec is not None and total < target_sec and not used.all():
+            idx = pool.nearest(goal / _AXIS_SCALE, used)
+            if idx is None:
+                break
+            used[idx] = True
+            picks.append((idx, goal))
+            total += float(self.catalog.duration[idx])
+        return picks
+
+
+class _UnusedPool:
+    """Nearest-unused-track lookups for one plan.
+
+    The KD-tree is rebuilt over the still-unused tracks once a quarter of
+    its points are used, so queries never wade through a long run of used
+    neighbours; the neighbour count of the last successful search carries
+    over to the next one.
+    """
+
+    def __init__(self, tree, n):
+        self.points = np.asarray(tree.data)  # scaled points, by catalog index
+        self.ids = np.arange(n)  # catalog index of each point in self.tree
+        self.tree = tree
+        self.k = min(_NEIGHBOURS * 4, n)
+
+    def nearest(self, scaled_point, used):
+        """Catalog index of the nearest unused track, or None if all are used."""
+        stale = int(used[self.ids].sum())
+        if stale * 4 >= len(self.ids):
+            self.ids = self.ids[~used[self.ids]]
+            if len(self.ids) == 0:
+                return None
+            self.tree = cKDTree(self.points[self.ids])
+            stale = 0
+        # The stale + 1 nearest points always include an unused one
+        limit = min(stale + 1, len(self.ids))
+        k = min(self.k, limit)
+        while True:
+            _, found = self.tree.query(scaled_point, k=k)
+            ids = self.ids[np.atleast_1d(found)]
+            free = np.flatnonzero(~used[ids])
+            if len(free):
+                self.k = k
+                return int(ids[free[0]])
+            k = min(k * 4, limit)
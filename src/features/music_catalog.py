@@ -0,0 +1,202 @@
+"""
+Music Catalog Engine
+
+Column-oriented track catalog for the music recommender. Tracks are held
+as NumPy feature arrays so an emotion profile can be scored against the
+whole catalog in one vectorised pass, instead of one Python call per track.
+
+Features per track:
+  - tempo (BPM), energy (0–10), valence (0–10), danceability (0–10)
+  - genre one-hot matrix over the catalog's genre vocabulary
+
+Catalog files (CSV or Parquet) need at least `title`, `artist` and
+`youtube_id` columns. Optional columns: tempo, energy, valence,
+danceability, genres ("pop|dance" or "pop;dance"), duration_sec.
+Spotify-style 0–1 energy/valence/danceability values are rescaled to 0–10.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FEATURE_DEFAULTS = {
+    "tempo": 100.0,
+    "energy": 5.0,
+    "valence": 5.0,
+    "danceability": 5.0,
+    "duration_sec": 210.0,
+}
+
+# Same weighting as MusicRecommender.calculate_mood_match_score
+GENRE_WEIGHT = 30.0
+ENERGY_WEIGHT = 25.0
+VALENCE_WEIGHT = 25.0
+TEMPO_WEIGHT = 20.0
+
+_GENRE_SPLIT = re.compile(r"[|;,]")
+
+
+def _split_genres(value):
+    if isinstance(value, (list, tuple)):
+        return [str(g).strip().lower() for g in value if str(g).strip()]
+    if not isinstance(value, str):
+        return []
+    return [g.strip().lower() for g in _GENRE_SPLIT.split(value) if g.strip()]
+
+
+class MusicCatalog:
+    """Track metadata plus NumPy feature columns, with vectorised scoring."""
+
+    def __init__(self, frame, version=None):
+        frame = frame.reset_index(drop=True)
+        n = len(frame)
+
+        for col, default in FEATURE_DEFAULTS.items():
+            values = frame[col] if col in frame else pd.Series(default, index=frame.index)
+            frame[col] = pd.to_numeric(values, errors="coerce").fillna(default)
+        for col in ("energy", "valence", "danceability"):
+            if n and frame[col].max() <= 1.0:
+                frame[col] = frame[col] * 10.0
+
+        genre_lists = [_split_genres(g) for g in frame.get("genres", pd.Series([[]] * n))]
+        self.genres = sorted({g for gl in genre_lists for g in gl})
+        self.genre_index = {g: i for i, g in enumerate(self.genres)}
+        onehot = np.zeros((n, len(self.genres)), dtype=np.float32)
+        for row, gl in enumerate(genre_lists):
+            for g in gl:
+                onehot[row, self.genre_index[g]] = 1.0
+
+        self.tempo = frame["tempo"].to_numpy(np.float32)
+        self.energy = frame["energy"].to_numpy(np.float32)
+        self.valence = frame["valence"].to_numpy(np.float32)
+        self.danceability = frame["danceability"].to_numpy(np.float32)
+        self.duration = frame["duration_sec"].to_numpy(np.float32)
+        self.genre_onehot = onehot
+
+        frame["genres"] = genre_lists
+        self.meta = frame
+        self.version = version or self._fingerprint()
+
+        # emotion -> candidate indices (best first), filled by build_candidate_index
+        self.candidates = {}
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a catalog from a .csv or .parquet file."""
+        path = Path(path)
+        if path.suffix.lower() == ".parquet":
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        missing = {"title", "artist", "youtube_id"} - set(frame.columns)
+        if missing:
+            raise ValueError(f"Music catalog {path} is missing columns: {sorted(missing)}")
+        stat = path.stat()
+        version = f"{path.name}:{stat.st_size}:{int(stat.st_mtime)}"
+        return cls(frame, version=version)
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        """Build a catalog from a list of track dicts."""
+        return cls(pd.DataFrame(list(tracks)))
+
+    def _fingerprint(self):
+        h = hashlib.sha1()
+        h.update(pd.util.hash_pandas_object(
+            self.meta[["title", "artist", "youtube_id"]], index=False
+        ).to_numpy().tobytes())
+        h.update(self.tempo.tobytes())
+        h.update(self.energy.tobytes())
+        h.update(self.valence.tobytes())
+        return h.hexdigest()[:12]
+
+    def __len__(self):
+        return len(self.meta)
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def score(self, profile):
+        """Mood-match score (0–100) of every track against an emotion profile.
+
+        Args:
+            profile: an entry of MusicRecommender.emotion_music_mapping
+                     (uses genres, energy_level, valence_score, tempo_range)
+
+        Returns:
+            float32 array of shape (len(catalog),)
+        """
+        genre_vec = np.zeros(len(self.genres), dtype=np.float32)
+        for g in profile["genres"]:
+            idx = self.genre_index.get(g.lower())
+            if idx is not None:
+                genre_vec[idx] = 1.0
+        genre_match = self.genre_onehot @ genre_vec / max(1, len(profile["genres"]))
+
+        energy_match = 1.0 - np.abs(self.energy - profile["energy_level"]) / 10.0
+        valence_match = 1.0 - np.abs(self.valence - profile["valence_score"]) / 10.0
+
+        lo, hi = profile["tempo_range"]
+        tempo_gap = np.maximum(lo - self.tempo, 0.0) + np.maximum(self.tempo - hi, 0.0)
+        tempo_match = np.maximum(0.0, 1.0 - tempo_gap / 100.0)
+
+        scores = (
+            genre_match * GENRE_WEIGHT
+            + energy_match * ENERGY_WEIGHT
+            + valence_match * VALENCE_WEIGHT
+            + tempo_match * TEMPO_WEIGHT
+        )
+        return np.clip(scores, 0.0, 100.0).astype(np.float32, copy=False)
+
+    def top_k(self, scores, k):
+        """Indices of the k highest scores, best first (argpartition + small sort)."""
+        n = len(scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < n:
+            part = np.argpartition(-scores, k - 1)[:k]
+        else:
+            part = np.arange(n)
+        return part[np.argsort(-scores[part], kind="stable")]
+
+    def build_candidate_index(self, profiles, pool_size=200, min_score=85.0):
+        """Precompute per-emotion candidate pools.
+
+        Each pool holds up to `pool_size` best-scoring tracks with a score of
+        at least `min_score`; if too few qualify, the best tracks regardless
+        of score are used so every emotion has something to recommend.
+        """
+        self.candidates = {}
+        self.candidate_scores = {}
+        for emotion, profile in profiles.items():
+            scores = self.score(profile)
+            idx = self.top_k(scores, pool_size)
+            good = idx[scores[idx] >= min_score]
+            if len(good) >= min(5, len(idx)):
+                idx = good
+            self.candidates[emotion] = idx
+            self.candidate_scores[emotion] = scores[idx]
+
+    # ------------------------------------------------------------------
+    # Materialisation
+    # ------------------------------------------------------------------
+
+    def tracks(self, indices, scores=None):
+        """Turn catalog row indices into the track dicts the UI expects."""
+        rows = self.meta.iloc[np.asarray(indices, dtype=np.int64)]
+        out = []
+        for i, (_, row) in enumerate(rows.iterrows()):
+            track = {k: v for k, v in row.items() if not (isinstance(v, float) and np.isnan(v))}
+            if scores is not None:
+                track["mood_match_score"] = float(scores[i])
+            out.append(track)
+        return out
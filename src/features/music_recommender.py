@@ -1,11 +1,28 @@
 """
 AI MoodMate - Music Recommendation System
 Suggests music based on detected emotions using a YouTube-based recommendation system
+
+Tracks come from a MusicCatalog (see music_catalog.py). A catalog file is
+picked up from ERS_MUSIC_CATALOG or data/music_catalog.{parquet,csv};
+without one, the curated playlists below are used as a built-in catalog.
 """
 
+import os
 import random
+from pathlib import Path
 from typing import List, Dict, Tuple
 
+import numpy as np
+
+from src.features.music_catalog import MusicCatalog
+from src.features.mood_trajectory import MoodTrajectoryPlanner, goal_point, profile_point
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_CATALOG_CANDIDATES = (
+    PROJECT_ROOT / "data" / "music_catalog.parquet",
+    PROJECT_ROOT / "data" / "music_catalog.csv",
+)
+
 class MusicRecommender:
     def __init__(self):
         # Enhanced emotion to music mapping with detailed metadata
@@ -183,13 +200,53 @@ class MusicRecommender:
                 {"title": "Spiegel im Spiegel", "artist": "Arvo Pärt", "youtube_id": "8kUyJz7wgwI"}
             ]
         }
+
+        # Vectorised track catalog + per-emotion candidate pools
+        self.catalog = self._load_catalog()
+        self.catalog.build_candidate_index(self.emotion_music_mapping)
+        self.planner = MoodTrajectoryPlanner(self.catalog)
+
+    def _load_catalog(self) -> MusicCatalog:
+        """Load the track catalog file if present, else build one from the curated playlists"""
+        env_path = os.environ.get("ERS_MUSIC_CATALOG")
+        paths = [Path(env_path)] if env_path else list(_CATALOG_CANDIDATES)
+        for path in paths:
+            if path.exists():
+                try:
+                    catalog = MusicCatalog.from_file(path)
+                    print(f"[MusicRecommender] Loaded {len(catalog)} tracks from {path.name}")
+                    return catalog
+                except Exception as e:
+                    print(f"[MusicRecommender] Could not load catalog {path}: {e}")
+
+        # Built-in catalog: each curated track takes its emotion's audio profile
+        tracks = []
+        for emotion, playlist in self.curated_playlists.items():
+            profile = self.emotion_music_mapping[emotion]
+            low, high = profile["tempo_range"]
+            for track in playlist:
+                tracks.append({
+                    **track,
+                    "genres": profile["genres"],
+                    "tempo": (low + high) / 2,
+                    "energy": profile["energy_level"],
+                    "valence": profile["valence_score"],
+                    "danceability": profile["danceability"],
+                })
+        return MusicCatalog.from_tracks(tracks)
+
+    @property
+    def catalog_version(self) -> str:
+        """Identifier of the loaded catalog (changes when the catalog file changes)"""
+        return self.catalog.version
     
-    def get_music_recommendations(self, emotion: str, count: int = 5) -> List[Dict]:
+    def get_music_recommendations(self, emotion: str, count: int = 5, rng=None) -> List[Dict]:
         """
         Get music recommendations for a specific emotion (YouTube-based only)
         Args:
             emotion: The detected emotion
             count: Number of recommendations to return
+            rng: Optional numpy Generator for reproducible picks
         Returns:
             List of music recommendations with title, artist, and YouTube ID
         """
@@ -199,14 +256,23 @@ class MusicRecommender:
             emotion = "anger"
         if emotion not in self.emotion_music_mapping:
             emotion = "neutral"
-        return self._get_curated_recommendations(emotion, count)
+        return self._get_curated_recommendations(emotion, count, rng)
     
     # Spotify-based recommendation method removed
     
-    def _get_curated_recommendations(self, emotion: str, count: int) -> List[Dict]:
-        """Get YouTube-based recommendations for the given emotion"""
-        playlist = self.curated_playlists.get(emotion, self.curated_playlists["neutral"])
-        return random.sample(playlist, min(count, len(playlist)))
+    def _get_curated_recommendations(self, emotion: str, count: int, rng=None) -> List[Dict]:
+        """Get YouTube-based recommendations for the given emotion from its precomputed candidate pool"""
+        if emotion not in self.catalog.candidates:
+            emotion = "neutral"
+        pool = self.catalog.candidates[emotion]
+        size = min(count, len(pool))
+        if rng is not None:
+            picked = rng.choice(len(pool), size=size, replace=False)
+        else:
+            picked = random.sample(range(len(pool)), size)
+        # Pool scores come from the vectorised catalog scoring, so the
+        # displayed mood match is the same number the pool was ranked by
+        return self.catalog.tracks(pool[picked], self.catalog.candidate_scores[emotion][picked])
     
     def _get_youtube_id(self, title: str, artist: str) -> str:
         """Get YouTube video ID for a track (not used in YouTube-only mode)"""
@@ -217,6 +283,9 @@ class MusicRecommender:
         """
         Generate a playlist based on video emotion analysis results
         
+        The playlist starts at the blended mood of the video and moves
+        towards the mood goal of the dominant emotion.
+        
         Args:
             emotion_results: Dictionary with emotion as key and percentage as value
             count_per_emotion: Number of songs per emotion
@@ -224,24 +293,15 @@ class MusicRecommender:
         Returns:
             List of music recommendations
         """
-        playlist = []
-        
         # Sort emotions by percentage (highest first)
         sorted_emotions = sorted(emotion_results.items(), key=lambda x: x[1], reverse=True)
         
-        # Get recommendations for top emotions
-        for emotion, percentage in sorted_emotions[:3]:  # Top 3 emotions
-            if percentage > 10:  # Only include emotions with >10% presence
-                recommendations = self.get_music_recommendations(emotion, count_per_emotion)
-                for rec in recommendations:
-                    rec['emotion'] = emotion
-                    rec['percentage'] = percentage
-                playlist.extend(recommendations)
-        
-        # Shuffle the playlist for variety
-        random.shuffle(playlist)
+        # Top 3 emotions with >10% presence
+        included = [(e, p) for e, p in sorted_emotions[:3] if p > 10]
+        if not included:
+            return []
         
-        return playlist
+        return self._plan_journey(included, num_tracks=count_per_emotion * len(included))
     
     def get_emotion_summary(self, emotion_results: Dict[str, float]) -> str:
         """Generate a summary of detected emotions"""
@@ -310,18 +370,15 @@ class MusicRecommender:
         
         return min(100, max(0, match_score))
     
-    def get_enhanced_recommendations(self, emotion: str, count: int = 5) -> List[Dict]:
+    def get_enhanced_recommendations(self, emotion: str, count: int = 5, rng=None) -> List[Dict]:
         """Get enhanced music recommendations with mood matching scores"""
-        # Normalize emotion name
-        emotion = emotion.lower()
-        if emotion == "angry":
-            emotion = "anger"
+        emotion = self._normalize_emotion(emotion)
         
-        recommendations = self.get_music_recommendations(emotion, count)
+        # Tracks already carry their catalog mood match score
+        recommendations = self.get_music_recommendations(emotion, count, rng)
         
-        # Add mood matching scores and metadata
+        # Add metadata
         for rec in recommendations:
-            rec['mood_match_score'] = self.calculate_mood_match_score(emotion, rec)
             rec['emotion_color'] = self.emotion_music_mapping[emotion]['color']
             rec['tempo_range'] = self.emotion_music_mapping[emotion]['tempo_range']
             rec['energy_level'] = self.emotion_music_mapping[emotion]['energy_level']
@@ -334,29 +391,50 @@ class MusicRecommender:
         return recommendations
     
     def create_mood_journey_playlist(self, emotion_percentages: Dict[str, float], duration_minutes: int = 30) -> List[Dict]:
-        """Create a playlist that follows the emotional journey detected in video"""
-        playlist = []
-        
-        # Calculate songs per emotion based on percentages
-        total_songs = max(10, duration_minutes * 2)  # ~2 songs per minute
+        """Create a playlist that follows the emotional journey detected in video
         
+        Starts from the blended mood of all emotions with >5% presence and
+        moves step by step towards the mood goal of the dominant emotion.
+        """
         sorted_emotions = sorted(emotion_percentages.items(), key=lambda x: x[1], reverse=True)
+        included = [(e, p) for e, p in sorted_emotions if p > 5]
+        if not included:
+            return []
         
-        for emotion, percentage in sorted_emotions:
-            if percentage > 5:  # Only include emotions with >5% presence
-                songs_for_emotion = int((percentage / 100) * total_songs)
-                songs_for_emotion = max(1, min(songs_for_emotion, 8))  # Between 1-8 songs
-                
-                recommendations = self.get_enhanced_recommendations(emotion, songs_for_emotion)
-                for rec in recommendations:
-                    rec['emotion'] = emotion
-                    rec['emotion_percentage'] = percentage
-                playlist.extend(recommendations)
+        return self._plan_journey(included, duration_minutes=duration_minutes)
+    
+    def _plan_journey(self, weighted_emotions: List[Tuple[str, float]], duration_minutes: int = None,
+                      num_tracks: int = None) -> List[Dict]:
+        """Plan a trajectory playlist from the blended mood to the dominant emotion's goal"""
+        emotions = [self._normalize_emotion(e) for e, _ in weighted_emotions]
+        weights = np.array([p for _, p in weighted_emotions], dtype=np.float32)
+        points = np.stack([profile_point(self.emotion_music_mapping[e]) for e in emotions])
+        start = (points * weights[:, None]).sum(axis=0) / weights.sum()
         
-        # Shuffle but maintain some emotional flow
-        random.shuffle(playlist)
+        dominant, dominant_pct = emotions[0], weighted_emotions[0][1]
+        picks = self.planner.plan(start, goal_point(dominant),
+                                  duration_minutes=duration_minutes, num_tracks=num_tracks)
+        if not picks:
+            return []
         
-        return playlist[:total_songs]
+        indices = [i for i, _ in picks]
+        scores = self.catalog.score(self.emotion_music_mapping[dominant])[indices]
+        playlist = self.catalog.tracks(indices, scores)
+        for step, (rec, (_, target)) in enumerate(zip(playlist, picks)):
+            rec['emotion'] = dominant
+            rec['percentage'] = dominant_pct
+            rec['emotion_percentage'] = dominant_pct
+            rec['journey_step'] = step
+            rec['target_energy'] = float(target[0])
+            rec['target_valence'] = float(target[1])
+            rec['emotion_color'] = self.emotion_music_mapping[dominant]['color']
+        return playlist
+    
+    def _normalize_emotion(self, emotion: str) -> str:
+        emotion = emotion.lower()
+        if emotion == "angry":
+            emotion = "anger"
+        return emotion if emotion in self.emotion_music_mapping else "neutral"
     
     def get_music_insights(self, emotion: str) -> Dict:
         """Get detailed insights about music for a specific emotion"""
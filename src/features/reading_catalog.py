@@ -0,0 +1,188 @@
+"""
+Reading Catalog Engine
+
+Searchable catalog of articles, books and stories for the reading
+recommender. Items are indexed in a TF-IDF sparse matrix over title,
+description and category, so the catalog can grow to tens of thousands of
+items while queries stay a single sparse matrix-vector product.
+
+Features:
+  - Filter by emotion tag, item kind and maximum reading time
+  - Free-text ranking (mood description, journal text) by cosine similarity
+  - Loads from .jsonl / .json / .csv / .parquet files
+
+Catalog file columns: kind (article|book|story), emotion (one tag, or
+several separated by "|"), title, url, description, category, and
+optionally author and reading_time ("8 min read" or a number of minutes).
+"""
+
+import hashlib
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+KINDS = ("article", "book", "story")
+
+# Plural keys used in recommendation dicts -> catalog kind
+KIND_KEYS = {"articles": "article", "books": "book", "stories": "story"}
+
+# Older data used "angry"; the rest of the app uses "anger"
+EMOTION_ALIASES = {"angry": "anger"}
+
+_MINUTES = re.compile(r"(\d+)")
+_TAG_SPLIT = re.compile(r"[|;,]")
+
+
+def normalize_emotion(emotion):
+    emotion = (emotion or "").strip().lower()
+    return EMOTION_ALIASES.get(emotion, emotion)
+
+
+def _parse_minutes(value):
+    if isinstance(value, (int, float)) and not pd.isna(value):
+        return float(value)
+    m = _MINUTES.search(str(value or ""))
+    return float(m.group(1)) if m else np.nan
+
+
+class ReadingCatalog:
+    """TF-IDF indexed reading items with emotion / kind / time filters."""
+
+    def __init__(self, items):
+        self.items = []
+        for item in items:
+            item = {k: v for k, v in dict(item).items() if not (isinstance(v, float) and pd.isna(v))}
+            tags = item.get("emotion", "")
+            if isinstance(tags, str):
+                tags = _TAG_SPLIT.split(tags)
+            item["emotion"] = "|".join(sorted({normalize_emotion(t) for t in tags if t.strip()}))
+            item["kind"] = KIND_KEYS.get(item.get("kind"), item.get("kind", "article"))
+            self.items.append(item)
+
+        n = len(self.items)
+        self.emotions = sorted({t for it in self.items for t in it["emotion"].split("|") if t})
+        # Boolean emotion membership matrix (items x emotions)
+        self._emotion_col = {e: i for i, e in enumerate(self.emotions)}
+        self._emotion_mask = np.zeros((n, len(self.emotions)), dtype=bool)
+        for row, it in enumerate(self.items):
+            for tag in it["emotion"].split("|"):
+                if tag:
+                    self._emotion_mask[row, self._emotion_col[tag]] = True
+
+        self._kind = np.array([it["kind"] for it in self.items], dtype=object)
+        self._minutes = np.array(
+            [_parse_minutes(it.get("reading_time")) for it in self.items], dtype=np.float32
+        )
+
+        self.vectorizer = TfidfVectorizer(
+            stop_words="english", sublinear_tf=True, ngram_range=(1, 2), min_df=1
+        )
+        docs = [
+            " ".join((it.get("title", ""), it.get("title", ""),
+                      it.get("description", ""), it.get("category", "")))
+            for it in self.items
+        ]
+        # Rows are L2-normalised, so a dot product is the cosine similarity
+        self.matrix = self.vectorizer.fit_transform(docs) if n else None
+
+        h = hashlib.sha1()
+        for it in self.items:
+            line = f"{it['kind']}|{it['emotion']}|{it.get('title', '')}|{it.get('url', '')}\n"
+            h.update(line.encode("utf-8"))
+        self.version = h.hexdigest()[:12]
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_file(cls, path):
+        """Load catalog items from a .jsonl, .json, .csv or .parquet file."""
+        path = Path(path)
+        suffix = path.suffix.lower()
+        if suffix == ".jsonl":
+            frame = pd.read_json(path, lines=True)
+        elif suffix == ".json":
+            frame = pd.read_json(path)
+        elif suffix == ".parquet":
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        missing = {"kind", "emotion", "title", "url"} - set(frame.columns)
+        if missing:
+            raise ValueError(f"Reading catalog {path} is missing columns: {sorted(missing)}")
+        return cls(frame.to_dict("records"))
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Build a catalog from {emotion: {"articles": [...], "books": [...], ...}}."""
+        items = []
+        for emotion, groups in mapping.items():
+            for key, entries in groups.items():
+                for entry in entries:
+                    items.append({**entry, "kind": KIND_KEYS.get(key, key), "emotion": emotion})
+        return cls(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def has_emotion(self, emotion):
+        return normalize_emotion(emotion) in self._emotion_col
+
+    def query(self, emotion=None, text=None, kind=None, max_minutes=None, k=3, rng=None):
+        """Return up to k matching items.
+
+        Args:
+            emotion: only items tagged with this emotion (None = any)
+            text: free text to rank by cosine similarity; without it (or
+                  when nothing in the text is in the vocabulary) matches
+                  are sampled at random
+            kind: "article", "book" or "story" (None = any)
+            max_minutes: drop items with a longer reading time (items
+                         without a reading time are kept)
+            k: number of items
+            rng: optional numpy Generator for reproducible sampling
+        """
+        if not self.items or k <= 0:
+            return []
+        mask = np.ones(len(self.items), dtype=bool)
+        if emotion is not None:
+            col = self._emotion_col.get(normalize_emotion(emotion))
+            if col is None:
+                return []
+            mask &= self._emotion_mask[:, col]
+        if kind is not None:
+            mask &= self._kind == KIND_KEYS.get(kind, kind)
+        if max_minutes is not None:
+            mask &= ~(self._minutes > max_minutes)
+
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        k = min(k, len(candidates))
+
+        if text:
+            q = self.vectorizer.transform([text])
+            if q.nnz:
+                sims = (self.matrix[candidates] @ q.T).toarray().ravel()
+                if sims.any():
+                    if k < len(sims):
+                        top = np.argpartition(-sims, k - 1)[:k]
+                    else:
+                        top = np.arange(len(sims))
+                    top = top[np.argsort(-sims[top], kind="stable")]
+                    return [
+                        {**self.items[candidates[i]], "relevance": float(sims[i])}
+                        for i in top
+                    ]
+
+        rng = rng or np.random.default_rng()
+        picked = rng.choice(candidates, size=k, replace=False)
+        return [dict(self.items[i]) for i in picked]
@@ -1,10 +1,22 @@
 """
 Reading Recommender for AI MoodMate
 Suggests articles, books, and reading materials based on detected emotions
+
+Items are served from a ReadingCatalog (see reading_catalog.py). A catalog
+file is picked up from ERS_READING_CATALOG or data/reading_catalog.*;
+the built-in lists below are used when no file is present.
 """
 
-import random
-from typing import Dict, List
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.features.reading_catalog import ReadingCatalog, normalize_emotion
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_CATALOG_CANDIDATES = tuple(
+    PROJECT_ROOT / "data" / f"reading_catalog.{ext}" for ext in ("jsonl", "json", "csv", "parquet")
+)
 
 class ReadingRecommender:
     def __init__(self):
@@ -112,7 +124,7 @@ class ReadingRecommender:
                 ]
             },
             
-            "angry": {
+            "anger": {
                 "articles": [
                     {
                         "title": "How to Manage Anger: 10 Healthy Ways to Deal with Anger",
@@ -288,37 +300,9 @@ class ReadingRecommender:
                 ]
             }
         }
-    
-    def get_reading_recommendations(self, emotion: str, num_recommendations: int = 3) -> Dict:
-        """Get reading recommendations for a specific emotion"""
-        emotion = emotion.lower()
-        
-        if emotion not in self.emotion_reading_mapping:
-            # Default recommendations for unknown emotions
-            return self._get_default_recommendations()
-        
-        recommendations = self.emotion_reading_mapping[emotion]
-        
-        # Select random recommendations from each category
-        selected_articles = random.sample(recommendations.get("articles", []), 
-                                        min(num_recommendations, len(recommendations.get("articles", []))))
-        selected_books = random.sample(recommendations.get("books", []), 
-                                     min(2, len(recommendations.get("books", []))))
-        selected_stories = random.sample(recommendations.get("stories", []), 
-                                       min(1, len(recommendations.get("stories", []))))
-        
-        return {
-            "emotion": emotion,
-            "articles": selected_articles,
-            "books": selected_books,
-            "stories": selected_stories,
-            "total_recommendations": len(selected_articles) + len(selected_books) + len(selected_stories)
-        }
-    
-    def _get_default_recommendations(self) -> Dict:
-        """Default recommendations for unknown emotions"""
-        return {
-            "emotion": "general",
+
+        # Fallback items for emotions without their own reading list
+        self.emotion_reading_mapping["general"] = {
             "articles": [
                 {
                     "title": "The Power of Positive Thinking",
@@ -345,22 +329,114 @@ class ReadingRecommender:
                     "description": "A timeless tale about love, friendship, and seeing the world through innocent eyes.",
                     "category": "Children's Literature"
                 }
-            ],
-            "total_recommendations": 3
+            ]
+        }
+
+        self.catalog = self._load_catalog()
+
+    def _load_catalog(self) -> ReadingCatalog:
+        """Load the reading catalog file if present, else index the built-in lists"""
+        env_path = os.environ.get("ERS_READING_CATALOG")
+        paths = [Path(env_path)] if env_path else list(_CATALOG_CANDIDATES)
+        for path in paths:
+            if path.exists():
+                try:
+                    catalog = ReadingCatalog.from_file(path)
+                    print(f"[ReadingRecommender] Loaded {len(catalog)} items from {path.name}")
+                    return catalog
+                except Exception as e:
+                    print(f"[ReadingRecommender] Could not load catalog {path}: {e}")
+        return ReadingCatalog.from_mapping(self.emotion_reading_mapping)
+
+    @property
+    def catalog_version(self) -> str:
+        """Identifier of the loaded catalog (changes when its items change)"""
+        return self.catalog.version
+    
+    def get_reading_recommendations(self, emotion: str, num_recommendations: int = 3,
+                                    query: Optional[str] = None, max_minutes: Optional[float] = None,
+                                    rng=None) -> Dict:
+        """Get reading recommendations for a specific emotion
+        
+        Args:
+            emotion: The detected emotion
+            num_recommendations: Number of articles to return
+            query: Optional free text (mood description, journal entry) to rank by
+            max_minutes: Optional maximum reading time for articles
+            rng: Optional numpy Generator for reproducible picks
+        """
+        emotion = normalize_emotion(emotion)
+        
+        if not self.catalog.has_emotion(emotion):
+            # Default recommendations for unknown emotions
+            return self._get_default_recommendations(rng)
+        
+        def pick(kind, k, **filters):
+            return self.catalog.query(emotion=emotion, text=query, kind=kind, k=k, rng=rng, **filters)
+        
+        selected_articles = pick("article", num_recommendations, max_minutes=max_minutes)
+        selected_books = pick("book", 2)
+        selected_stories = pick("story", 1)
+        
+        return {
+            "emotion": emotion,
+            "articles": selected_articles,
+            "books": selected_books,
+            "stories": selected_stories,
+            "total_recommendations": len(selected_articles) + len(selected_books) + len(selected_stories)
+        }
+    
+    def search_reading(self, query: str, num_results: int = 5, kind: Optional[str] = None,
+                       max_minutes: Optional[float] = None) -> List[Dict]:
+        """Free-text search over the whole reading catalog, best matches first"""
+        results = self.catalog.query(text=query, kind=kind, max_minutes=max_minutes, k=num_results)
+        return [item for item in results if item.get("relevance", 0) > 0]
+    
+    def _get_default_recommendations(self, rng=None) -> Dict:
+        """Default recommendations for unknown emotions"""
+        if self.catalog.has_emotion("general"):
+            general = self.get_reading_recommendations("general", 1, rng=rng)
+            general["emotion"] = "general"
+            return general
+        
+        # Catalog file without a "general" list: use the built-in one (never recurse)
+        builtin = self.emotion_reading_mapping["general"]
+        articles = [dict(item) for item in builtin["articles"][:1]]
+        books = [dict(item) for item in builtin["books"][:2]]
+        stories = [dict(item) for item in builtin["stories"][:1]]
+        return {
+            "emotion": "general",
+            "articles": articles,
+            "books": books,
+            "stories": stories,
+            "total_recommendations": len(articles) + len(books) + len(stories)
         }
     
     def get_mood_improvement_reading(self, emotion: str) -> Dict:
         """Get reading materials specifically for mood improvement"""
         mood_improvement_map = {
             "sad": "happy",
-            "angry": "calm",
+            "anger": "calm",
             "fear": "courage",
             "disgust": "beauty",
             "surprise": "wonder"
         }
         
-        target_emotion = mood_improvement_map.get(emotion.lower(), "happy")
-        return self.get_reading_recommendations(target_emotion, 2)
+        target = mood_improvement_map.get(normalize_emotion(emotion), "happy")
+        if self.catalog.has_emotion(target):
+            return self.get_reading_recommendations(target, 2)
+        
+        # Targets that aren't emotion tags are matched as free text
+        articles = self.search_reading(target, 2, kind="article")
+        books = self.search_reading(target, 2, kind="book")
+        stories = self.search_reading(target, 1, kind="story")
+        return {
+            "emotion": target,
+            "articles": articles,
+            "books": books,
+            "stories": stories,
+            "total_recommendations": len(articles) + len(books) + len(stories)
+        }
 
 # Create global instance
 reading_recommender = ReadingRecommender()
@@ -0,0 +1,114 @@
+"""
+Recommendation Cache
+
+Keeps the recommendations computed for a detection stable across Streamlit
+reruns. Without it, every button click inside any recommendation tab
+recomputed (and reshuffled) the music, reading and wellness lists.
+
+Features:
+  - Keys: (session, emotion, confidence bucket, catalog version)
+  - TTL expiry plus LRU eviction once the entry limit is reached
+  - Thread-safe; one shared instance serves every session in the process
+  - A stable per-key seed so computations can use a seeded RNG
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 30 * 60
+
+# Confidence is bucketed so small jitter between detections reuses results
+CONFIDENCE_BUCKET = 10
+
+
+def make_key(session_id, emotion, confidence, catalog_version, bucket=CONFIDENCE_BUCKET):
+    """Cache key for one recommendation set."""
+    conf_bucket = int(max(0.0, min(float(confidence or 0.0), 100.0)) // bucket)
+    return (str(session_id), str(emotion).lower(), conf_bucket, str(catalog_version))
+
+
+def seed_for(key):
+    """Stable 64-bit seed derived from a cache key (same across processes)."""
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class RecommendationCache:
+    """TTL + LRU cache for per-session recommendation bundles."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # Per-key locks so concurrent reruns compute a bundle only once
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value for key, or None if missing / expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing it once if needed.
+
+        `compute` is called as compute(rng) with a numpy Generator seeded
+        from the key, so a recomputation after expiry gives the same result.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is None:
+                self.misses += 1
+                value = compute(np.random.default_rng(seed_for(key)))
+                self.put(key, value)
+            else:
+                self.hits += 1
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def invalidate(self, session_id=None):
+        """Drop all entries, or only those of one session."""
+        with self._lock:
+            if session_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == str(session_id)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared across sessions; keys carry the session id
+recommendation_cache = RecommendationCache()
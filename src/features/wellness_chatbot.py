@@ -1,9 +1,26 @@
-import streamlit as st
 import random
-import os
-import google.generativeai as genai
 from datetime import datetime
 
+from src.features.gemini_client import GeminiError
+from src.features.gemini_models import get_shared_client
+from src.features.chat_response_cache import chat_response_cache
+from src.features.conversation_context import make_context
+from src.features.crisis_detector import crisis_detector
+from src.features.mental_health_resources import mental_health_resources
+
+# Instruction appended to every chatbot prompt
+WELLNESS_INSTRUCTION = (
+    "As an AI wellness companion, respond empathetically and supportively, focusing on "
+    "mental well-being, coping strategies, and offering a safe space to talk. Keep your "
+    "response concise and encouraging. Avoid giving medical advice."
+)
+
+
+def is_crisis_message(text):
+    """True if a chat message contains (non-negated) self-harm or suicide language."""
+    return crisis_detector.is_crisis(text)
+
+
 class WellnessChatbot:
     def __init__(self):
         self.conversation_history = []
@@ -80,36 +97,21 @@ class WellnessChatbot:
             "Practice mindfulness or meditation"
         ]
         
-        self.model = None
-        self.gemini_available = False
+        # Gemini client and model discovery are shared process-wide
+        # (see gemini_models); nothing here blocks or touches the UI.
 
-        # Configure Gemini API
-        try:
-            api_key = os.environ.get("GEMINI_API_KEY")
-            if not api_key:
-                st.warning("GEMINI_API_KEY not found in environment variables. Chatbot will use rule-based responses.")
-                return
+    @property
+    def client(self):
+        return get_shared_client()
 
-            genai.configure(api_key=api_key)
-            
-            # List available models and find one that supports generateContent
-            selected_model_name = None
-            for m in genai.list_models():
-                if "generateContent" in m.supported_generation_methods:
-                    selected_model_name = m.name
-                    break
-            
-            if selected_model_name:
-                self.model = genai.GenerativeModel(selected_model_name)
-                self.gemini_available = True
-                # Silent configuration - no UI message needed
-            else:
-                st.warning("No Gemini models supporting 'generateContent' found. Chatbot will use rule-based responses.")
-                
-        except Exception as e:
-            st.error(f"Error configuring Gemini API: {e}")
-            self.model = None
+    @property
+    def model(self):
+        client = self.client
+        return client.model if client else None
 
+    @property
+    def gemini_available(self):
+        return self.client is not None
 
     def get_initial_response(self, emotion, confidence):
         """Get the initial response based on detected emotion."""
@@ -118,23 +120,65 @@ class WellnessChatbot:
             return random.choice(responses)
         return "I can see you're feeling something. How can I help you today?"
 
-    def get_gemini_response(self, user_message, emotion=None):
+    def new_context(self):
+        """A fresh conversation context for one chat session."""
+        return make_context(self.client)
+
+    def _build_prompt(self, user_message, emotion=None, context=None):
+        head = f"The user is feeling {emotion}. " if emotion else ""
+        if context is not None:
+            return context.build_prompt(head, user_message, WELLNESS_INSTRUCTION)
+        return f"{head}User: {user_message}\n{WELLNESS_INSTRUCTION}"
+
+    @staticmethod
+    def _use_cache(user_message, context):
+        # Replies are only reusable for context-free (opening) messages
+        return not is_crisis_message(user_message) and (context is None or len(context) == 0)
+
+    def get_gemini_response(self, user_message, emotion=None, context=None):
         """Generate a response using the Gemini API."""
-        if not self.gemini_available or not self.model:
+        client = self.client
+        if client is None:
             return "I'm currently using rule-based responses. Gemini API is not available."
 
-        prompt_parts = []
-        if emotion:
-            prompt_parts.append(f"The user is feeling {emotion}. ")
-        
-        prompt_parts.append(f"User: {user_message}\n")
-        prompt_parts.append("As an AI wellness companion, respond empathetically and supportively, focusing on mental well-being, coping strategies, and offering a safe space to talk. Keep your response concise and encouraging. Avoid giving medical advice.")
+        use_cache = self._use_cache(user_message, context)
+        if use_cache:
+            cached = chat_response_cache.get(emotion, user_message)
+            if cached is not None:
+                return cached
 
         try:
-            response = self.model.generate_content("".join(prompt_parts))
-            return response.text
-        except Exception as e:
+            response = client.generate(self._build_prompt(user_message, emotion, context))
+        except GeminiError as e:
             return f"I'm having trouble connecting to my AI brain right now. ({e})"
+        if use_cache:
+            chat_response_cache.put(emotion, user_message, response)
+        return response
+
+    def stream_gemini_response(self, user_message, emotion=None, context=None):
+        """Yield the Gemini response in chunks as they arrive (for st.write_stream)."""
+        client = self.client
+        if client is None:
+            yield "I'm currently using rule-based responses. Gemini API is not available."
+            return
+
+        use_cache = self._use_cache(user_message, context)
+        if use_cache:
+            cached = chat_response_cache.get(emotion, user_message)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        try:
+            for chunk in client.stream(self._build_prompt(user_message, emotion, context)):
+                chunks.append(chunk)
+                yield chunk
+        except GeminiError as e:
+            yield f"I'm having trouble connecting to my AI brain right now. ({e})"
+            return
+        if use_cache:
+            chat_response_cache.put(emotion, user_message, "".join(chunks))
 
 
     def get_supportive_response(self):
@@ -147,15 +191,21 @@ class WellnessChatbot:
 
     def get_crisis_response(self):
         """Get a crisis response with resources."""
+        resources = [
+            f"{r['name']}: {r['phone']}"
+            for r in mental_health_resources.get_crisis_resources().values()
+        ]
         return {
             "message": "I'm concerned about you. If you're having thoughts of self-harm, please reach out for help immediately.",
-            "resources": [
-                "National Suicide Prevention Lifeline: 988",
-                "Crisis Text Line: Text HOME to 741741",
-                "Emergency Services: 911"
-            ]
+            "resources": resources + ["Emergency Services: 911"]
         }
 
+    def format_crisis_response(self):
+        """Crisis response as chat text (message followed by the resource list)."""
+        crisis = self.get_crisis_response()
+        lines = [crisis["message"], ""] + [f"- {r}" for r in crisis["resources"]]
+        return "\n".join(lines)
+
     def get_wellness_tip(self, emotion):
         """Get a wellness tip based on emotion."""
         tips = {
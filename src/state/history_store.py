@@ -0,0 +1,285 @@
+"""
+Columnar Emotion History Store
+
+Bounded, per-session store for detected emotions. Replaces the old
+list-of-dicts `emotion_history` so that long sessions (webcam bursts,
+video analysis) don't grow memory without limit or force a full
+DataFrame rebuild on every rerun.
+
+Layout:
+  - Preallocated NumPy columns: timestamp (int64 ns), emotion index (int8),
+    confidence (float32), source index (int8)
+  - Running per-emotion counts covering the whole session lifetime
+  - When the in-memory cap is reached, the oldest half of the rows is
+    spilled to an on-disk SQLite segment and dropped from memory
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.utils.constants import EMOTIONS
+
+# Bytes per stored row: int64 ts + int8 emotion + float32 conf + int8 source
+_ROW_BYTES = 8 + 1 + 4 + 1
+
+# Default in-memory budget per session (~14 bytes/row → ~75k rows)
+DEFAULT_MAX_BYTES = 1 << 20
+
+# Initial column allocation; columns double until the memory cap is hit
+_INITIAL_CAPACITY = 256
+
+# Vocabulary indexes are stored as int8
+_MAX_VOCAB = 127
+
+
+class EmotionHistoryStore:
+    """Append-only emotion history with a memory cap and disk spill."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None):
+        self.max_rows = max(_INITIAL_CAPACITY, int(max_bytes) // _ROW_BYTES)
+        self._spill_dir = spill_dir
+        self._spill_path = None
+        self._spilled_rows = 0
+        self._lock = threading.Lock()
+
+        self._emotions = list(EMOTIONS)
+        self._emotion_idx = {e: i for i, e in enumerate(self._emotions)}
+        self._sources = []
+        self._source_idx = {}
+        self._counts = np.zeros(len(self._emotions), dtype=np.int64)
+
+        self._size = 0
+        self._allocate(_INITIAL_CAPACITY)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, emotion, confidence, source, timestamp=None):
+        """Record one detection.
+
+        Args:
+            emotion: emotion label (e.g. "happy")
+            confidence: float 0–100
+            source: input source label (e.g. "photo", "webcam", "text")
+            timestamp: datetime, defaults to now
+        """
+        ts = timestamp if timestamp is not None else datetime.now()
+        with self._lock:
+            emo_i = self._intern_emotion(str(emotion).lower())
+            src_i = self._intern_source(str(source))
+
+            if self._size == len(self._ts):
+                if len(self._ts) < self.max_rows:
+                    self._allocate(min(len(self._ts) * 2, self.max_rows))
+                else:
+                    self._spill(self._size // 2)
+
+            i = self._size
+            self._ts[i] = np.datetime64(ts, "ns").astype(np.int64)
+            self._emotion[i] = emo_i
+            self._conf[i] = confidence if confidence is not None else 50.0
+            self._source[i] = src_i
+            self._size += 1
+            self._counts[emo_i] += 1
+
+    def clear(self):
+        """Drop all rows, counts and any spilled segment."""
+        with self._lock:
+            self._size = 0
+            self._counts[:] = 0
+            self._spilled_rows = 0
+            if self._spill_path and os.path.exists(self._spill_path):
+                os.remove(self._spill_path)
+            self._spill_path = None
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return self._spilled_rows + self._size
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        """Yield rows as dicts (oldest first), including spilled rows.
+
+        Kept for callers that still expect the old list-of-dicts shape.
+        Prefer `counts()`, `since()` or `to_frame()` for anything hot.
+        """
+        if self._spill_path:
+            with sqlite3.connect(self._spill_path) as conn:
+                for ts, emo, conf, src in conn.execute(
+                    "SELECT ts, emotion, confidence, source FROM history ORDER BY rowid"
+                ):
+                    yield self._row(ts, emo, conf, src)
+        for i in range(self._size):
+            yield self._row(self._ts[i], self._emotion[i], self._conf[i], self._source[i])
+
+    def counts(self):
+        """Lifetime per-emotion counts as a dict (zero counts omitted)."""
+        return {
+            self._emotions[i]: int(c) for i, c in enumerate(self._counts) if c
+        }
+
+    def most_common(self):
+        """The most frequently detected emotion, or None if empty."""
+        if not len(self):
+            return None
+        return self._emotions[int(self._counts.argmax())]
+
+    def since(self, cutoff):
+        """Rows with timestamp >= cutoff, as dicts (oldest first).
+
+        Served from memory; the spilled segment is only read when the window
+        reaches past the oldest in-memory row.
+        """
+        cutoff_ns = int(np.datetime64(cutoff, "ns").astype(np.int64))
+        with self._lock:
+            ts = self._ts[:self._size]
+            # Timestamps are appended in order, so a binary search finds the window
+            start = int(np.searchsorted(ts, cutoff_ns, side="left"))
+            rows = []
+            if start == 0 and self._spill_path and (not self._size or ts[0] > cutoff_ns):
+                with sqlite3.connect(self._spill_path) as conn:
+                    rows = [
+                        self._row(t, emo, conf, src)
+                        for t, emo, conf, src in conn.execute(
+                            "SELECT ts, emotion, confidence, source FROM history "
+                            "WHERE ts >= ? ORDER BY rowid",
+                            (cutoff_ns,),
+                        )
+                    ]
+            rows.extend(
+                self._row(ts[i], self._emotion[i], self._conf[i], self._source[i])
+                for i in range(start, self._size)
+            )
+            return rows
+
+    def to_frame(self, include_spilled=False):
+        """Return history as a DataFrame.
+
+        With include_spilled=False (the default) the columns are views over
+        the in-memory arrays — no row data is copied. Spilled rows are read
+        back from disk only when explicitly requested.
+        """
+        n = self._size
+        frame = pd.DataFrame(
+            {
+                "timestamp": self._ts[:n].view("datetime64[ns]"),
+                "emotion": pd.Categorical.from_codes(
+                    self._emotion[:n], categories=list(self._emotions)
+                ),
+                "confidence": self._conf[:n],
+                "source": pd.Categorical.from_codes(
+                    self._source[:n], categories=list(self._sources)
+                ),
+            },
+            copy=False,
+        )
+        if include_spilled and self._spill_path:
+            with sqlite3.connect(self._spill_path) as conn:
+                old = pd.read_sql_query(
+                    "SELECT ts, emotion, confidence, source FROM history ORDER BY rowid",
+                    conn,
+                )
+            old = pd.DataFrame({
+                "timestamp": old["ts"].to_numpy().view("datetime64[ns]"),
+                "emotion": pd.Categorical.from_codes(
+                    old["emotion"].to_numpy(np.int8), categories=list(self._emotions)
+                ),
+                "confidence": old["confidence"].astype(np.float32),
+                "source": pd.Categorical.from_codes(
+                    old["source"].to_numpy(np.int8), categories=list(self._sources)
+                ),
+            })
+            frame = pd.concat([old, frame], ignore_index=True)
+        return frame
+
+    @property
+    def spilled_rows(self):
+        return self._spilled_rows
+
+    @property
+    def memory_bytes(self):
+        return len(self._ts) * _ROW_BYTES
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _allocate(self, capacity):
+        """(Re)allocate columns to `capacity` rows, keeping existing data."""
+        n = self._size
+        ts = np.empty(capacity, dtype=np.int64)
+        emotion = np.empty(capacity, dtype=np.int8)
+        conf = np.empty(capacity, dtype=np.float32)
+        source = np.empty(capacity, dtype=np.int8)
+        if n:
+            ts[:n] = self._ts[:n]
+            emotion[:n] = self._emotion[:n]
+            conf[:n] = self._conf[:n]
+            source[:n] = self._source[:n]
+        self._ts, self._emotion, self._conf, self._source = ts, emotion, conf, source
+
+    def _spill(self, n):
+        """Move the oldest n rows to the on-disk segment."""
+        if self._spill_path is None:
+            spill_dir = self._spill_dir or os.path.join(tempfile.gettempdir(), "ers_history")
+            os.makedirs(spill_dir, exist_ok=True)
+            self._spill_path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.sqlite")
+        with sqlite3.connect(self._spill_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history "
+                "(ts INTEGER, emotion INTEGER, confidence REAL, source INTEGER)"
+            )
+            conn.executemany(
+                "INSERT INTO history VALUES (?, ?, ?, ?)",
+                zip(
+                    self._ts[:n].tolist(), self._emotion[:n].tolist(),
+                    self._conf[:n].tolist(), self._source[:n].tolist(),
+                ),
+            )
+        keep = self._size - n
+        for col in (self._ts, self._emotion, self._conf, self._source):
+            col[:keep] = col[n:self._size]
+        self._size = keep
+        self._spilled_rows += n
+
+    def _intern_emotion(self, name):
+        idx = self._emotion_idx.get(name)
+        if idx is None:
+            if len(self._emotions) >= _MAX_VOCAB:
+                return self._emotion_idx["neutral"]
+            idx = len(self._emotions)
+            self._emotions.append(name)
+            self._emotion_idx[name] = idx
+            self._counts = np.append(self._counts, 0)
+        return idx
+
+    def _intern_source(self, name):
+        idx = self._source_idx.get(name)
+        if idx is None:
+            if len(self._sources) >= _MAX_VOCAB:
+                raise ValueError(f"Too many distinct history sources (max {_MAX_VOCAB})")
+            idx = len(self._sources)
+            self._sources.append(name)
+            self._source_idx[name] = idx
+        return idx
+
+    def _row(self, ts, emo, conf, src):
+        return {
+            "timestamp": pd.Timestamp(int(ts)).to_pydatetime(),
+            "emotion": self._emotions[int(emo)],
+            "confidence": float(conf),
+            "source": self._sources[int(src)],
+        }
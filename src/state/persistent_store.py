@@ -0,0 +1,498 @@
+"""
+Persistent Local Storage (SQLite)
+
+Keeps emotion detections, mood journal entries and chat messages across
+sessions. Session state stays the fast per-rerun cache; this store is the
+durable record and the source for history views and exports.
+
+Design:
+  - One SQLite file per install (override with ERS_DB_PATH)
+  - WAL journal mode so the Streamlit script thread can read while
+    another session writes
+  - One connection per (process, thread), reused across calls
+  - Indexes on (user_id, timestamp) and (session_id, timestamp) so
+    time-range queries and aggregates only touch the rows requested
+  - Exports stream rows from a cursor instead of building lists in memory
+  - Journal text is indexed with FTS5 (updated on each save) for ranked search
+"""
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DB_PATH = PROJECT_ROOT / "data" / "sentixcare.db"
+
+# Rows fetched per round trip when streaming exports
+_FETCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emotion_events (
+    id          INTEGER PRIMARY KEY,
+    user_id     TEXT NOT NULL,
+    session_id  TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    emotion     TEXT NOT NULL,
+    confidence  REAL,
+    source      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_emotion_user_ts ON emotion_events (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emotion_session_ts ON emotion_events (session_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS journal_entries (
+    id                   INTEGER PRIMARY KEY,
+    user_id              TEXT NOT NULL,
+    session_id           TEXT NOT NULL,
+    timestamp            TEXT NOT NULL,
+    emotion              TEXT NOT NULL,
+    intensity            INTEGER,
+    responses            TEXT,
+    additional_thoughts  TEXT,
+    mood_tags            TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_user_ts ON journal_entries (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_journal_session_ts ON journal_entries (session_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id          INTEGER PRIMARY KEY,
+    user_id     TEXT NOT NULL,
+    session_id  TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    role        TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    emotion     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chat_user_ts ON chat_messages (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_chat_session_ts ON chat_messages (session_id, timestamp);
+"""
+
+# Full-text index over journal text. rowid == journal_entries.id; kept in
+# sync by the store on insert/delete (no triggers, since the responses JSON
+# has to be flattened to answer text first).
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+    responses, additional_thoughts, mood_tags,
+    tokenize = 'porter unicode61'
+);
+"""
+
+# bm25 column weights: answers, additional thoughts, tags
+_FTS_WEIGHTS = (1.0, 1.0, 2.0)
+
+_JOURNAL_COLUMNS = (
+    "id, timestamp, emotion, intensity, responses, additional_thoughts, mood_tags"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _iso(ts):
+    """Normalize a datetime / ISO string / None to an ISO-8601 string."""
+    if ts is None:
+        return datetime.now().isoformat()
+    if isinstance(ts, datetime):
+        return ts.isoformat()
+    return str(ts)
+
+
+def _time_filter(start, end):
+    """Build a (sql, params) fragment for an optional [start, end) range."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(_iso(start))
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(_iso(end))
+    sql = "".join(f" AND {c}" for c in clauses)
+    return sql, params
+
+
+def _fts_query(text):
+    """Turn free text into a safe FTS5 query: every word, prefix-matched."""
+    return " ".join(f'"{tok}"*' for tok in _TOKEN_RE.findall(text.lower()))
+
+
+def _fts_document(entry):
+    """Index text for a journal entry: answers only, not the prompt text."""
+    responses = entry.get("responses") or {}
+    return (
+        "\n".join(a for a in responses.values() if a),
+        entry.get("additional_thoughts") or "",
+        " ".join(entry.get("mood_tags") or []),
+    )
+
+
+def _journal_row_to_entry(row):
+    """Turn a journal_entries row into the dict shape the UI already uses."""
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "emotion": row[2],
+        "intensity": row[3],
+        "responses": json.loads(row[4]) if row[4] else {},
+        "additional_thoughts": row[5] or "",
+        "mood_tags": json.loads(row[6]) if row[6] else [],
+    }
+
+
+class PersistentStore:
+    """SQLite-backed store for emotions, journal entries and chat."""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or os.environ.get("ERS_DB_PATH", DEFAULT_DB_PATH))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._init_schema()
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    def _conn(self):
+        """Return this thread's connection, opening it on first use."""
+        if os.getpid() != self._pid:
+            # Forked worker — never reuse the parent's connections
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        with conn:
+            conn.executescript(_SCHEMA)
+        try:
+            with conn:
+                conn.executescript(_FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 — search falls back to LIKE scans
+            self.fts_enabled = False
+            return
+        self._backfill_fts()
+
+    def _backfill_fts(self):
+        """Index entries written before the FTS table existed (one-time)."""
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT {_JOURNAL_COLUMNS} FROM journal_entries "
+            "WHERE id NOT IN (SELECT rowid FROM journal_fts)"
+        ).fetchall()
+        if rows:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO journal_fts (rowid, responses, additional_thoughts, mood_tags) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(r[0], *_fts_document(_journal_row_to_entry(r))) for r in rows],
+                )
+
+    def close(self):
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------
+    # Emotion events
+    # ------------------------------------------------------------------
+
+    def record_emotion(self, user_id, session_id, emotion, confidence, source, timestamp=None):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO emotion_events "
+                "(user_id, session_id, timestamp, emotion, confidence, source) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, session_id, _iso(timestamp), emotion, confidence, source),
+            )
+
+    def emotion_counts(self, user_id, start=None, end=None):
+        """Per-emotion detection counts for a user within [start, end)."""
+        time_sql, params = _time_filter(start, end)
+        rows = self._conn().execute(
+            "SELECT emotion, COUNT(*) FROM emotion_events "
+            f"WHERE user_id = ?{time_sql} GROUP BY emotion ORDER BY COUNT(*) DESC",
+            [user_id, *params],
+        )
+        return dict(rows.fetchall())
+
+    def emotion_timeline(self, user_id, start=None, end=None):
+        """Daily (date, emotion, count, avg_confidence) rows within [start, end)."""
+        time_sql, params = _time_filter(start, end)
+        rows = self._conn().execute(
+            "SELECT substr(timestamp, 1, 10) AS day, emotion, COUNT(*), AVG(confidence) "
+            f"FROM emotion_events WHERE user_id = ?{time_sql} "
+            "GROUP BY day, emotion ORDER BY day",
+            [user_id, *params],
+        )
+        return rows.fetchall()
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+
+    def add_journal_entry(self, user_id, session_id, entry):
+        """Insert a journal entry dict (as built by the journal form). Returns its id."""
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO journal_entries "
+                "(user_id, session_id, timestamp, emotion, intensity, responses, "
+                "additional_thoughts, mood_tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user_id, session_id, _iso(entry.get("timestamp")),
+                    entry["emotion"], entry.get("intensity"),
+                    json.dumps(entry.get("responses") or {}),
+                    entry.get("additional_thoughts") or "",
+                    json.dumps(entry.get("mood_tags") or []),
+                ),
+            )
+            if self.fts_enabled:
+                # Incremental index update in the same transaction as the insert
+                conn.execute(
+                    "INSERT INTO journal_fts (rowid, responses, additional_thoughts, mood_tags) "
+                    "VALUES (?, ?, ?, ?)",
+                    (cur.lastrowid, *_fts_document(entry)),
+                )
+        return cur.lastrowid
+
+    def count_journal_entries(self, user_id):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM journal_entries WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0]
+
+    def recent_journal_entries(self, user_id, limit=5):
+        """The newest `limit` entries, newest first."""
+        rows = self._conn().execute(
+            f"SELECT {_JOURNAL_COLUMNS} FROM journal_entries WHERE user_id = ? "
+            "ORDER BY timestamp DESC LIMIT ?",
+            (user_id, limit),
+        )
+        return [_journal_row_to_entry(r) for r in rows]
+
+    def iter_journal_entries(self, user_id, start=None, end=None):
+        """Stream entries (oldest first) within [start, end) without loading them all."""
+        time_sql, params = _time_filter(start, end)
+        cur = self._conn().execute(
+            f"SELECT {_JOURNAL_COLUMNS} FROM journal_entries "
+            f"WHERE user_id = ?{time_sql} ORDER BY timestamp",
+            [user_id, *params],
+        )
+        while True:
+            rows = cur.fetchmany(_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield _journal_row_to_entry(row)
+
+    def journal_stats(self, user_id, start=None, end=None):
+        """Per-emotion entry counts and average intensity, computed in SQL."""
+        time_sql, params = _time_filter(start, end)
+        rows = self._conn().execute(
+            "SELECT emotion, COUNT(*), AVG(intensity) FROM journal_entries "
+            f"WHERE user_id = ?{time_sql} GROUP BY emotion ORDER BY COUNT(*) DESC",
+            [user_id, *params],
+        )
+        return [
+            {"emotion": emo, "count": count, "avg_intensity": avg}
+            for emo, count, avg in rows
+        ]
+
+    def clear_journal(self, user_id):
+        conn = self._conn()
+        with conn:
+            if self.fts_enabled:
+                conn.execute(
+                    "DELETE FROM journal_fts WHERE rowid IN "
+                    "(SELECT id FROM journal_entries WHERE user_id = ?)",
+                    (user_id,),
+                )
+            conn.execute("DELETE FROM journal_entries WHERE user_id = ?", (user_id,))
+
+    def search_journal(self, user_id, query, emotion=None, min_intensity=None,
+                       max_intensity=None, limit=20):
+        """Ranked full-text search over a user's journal entries.
+
+        Args:
+            user_id: owner of the entries
+            query: free text; every word must match (prefix match, stemmed)
+            emotion: optional emotion filter
+            min_intensity / max_intensity: optional inclusive intensity bounds
+            limit: maximum number of results
+
+        Returns:
+            list of entry dicts (best match first), each with a 'snippet'
+            highlighting the matched text in **bold**.
+        """
+        filters, params = ["j.user_id = ?"], [user_id]
+        if emotion:
+            filters.append("j.emotion = ?")
+            params.append(emotion)
+        if min_intensity is not None:
+            filters.append("j.intensity >= ?")
+            params.append(min_intensity)
+        if max_intensity is not None:
+            filters.append("j.intensity <= ?")
+            params.append(max_intensity)
+        where = " AND ".join(filters)
+        columns = ", ".join(f"j.{c.strip()}" for c in _JOURNAL_COLUMNS.split(","))
+
+        match = _fts_query(query)
+        if not match:
+            return []
+
+        if self.fts_enabled:
+            rows = self._conn().execute(
+                f"SELECT {columns}, "
+                "snippet(journal_fts, -1, '**', '**', '…', 12) "
+                "FROM journal_fts JOIN journal_entries AS j ON j.id = journal_fts.rowid "
+                f"WHERE journal_fts MATCH ? AND {where} "
+                f"ORDER BY bm25(journal_fts, {', '.join(map(str, _FTS_WEIGHTS))}) "
+                "LIMIT ?",
+                [match, *params, limit],
+            )
+        else:
+            like_clauses = []
+            for tok in _TOKEN_RE.findall(query.lower()):
+                like_clauses.append(
+                    "(j.responses LIKE ? OR j.additional_thoughts LIKE ? OR j.mood_tags LIKE ?)"
+                )
+                params.extend([f"%{tok}%"] * 3)
+            rows = self._conn().execute(
+                f"SELECT {columns}, substr(j.additional_thoughts, 1, 80) "
+                f"FROM journal_entries AS j WHERE {where} AND {' AND '.join(like_clauses)} "
+                "ORDER BY j.timestamp DESC LIMIT ?",
+                [*params, limit],
+            )
+
+        results = []
+        for row in rows:
+            entry = _journal_row_to_entry(row[:-1])
+            entry["snippet"] = row[-1]
+            results.append(entry)
+        return results
+
+    # ------------------------------------------------------------------
+    # Journal exports (streamed row by row)
+    # ------------------------------------------------------------------
+
+    def export_journal_json(self, user_id, fh, start=None, end=None):
+        """Write entries to a text file-like object as a JSON document."""
+        fh.write("{\n")
+        fh.write(f'  "export_date": {json.dumps(datetime.now().isoformat())},\n')
+        fh.write('  "entries": [')
+        total = 0
+        for entry in self.iter_journal_entries(user_id, start, end):
+            entry.pop("id", None)
+            fh.write(",\n    " if total else "\n    ")
+            fh.write(json.dumps(entry))
+            total += 1
+        fh.write("\n  ],\n" if total else "],\n")
+        fh.write(f'  "total_entries": {total}\n')
+        fh.write("}\n")
+        return total
+
+    def export_journal_csv(self, user_id, fh, start=None, end=None):
+        """Write flattened entries to a text file-like object as CSV."""
+        writer = csv.writer(fh)
+        writer.writerow(_FLAT_HEADER)
+        total = 0
+        for entry in self.iter_journal_entries(user_id, start, end):
+            writer.writerow(_flatten_entry(entry))
+            total += 1
+        return total
+
+    def export_journal_excel(self, user_id, fh, start=None, end=None):
+        """Write flattened entries to a binary file-like object as .xlsx.
+
+        Uses openpyxl's write-only mode so rows are streamed to the sheet
+        rather than held as a DataFrame.
+        """
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Mood Journal")
+        ws.append(list(_FLAT_HEADER))
+        total = 0
+        for entry in self.iter_journal_entries(user_id, start, end):
+            ws.append(_flatten_entry(entry))
+            total += 1
+        wb.save(fh)
+        return total
+
+    # ------------------------------------------------------------------
+    # Chat
+    # ------------------------------------------------------------------
+
+    def add_chat_message(self, user_id, session_id, role, content, emotion=None):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO chat_messages "
+                "(user_id, session_id, timestamp, role, content, emotion) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, session_id, _iso(None), role, content, emotion),
+            )
+
+    def chat_history(self, session_id, limit=50):
+        """The last `limit` messages of a session, oldest first."""
+        rows = self._conn().execute(
+            "SELECT role, content FROM chat_messages WHERE session_id = ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        return [{"role": r, "content": c} for r, c in reversed(rows)]
+
+
+_FLAT_HEADER = (
+    "Timestamp", "Emotion", "Intensity", "Tags",
+    "Questions & Answers", "Additional Thoughts",
+)
+
+
+def _flatten_entry(entry):
+    """One spreadsheet row per journal entry (same layout as the old export)."""
+    q_a = "\n\n".join(
+        f"Q: {q}\nA: {a}" for q, a in entry["responses"].items() if a
+    )
+    return [
+        datetime.fromisoformat(entry["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+        entry["emotion"].title(),
+        entry["intensity"],
+        ", ".join(entry["mood_tags"]),
+        q_a,
+        entry["additional_thoughts"],
+    ]
+
+
+# ===============================
+# Process-wide accessor
+# ===============================
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide PersistentStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PersistentStore()
+    return _store
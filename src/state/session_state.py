@@ -4,8 +4,16 @@ All session state defaults are defined here to prevent scattered initialization
 and ensure consistent state across the application.
 """
 
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+
 import streamlit as st
 
+from src.state.history_store import EmotionHistoryStore
+from src.state.persistent_store import get_store
+
 
 def init_session_state():
     """Initialize all session state variables with safe defaults.
@@ -14,6 +22,9 @@ def init_session_state():
     Uses setdefault pattern to avoid overwriting existing values.
     """
     defaults = {
+        # Identity (keys for the persistent store; user_id is set below)
+        'session_id': uuid.uuid4().hex,
+
         # Model state
         'models_loaded': False,
         'device': None,
@@ -27,9 +38,7 @@ def init_session_state():
         'final_emotion': None,
         'final_confidence': None,
         'multimodal_results': [],
-        'emotion_history': [],
-        'all_results': [],
-        'processed_frames': [],
+        'emotion_history': EmotionHistoryStore(),
         'show_multimodal_recommendations': False,
 
         # Music
@@ -48,9 +57,6 @@ def init_session_state():
         'chat_input_key': 0,
         'pending_message': None,
 
-        # Journal
-        'journal_entries': [],
-
         # Video Analysis Dashboard
         'video_analysis_results': None,
         'video_metadata': {},
@@ -63,3 +69,38 @@ def init_session_state():
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
+
+    # Without authentication every browser session is its own user, so one
+    # visitor can never read or clear another's journal. ERS_USER_ID opts a
+    # single-user install into one shared history across sessions.
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = os.environ.get('ERS_USER_ID') or st.session_state.session_id
+
+
+def persist(write, what):
+    """Run ``write(store)`` against the persistent store without raising.
+
+    Persistence is best-effort: a locked or unwritable database (or a data
+    directory that cannot be created) shows a warning instead of breaking
+    the page. Returns True when the write went through.
+    """
+    try:
+        write(get_store())
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"[SessionState] Could not persist {what}: {e}")
+        st.warning(f"⚠️ Could not save the {what} — local storage is unavailable.")
+        return False
+
+
+def record_emotion(emotion, confidence, source):
+    """Append a detection to the session history and the persistent store."""
+    now = datetime.now()
+    st.session_state.emotion_history.append(emotion, confidence, source, timestamp=now)
+    persist(
+        lambda store: store.record_emotion(
+            st.session_state.user_id, st.session_state.session_id,
+            emotion, confidence, source, timestamp=now,
+        ),
+        "emotion event",
+    )
@@ -46,14 +46,9 @@ def create_compact_sidebar():
             total_detections = len(st.session_state.emotion_history)
             st.metric("Total Sessions", total_detections)
             
-            # Most common emotion
-            emotion_counts = {}
-            for entry in st.session_state.emotion_history:
-                emotion = entry['emotion']
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-            
-            if emotion_counts:
-                most_common = max(emotion_counts, key=emotion_counts.get)
+            # Most common emotion (running counts kept by the history store)
+            most_common = st.session_state.emotion_history.most_common()
+            if most_common:
                 st.metric("Most Common Mood", most_common.title())
             
             st.markdown("---")
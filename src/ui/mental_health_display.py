@@ -5,6 +5,7 @@ Handles the display of mental health resources and professional support links
 
 import streamlit as st
 from typing import Dict, List
+from src.ui.render_timing import timed_render
 
 def display_mental_health_resources(emotion: str, intensity: int = 5, title: str = "🆘 Mental Health Support"):
     """Display comprehensive mental health resources based on emotion and intensity"""
@@ -266,13 +267,16 @@ def create_mental_health_sidebar():
     st.markdown("**This app is not a substitute for professional mental health care. If you're in crisis, please reach out for immediate help.**")
 
 @st.fragment
+@timed_render("chatbot_tab")
 def show_chatbot(emotion):
     """Display the wellness chatbot interface based on detected emotion.
     Runs as a fragment to prevent the entire page from rerunning on input.
     """
     import streamlit as st
     from src.features.wellness_chatbot import wellness_chatbot # Updated import
+    from src.features.crisis_detector import crisis_detector
     from src.ui.enhanced_ui import apply_chat_styling
+    from src.state.session_state import persist
     
     # Apply chat styling
     apply_chat_styling()
@@ -293,6 +297,9 @@ def show_chatbot(emotion):
     # Initialize chat history in session state
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
+    # Token-budgeted context (recent turns + rolling summary) sent with each message
+    if 'chat_context' not in st.session_state:
+        st.session_state.chat_context = wellness_chatbot.new_context()
     
     # 1. Layout: Define container first so it appears above the input
     if not st.session_state.chat_history:
@@ -308,23 +315,13 @@ def show_chatbot(emotion):
         key=f"chatbot_input_{emotion}",
     )
 
-    # 3. Process input and update state immediately
+    # 3. Record the new user message so it is part of the history drawn below
     if user_message:
         st.session_state.chat_history.append({
             "role": "user",
             "content": user_message,
         })
 
-        if wellness_chatbot.model:
-            bot_response = wellness_chatbot.get_gemini_response(user_message, emotion)
-        else:
-            bot_response = wellness_chatbot.get_supportive_response()
-
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": bot_response,
-        })
-
     # 4. Render the chat history visually inside the container defined above
     with chat_container:
         for message in st.session_state.chat_history:
@@ -332,9 +329,46 @@ def show_chatbot(emotion):
             with st.chat_message(message["role"], avatar=avatar):
                 st.write(message["content"])
 
+        # 5. Stream the reply into the chat as tokens arrive
+        if user_message:
+            # Crisis check runs locally before any LLM or cache call
+            in_crisis = crisis_detector.is_crisis(user_message)
+            with st.chat_message("assistant", avatar="🌟"):
+                if in_crisis:
+                    bot_response = wellness_chatbot.format_crisis_response()
+                    st.markdown(bot_response)
+                elif wellness_chatbot.model:
+                    bot_response = st.write_stream(
+                        wellness_chatbot.stream_gemini_response(
+                            user_message, emotion, context=st.session_state.chat_context
+                        )
+                    )
+                else:
+                    bot_response = wellness_chatbot.get_supportive_response()
+                    st.write(bot_response)
+
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": bot_response,
+            })
+            st.session_state.chat_context.add_exchange(user_message, bot_response)
+
+            # Keep a durable copy of the exchange
+            def _save_exchange(store):
+                for message in st.session_state.chat_history[-2:]:
+                    store.add_chat_message(
+                        st.session_state.user_id, st.session_state.session_id,
+                        message["role"], message["content"], emotion=emotion,
+                    )
+            persist(_save_exchange, "chat message")
+
+            if in_crisis:
+                display_crisis_resources()
+
     # Clear chat button
     if st.button("Clear Chat 🗑️", key="clear_chat_btn"):
         st.session_state.chat_history = []
+        st.session_state.chat_context.clear()
         st.rerun(scope="fragment")
 
     # Show wellness tip
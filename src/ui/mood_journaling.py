@@ -1,21 +1,24 @@
 import streamlit as st
 from datetime import datetime
-import json
-import pandas as pd
 import io
+import sqlite3
 
 from src.features.wellness_features import wellness_features
+from src.features.crisis_detector import crisis_detector
+from src.state.persistent_store import get_store
+from src.state.session_state import persist
+from src.utils.constants import EMOTIONS
+from src.ui.render_timing import timed_render
 
 
 @st.fragment
+@timed_render("journal_tab")
 def display_mood_journal(emotion, wellness_features):
     """Display mood journaling interface based on detected emotion."""
     
     st.subheader("📝 Mood Journal")
     
-    # Store journal entries in session state
-    if "journal_entries" not in st.session_state:
-        st.session_state.journal_entries = []
+    user_id = st.session_state.user_id
     
     # Get journaling prompts for the emotion
     prompts = wellness_features.get_mood_journal_prompts(emotion)
@@ -91,158 +94,183 @@ def display_mood_journal(emotion, wellness_features):
                     "mood_tags": mood_tags
                 }
                 
-                # Add to session state
-                st.session_state.journal_entries.append(entry)
-                
-                st.success("✅ Journal entry saved! Great job taking time to reflect on your feelings.")
+                # Persist so entries survive the session
+                saved = persist(
+                    lambda store: store.add_journal_entry(user_id, st.session_state.session_id, entry),
+                    "journal entry",
+                )
+                if saved:
+                    st.success("✅ Journal entry saved! Great job taking time to reflect on your feelings.")
+
+                # Surface crisis resources straight away if the entry needs them
+                written = "\n".join(list(journal_responses.values()) + [additional_thoughts])
+                if crisis_detector.is_crisis(written):
+                    from src.ui.mental_health_display import display_crisis_resources
+                    display_crisis_resources()
             else:
                 st.warning("Please write something before saving.")
     
-    # Display saved entries
-    if st.session_state.journal_entries:
+    # Display saved entries (skipped when the store cannot be opened)
+    try:
+        store = get_store()
+        total_entries = store.count_journal_entries(user_id)
+    except (sqlite3.Error, OSError) as e:
+        print(f"[MoodJournal] Could not load saved entries: {e}")
+        return
+    if total_entries:
         
         st.markdown("---")
         st.markdown("### 📖 Previous Entries")
         
-        # Show entries in reverse order (newest first)
-        entries_to_show = list(reversed(st.session_state.journal_entries[-5:]))
+        # Only the newest entries are fetched (newest first)
+        entries_to_show = store.recent_journal_entries(user_id, limit=5)
         
         for idx, entry in enumerate(entries_to_show):
-            entry_num = len(st.session_state.journal_entries) - idx if idx < len(st.session_state.journal_entries) else idx + 1
-            
-            with st.expander(f"📝 Entry {entry_num} - {entry['emotion'].title()} ({entry['intensity']}/10) | {datetime.fromisoformat(entry['timestamp']).strftime('%Y-%m-%d %H:%M')}"):
-                st.markdown(f"**Date:** {datetime.fromisoformat(entry['timestamp']).strftime('%Y-%m-%d %H:%M')}")
-                st.markdown(f"**Emotion:** {entry['emotion'].title()}")
-                st.markdown(f"**Intensity:** {entry['intensity']}/10")
-                
-                if entry['mood_tags']:
-                    st.markdown(f"**Tags:** {', '.join(entry['mood_tags'])}")
-                
-                st.markdown("**Responses:**")
-                for prompt, response in entry['responses'].items():
-                    if response:
-                        st.markdown(f"**Q:** *{prompt}*")
-                        st.markdown(f"**A:** {response}")
-                        st.markdown("")
-                
-                if entry['additional_thoughts']:
-                    st.markdown("**Additional Thoughts:**")
-                    st.markdown(entry['additional_thoughts'])
+            entry_num = total_entries - idx
+            _render_entry(entry, f"📝 Entry {entry_num}")
+        
+        # Search older entries
+        _render_journal_search(store, user_id)
         
         # Clear journal button
         col1, col2 = st.columns([1, 4])
         with col1:
             if st.button("🗑️ Clear All", key="clear_journal"):
-                st.session_state.journal_entries = []
+                store.clear_journal(user_id)
                 st.rerun(scope="fragment")
         with col2:
-            # Export button
+            # Export button — files are streamed from the store row by row
             if st.button("📥 Export Data", key="export_journal"):
-                # Prepare metadata for exports
-                export_data = {
-                    "export_date": datetime.now().isoformat(),
-                    "total_entries": len(st.session_state.journal_entries),
-                    "entries": st.session_state.journal_entries
-                }
+                stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 
                 # JSON Download
-                json_data = json.dumps(export_data, indent=2)
+                json_buf = io.StringIO()
+                store.export_journal_json(user_id, json_buf)
                 st.download_button(
                     label="📥 Download JSON",
-                    data=json_data,
-                    file_name=f"mood_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                    data=json_buf.getvalue(),
+                    file_name=f"mood_journal_{stamp}.json",
                     mime="application/json",
                     key="download_json"
                 )
                 
                 # Excel Download
                 try:
-                    # Flatten the data for Excel
-                    flattened_entries = []
-                    for entry in st.session_state.journal_entries:
-                        # Combine tags into a string
-                        tags_str = ", ".join(entry['mood_tags']) if entry['mood_tags'] else ""
-                        
-                        # Combine all Q&A into one summary string for readability, 
-                        # but also keep them separate if possible
-                        q_a_list = []
-                        for q, a in entry['responses'].items():
-                            if a:
-                                q_a_list.append(f"Q: {q}\nA: {a}")
-                        q_a_str = "\n\n".join(q_a_list)
-                        
-                        row = {
-                            "Timestamp": datetime.fromisoformat(entry['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
-                            "Emotion": entry['emotion'].title(),
-                            "Intensity": entry['intensity'],
-                            "Tags": tags_str,
-                            "Questions & Answers": q_a_str,
-                            "Additional Thoughts": entry['additional_thoughts']
-                        }
-                        flattened_entries.append(row)
-                    
-                    df = pd.DataFrame(flattened_entries)
-                    
-                    # Create Excel file in memory
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        df.to_excel(writer, index=False, sheet_name='Mood Journal')
-                    
-                    excel_data = output.getvalue()
-                    
+                    excel_buf = io.BytesIO()
+                    store.export_journal_excel(user_id, excel_buf)
                     st.download_button(
                         label="📊 Download Excel",
-                        data=excel_data,
-                        file_name=f"mood_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                        data=excel_buf.getvalue(),
+                        file_name=f"mood_journal_{stamp}.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         key="download_excel"
                     )
                 except Exception as e:
                     # Fallback to CSV if Excel fails
-                    csv = df.to_csv(index=False).encode('utf-8')
+                    csv_buf = io.StringIO()
+                    store.export_journal_csv(user_id, csv_buf)
                     st.download_button(
                         label="📄 Download CSV (Excel Compatible)",
-                        data=csv,
-                        file_name=f"mood_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        data=csv_buf.getvalue().encode('utf-8'),
+                        file_name=f"mood_journal_{stamp}.csv",
                         mime="text/csv",
                         key="download_csv"
                     )
 
 
+def _render_entry(entry, label):
+    """Render one journal entry inside an expander."""
+    entry_time = datetime.fromisoformat(entry['timestamp']).strftime('%Y-%m-%d %H:%M')
+    with st.expander(f"{label} - {entry['emotion'].title()} ({entry['intensity']}/10) | {entry_time}"):
+        st.markdown(f"**Date:** {entry_time}")
+        st.markdown(f"**Emotion:** {entry['emotion'].title()}")
+        st.markdown(f"**Intensity:** {entry['intensity']}/10")
+        
+        if entry['mood_tags']:
+            st.markdown(f"**Tags:** {', '.join(entry['mood_tags'])}")
+        
+        st.markdown("**Responses:**")
+        for prompt, response in entry['responses'].items():
+            if response:
+                st.markdown(f"**Q:** *{prompt}*")
+                st.markdown(f"**A:** {response}")
+                st.markdown("")
+        
+        if entry['additional_thoughts']:
+            st.markdown("**Additional Thoughts:**")
+            st.markdown(entry['additional_thoughts'])
+
+
+def _render_journal_search(store, user_id):
+    """Full-text search across all saved entries (not just the latest five)."""
+    st.markdown("#### 🔎 Search Your Journal")
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        query = st.text_input(
+            "Search entries",
+            key="journal_search_query",
+            placeholder="e.g. work deadline, sleep, grateful...",
+            label_visibility="collapsed",
+        )
+    with col2:
+        emotion_filter = st.selectbox(
+            "Emotion",
+            ["Any"] + [e.title() for e in EMOTIONS],
+            key="journal_search_emotion",
+            label_visibility="collapsed",
+        )
+    with col3:
+        intensity_range = st.slider(
+            "Intensity", 1, 10, (1, 10),
+            key="journal_search_intensity",
+            label_visibility="collapsed",
+        )
+    
+    if not query.strip():
+        return
+    
+    results = store.search_journal(
+        user_id,
+        query,
+        emotion=None if emotion_filter == "Any" else emotion_filter.lower(),
+        min_intensity=intensity_range[0],
+        max_intensity=intensity_range[1],
+    )
+    if not results:
+        st.info("No matching entries found.")
+        return
+    
+    st.caption(f"{len(results)} matching entr{'y' if len(results) == 1 else 'ies'} (best match first)")
+    for entry in results:
+        if entry['snippet']:
+            st.markdown(f"> {entry['snippet']}")
+        _render_entry(entry, "🔎 Match")
+
+
 def display_mood_tracking():
     """Display mood tracking over time."""
     
-    if not st.session_state.get('journal_entries', []):
+    # Aggregates are computed in SQL rather than over every entry
+    try:
+        mood_stats = get_store().journal_stats(st.session_state.user_id)
+    except (sqlite3.Error, OSError) as e:
+        print(f"[MoodJournal] Could not load mood stats: {e}")
+        return
+    if not mood_stats:
         return
     
     st.markdown("---")
     st.subheader("📊 Mood Tracking")
     
-    # Create mood tracking data
-    mood_data = []
-    for entry in st.session_state.journal_entries:
-        mood_data.append({
-            "date": datetime.fromisoformat(entry['timestamp']).strftime('%Y-%m-%d'),
-            "emotion": entry['emotion'],
-            "intensity": entry['intensity']
-        })
+    # Display mood trends
+    st.markdown("#### Your Mood Trends")
     
-    if mood_data:
-        # Display mood trends
-        st.markdown("#### Your Mood Trends")
-        
-        # Emotion frequency
-        emotion_counts = {}
-        for entry in mood_data:
-            emotion = entry['emotion']
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        if emotion_counts:
-            st.markdown("**Most Common Emotions:**")
-            for emotion, count in sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True):
-                st.markdown(f"- {emotion.title()}: {count} times")
-        
-        # Average intensity
-        avg_intensity = sum(entry['intensity'] for entry in mood_data) / len(mood_data)
-        st.markdown(f"**Average Emotion Intensity:** {avg_intensity:.1f}/10")
-
+    # Emotion frequency
+    st.markdown("**Most Common Emotions:**")
+    for row in mood_stats:
+        st.markdown(f"- {row['emotion'].title()}: {row['count']} times")
+    
+    # Average intensity
+    total = sum(row['count'] for row in mood_stats)
+    avg_intensity = sum(row['avg_intensity'] * row['count'] for row in mood_stats) / total
+    st.markdown(f"**Average Emotion Intensity:** {avg_intensity:.1f}/10")
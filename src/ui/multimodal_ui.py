@@ -6,7 +6,6 @@ Extracted from app.py to separate UI from routing logic.
 
 import cv2
 import streamlit as st
-from datetime import datetime
 from PIL import Image
 
 from src.core.emotion_engine import (
@@ -15,7 +14,10 @@ from src.core.emotion_engine import (
     standardize_emotion_result,
     detect_emotion_from_text_simple,
 )
+from src.features.crisis_detector import crisis_detector
+from src.state.session_state import record_emotion
 from src.ui.enhanced_ui import create_soothing_section
+from src.ui.mental_health_display import display_crisis_resources
 from src.ui.recommendation_panel import display_unified_recommendation_panel
 from src.utils.constants import EMOTION_EMOJIS
 
@@ -23,12 +25,7 @@ from src.utils.constants import EMOTION_EMOJIS
 def _process_emotion_result_multimodal(emotion, confidence, source):
     """Handle the final emotion result for multimodal mode (append to list)."""
     result = standardize_emotion_result(emotion, confidence, source)
-    st.session_state.emotion_history.append({
-        'timestamp': datetime.now(),
-        'emotion': emotion,
-        'confidence': confidence,
-        'source': source,
-    })
+    record_emotion(emotion, confidence, source)
     st.session_state.multimodal_results.append(result)
     st.success(
         f"✅ Added **{result['emotion'].title()}** ({result['confidence']:.1f}%) "
@@ -97,12 +94,16 @@ def render_multimodal_mode_ui():
             mood_text_extra = st.text_input("Describe briefly:", placeholder="e.g. Tough day at work", key="multi_text_brief")
 
         if st.button("Add Text Emotion", use_container_width=True):
-            # Base confidence based on intensity
-            conf_multi = 70.0 + (intensity_multi * 2)
-            conf_multi = min(100.0, conf_multi)
-            
-            _process_emotion_result_multimodal(mood_choice_multi.lower(), conf_multi, "text")
-            st.toast(f"Added {mood_choice_multi} input!")
+            if crisis_detector.is_crisis(mood_text_extra):
+                # Crisis language: show support resources instead of adding the input
+                display_crisis_resources()
+            else:
+                # Base confidence based on intensity
+                conf_multi = 70.0 + (intensity_multi * 2)
+                conf_multi = min(100.0, conf_multi)
+
+                _process_emotion_result_multimodal(mood_choice_multi.lower(), conf_multi, "text")
+                st.toast(f"Added {mood_choice_multi} input!")
 
     with st.expander("📹 Add from Webcam", expanded=True):
         st.info("Captures a single frame for quick analysis.")
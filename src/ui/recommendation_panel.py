@@ -15,6 +15,7 @@ from src.ui.reading_display import (
     display_reading_insights,
 )
 from src.features.wellness_features import wellness_features
+from src.features.recommendation_cache import recommendation_cache, make_key
 from src.ui.breathing_exercises import display_breathing_exercise
 from src.ui.coloring_display import display_coloring_game
 from src.ui.mood_journaling import display_mood_journal
@@ -25,6 +26,7 @@ from src.ui.mental_health_display import (
 )
 from src.ers.ers_engine import update_ers
 from src.ers.aeisa import select_intervention
+from src.ui.render_timing import timed_render, render_timing_summary
 
 
 def display_final_emotion_card(emotion, confidence):
@@ -41,6 +43,28 @@ def display_final_emotion_card(emotion, confidence):
     """, unsafe_allow_html=True)
 
 
+def get_cached_recommendations(emotion, confidence):
+    """Music / reading / wellness lists for this detection, computed once.
+
+    Reruns triggered by widgets inside the tabs reuse the cached bundle, so
+    the lists neither get recomputed nor reshuffled.
+    """
+    catalog_version = f"{music_recommender.catalog_version}:{reading_recommender.catalog_version}"
+    key = make_key(
+        st.session_state.get('session_id', 'default'), emotion, confidence, catalog_version
+    )
+
+    def compute(rng):
+        return {
+            'music': music_recommender.get_enhanced_recommendations(emotion, count=5, rng=rng),
+            'reading': reading_recommender.get_reading_recommendations(emotion, 4, rng=rng),
+            'wellness': wellness_features.get_wellness_recommendations(emotion, confidence),
+        }
+
+    return recommendation_cache.get_or_compute(key, compute)
+
+
+@timed_render("full_panel")
 def display_unified_recommendation_panel(emotion, confidence):
     """Unified panel for all recommendations — music, reading, wellness, etc."""
     # Sanitize the emotion string
@@ -71,60 +95,97 @@ def display_unified_recommendation_panel(emotion, confidence):
         "🆘 Support",
     ])
 
-    target_mood = MOOD_GOAL_MAPPING.get(clean_emotion, "Balanced")
+    # Each tab body is its own fragment: interacting inside a tab reruns
+    # only that tab, and each fragment fetches its own (cached) inputs.
+    with tabs[0]:
+        _music_tab(clean_emotion, confidence)
 
-    with tabs[0]:  # Music
-        st.subheader(f"🎵 {clean_emotion.title()} → Mood Lift: {target_mood}")
-        music_recs = music_recommender.get_enhanced_recommendations(clean_emotion, count=5)
-        if music_recs:
-            st.session_state.playlist = music_recs
-            display_enhanced_music_recommendations(
-                music_recs, clean_emotion, f"Music for a {target_mood} Mood"
-            )
-        else:
-            st.info("No music recommendations available.")
-
-    with tabs[1]:  # Reading
-        st.subheader("📚 Reading Suggestions")
-        reading_recs = reading_recommender.get_reading_recommendations(clean_emotion, 4)
-        display_reading_recommendations(
-            reading_recs, clean_emotion, f"Reading for {clean_emotion.title()}"
-        )
-        display_reading_insights(clean_emotion)
-
-    with tabs[2]:  # Wellness
-        st.subheader("🧘 Wellness & Mindfulness")
-        wellness_recs = wellness_features.get_wellness_recommendations(clean_emotion, confidence)
-        if wellness_recs:
-            for rec in wellness_recs:
-                priority_color = (
-                    "#E74C3C" if rec.get('priority') == 'high'
-                    else "#F39C12" if rec.get('priority') == 'medium'
-                    else "#27AE60"
-                )
-                st.markdown(f"""
-                <div style="background: #f8f9fa; padding: 15px; margin: 10px 0; border-radius: 8px; border-left: 4px solid {priority_color};">
-                    <h4 style="margin: 0; color: {priority_color};">{rec.get('title', 'Activity')}</h4>
-                    <p style="margin: 5px 0; color: #666;">{rec.get('description', '')}</p>
-                </div>
-                """, unsafe_allow_html=True)
-
-        display_breathing_exercise(clean_emotion, wellness_features, key_prefix="rec_panel")
-
-    with tabs[3]:  # Coloring Game
-        display_coloring_game(clean_emotion, key_prefix="rec_panel")
-
-    with tabs[4]:  # AI Chatbot
+    with tabs[1]:
+        _reading_tab(clean_emotion, confidence)
+
+    with tabs[2]:
+        _wellness_tab(clean_emotion, confidence)
+
+    with tabs[3]:
+        _coloring_tab(clean_emotion)
+
+    with tabs[4]:  # show_chatbot is already a fragment
         st.subheader("💬 AI Wellness Companion")
         show_chatbot(clean_emotion)
         st.info("Talk with your AI wellness assistant about how you feel.")
 
-    with tabs[5]:  # Mood Journal
+    with tabs[5]:  # display_mood_journal is already a fragment
         display_mood_journal(clean_emotion, wellness_features)
 
-    with tabs[6]:  # Support
-        st.subheader("🆘 Mental Health Resources")
-        display_mental_health_resources(
-            clean_emotion, int(confidence), f"Support for {clean_emotion.title()}"
+    with tabs[6]:
+        _support_tab(clean_emotion, confidence)
+
+    render_timing_summary()
+
+
+# ===============================
+# Tab fragments
+# ===============================
+
+@st.fragment
+@timed_render("music_tab")
+def _music_tab(clean_emotion, confidence):
+    target_mood = MOOD_GOAL_MAPPING.get(clean_emotion, "Balanced")
+    st.subheader(f"🎵 {clean_emotion.title()} → Mood Lift: {target_mood}")
+    music_recs = get_cached_recommendations(clean_emotion, confidence)['music']
+    if music_recs:
+        st.session_state.playlist = music_recs
+        display_enhanced_music_recommendations(
+            music_recs, clean_emotion, f"Music for a {target_mood} Mood"
         )
-        display_quick_mental_health_links(clean_emotion, int(confidence))
+    else:
+        st.info("No music recommendations available.")
+
+
+@st.fragment
+@timed_render("reading_tab")
+def _reading_tab(clean_emotion, confidence):
+    st.subheader("📚 Reading Suggestions")
+    reading_recs = get_cached_recommendations(clean_emotion, confidence)['reading']
+    display_reading_recommendations(
+        reading_recs, clean_emotion, f"Reading for {clean_emotion.title()}"
+    )
+    display_reading_insights(clean_emotion)
+
+
+@st.fragment
+@timed_render("wellness_tab")
+def _wellness_tab(clean_emotion, confidence):
+    st.subheader("🧘 Wellness & Mindfulness")
+    wellness_recs = get_cached_recommendations(clean_emotion, confidence)['wellness']
+    if wellness_recs:
+        for rec in wellness_recs:
+            priority_color = (
+                "#E74C3C" if rec.get('priority') == 'high'
+                else "#F39C12" if rec.get('priority') == 'medium'
+                else "#27AE60"
+            )
+            st.markdown(f"""
+            <div style="background: #f8f9fa; padding: 15px; margin: 10px 0; border-radius: 8px; border-left: 4px solid {priority_color};">
+                <h4 style="margin: 0; color: {priority_color};">{rec.get('title', 'Activity')}</h4>
+                <p style="margin: 5px 0; color: #666;">{rec.get('description', '')}</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+    display_breathing_exercise(clean_emotion, wellness_features, key_prefix="rec_panel")
+
+
+@st.fragment
+@timed_render("coloring_tab")
+def _coloring_tab(clean_emotion):
+    display_coloring_game(clean_emotion, key_prefix="rec_panel")
+
+
+@st.fragment
+@timed_render("support_tab")
+def _support_tab(clean_emotion, confidence):
+    st.subheader("🆘 Mental Health Resources")
+    display_mental_health_resources(
+        clean_emotion, int(confidence), f"Support for {clean_emotion.title()}"
+    )
+    display_quick_mental_health_links(clean_emotion, int(confidence))
@@ -0,0 +1,65 @@
+"""
+Render Timing
+
+Opt-in measurement of server-side render time per UI section. Enable with
+ERS_RENDER_TIMING=1; when disabled the decorator only adds one env lookup.
+
+Each timed call records (section, milliseconds) in session state and logs
+a `[RenderTiming]` line, which makes it easy to compare a full-page rerun
+with the rerun of a single fragment after an interaction.
+"""
+
+import functools
+import os
+import time
+from collections import deque
+
+import streamlit as st
+
+# Samples kept per session
+_MAX_SAMPLES = 200
+
+
+def timing_enabled():
+    return os.environ.get("ERS_RENDER_TIMING", "") == "1"
+
+
+def timed_render(section):
+    """Decorator: record how long the wrapped render function takes."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not timing_enabled():
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+                samples = st.session_state.setdefault(
+                    "render_timings", deque(maxlen=_MAX_SAMPLES)
+                )
+                samples.append((section, elapsed_ms))
+                print(f"[RenderTiming] {section}: {elapsed_ms:.1f} ms")
+        return wrapper
+    return decorator
+
+
+def render_timing_summary():
+    """Small table of mean / last render time per section (only when enabled)."""
+    if not timing_enabled():
+        return
+    samples = st.session_state.get("render_timings")
+    if not samples:
+        return
+    stats = {}
+    for section, ms in samples:
+        renders, total, _ = stats.get(section, (0, 0.0, 0.0))
+        stats[section] = (renders + 1, total + ms, ms)
+    rows = [
+        {"section": section, "renders": renders,
+         "mean_ms": round(total / renders, 1), "last_ms": round(last, 1)}
+        for section, (renders, total, last) in stats.items()
+    ]
+    with st.expander("⏱️ Render timings"):
+        st.dataframe(rows, hide_index=True, use_container_width=True)
@@ -10,7 +10,6 @@ import tempfile
 import numpy as np
 import cv2
 import streamlit as st
-from datetime import datetime
 from PIL import Image
 
 from src.core.emotion_engine import (
@@ -20,7 +19,10 @@ from src.core.emotion_engine import (
     standardize_emotion_result,
     detect_emotion_from_text_simple,
 )
+from src.features.crisis_detector import crisis_detector
+from src.state.session_state import record_emotion
 from src.ui.enhanced_ui import create_soothing_section
+from src.ui.mental_health_display import display_crisis_resources
 from src.ui.recommendation_panel import display_unified_recommendation_panel
 from src.ui.video_analysis_dashboard import render_video_analysis_dashboard
 
@@ -28,12 +30,7 @@ from src.ui.video_analysis_dashboard import render_video_analysis_dashboard
 def _process_emotion_result(emotion, confidence, source):
     """Handle the final emotion result for single mode."""
     result = standardize_emotion_result(emotion, confidence, source)
-    st.session_state.emotion_history.append({
-        'timestamp': datetime.now(),
-        'emotion': emotion,
-        'confidence': confidence,
-        'source': source,
-    })
+    record_emotion(emotion, confidence, source)
     display_unified_recommendation_panel(result["emotion"], result["confidence"])
 
 
@@ -192,6 +189,9 @@ def _render_text_mode():
     if st.button("🚀 Analyze Mood & Get Recommendations", type="primary", use_container_width=True):
         if not mood_desc.strip():
             st.warning("Please describe your mood before analyzing.")
+        elif crisis_detector.is_crisis(f"{mood_desc}\n{extra_context}"):
+            # Crisis language: show support resources instead of recommendations
+            display_crisis_resources()
         else:
             final_mood = detect_emotion_from_text_simple(mood_desc)
             if not final_mood or final_mood == "neutral":